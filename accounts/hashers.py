@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from rest_framework.exceptions import Throttled
+
+logger = logging.getLogger(__name__)
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    可配置迭代次数的PBKDF2哈希器
+
+    迭代次数由PASSWORD_PBKDF2_ITERATIONS设置，算法名与Django默认的PBKDF2哈希器相同，
+    迭代次数变化后，已有密码会在下次登录成功时按新的迭代次数重新哈希
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+class PasswordHashingBusy(Throttled):
+    """密码哈希进程池已满"""
+    default_detail = '登录请求过多，请稍后再试'
+
+def _init_worker():
+    """进程池子进程初始化，加载Django配置"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+def _make_password(raw_password):
+    return hashers.make_password(raw_password)
+
+def _verify_password(raw_password, encoded):
+    return hashers.verify_password(raw_password, encoded)
+
+def _timed_call(func, *args):
+    """在子进程中执行哈希函数，同时返回消耗的CPU时间"""
+    started = time.process_time()
+    result = func(*args)
+    return result, time.process_time() - started
+
+class PasswordHashingPool:
+    """
+    密码哈希进程池
+
+    密码哈希和验证在独立的进程池中执行，不占用请求线程的CPU和GIL。
+    同时执行和排队的任务总数受PASSWORD_HASHING_MAX_PENDING限制，
+    超过限制且等待PASSWORD_HASHING_QUEUE_TIMEOUT秒仍无空位时拒绝请求。
+    PASSWORD_HASHING_WORKERS为0时在当前线程中执行，仍然受并发限制并计入统计。
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(settings.PASSWORD_HASHING_MAX_PENDING)
+        self._stats = {
+            'completed': 0,
+            'rejected': 0,
+            'in_flight': 0,
+            'cpu_seconds': 0.0,
+            'wall_seconds': 0.0,
+        }
+
+    def get_executor(self):
+        if settings.PASSWORD_HASHING_WORKERS <= 0:
+            return None
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=settings.PASSWORD_HASHING_WORKERS,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker
+                    )
+        return self._executor
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=settings.PASSWORD_HASHING_QUEUE_TIMEOUT):
+            self._reject()
+        self._enter()
+
+    async def _aacquire(self):
+        deadline = time.monotonic() + settings.PASSWORD_HASHING_QUEUE_TIMEOUT
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self._reject()
+            await asyncio.sleep(0.01)
+        self._enter()
+
+    def _reject(self):
+        with self._lock:
+            self._stats['rejected'] += 1
+        logger.warning("密码哈希进程池已满，拒绝请求")
+        raise PasswordHashingBusy()
+
+    def _enter(self):
+        with self._lock:
+            self._stats['in_flight'] += 1
+
+    def _release(self, cpu_seconds, wall_seconds):
+        with self._lock:
+            self._stats['in_flight'] -= 1
+            if cpu_seconds is not None:
+                self._stats['completed'] += 1
+                self._stats['cpu_seconds'] += cpu_seconds
+                self._stats['wall_seconds'] += wall_seconds
+        self._slots.release()
+
+    def run(self, func, *args):
+        """
+        在进程池中执行哈希函数并等待结果
+
+        Args:
+            func: 哈希函数
+            *args: 参数
+
+        Returns:
+            哈希函数的返回值
+        """
+        self._acquire()
+        started = time.monotonic()
+        cpu_seconds = None
+        try:
+            executor = self.get_executor()
+            if executor is None:
+                result, cpu_seconds = _timed_call(func, *args)
+            else:
+                result, cpu_seconds = executor.submit(_timed_call, func, *args).result()
+            return result
+        finally:
+            self._release(cpu_seconds, time.monotonic() - started)
+
+    async def arun(self, func, *args):
+        """run()的异步版本，在异步视图中等待结果而不阻塞事件循环"""
+        await self._aacquire()
+        started = time.monotonic()
+        cpu_seconds = None
+        try:
+            executor = self.get_executor()
+            if executor is None:
+                result, cpu_seconds = _timed_call(func, *args)
+            else:
+                result, cpu_seconds = await asyncio.wrap_future(
+                    executor.submit(_timed_call, func, *args)
+                )
+            return result
+        finally:
+            self._release(cpu_seconds, time.monotonic() - started)
+
+    def get_stats(self):
+        """获取当前进程的密码哈希统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['workers'] = settings.PASSWORD_HASHING_WORKERS
+        stats['max_pending'] = settings.PASSWORD_HASHING_MAX_PENDING
+        stats['avg_cpu_ms'] = (
+            round(stats['cpu_seconds'] * 1000 / stats['completed'], 2) if stats['completed'] else None
+        )
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_hashing_pool():
+    """获取密码哈希进程池实例"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordHashingPool()
+    return _pool
+
+def hash_password(raw_password):
+    """
+    计算密码哈希
+
+    Args:
+        raw_password: 明文密码
+
+    Returns:
+        str: 按当前首选哈希器编码的密码
+    """
+    return get_hashing_pool().run(_make_password, raw_password)
+
+def verify_password(raw_password, encoded):
+    """
+    验证密码
+
+    Args:
+        raw_password: 明文密码
+        encoded: 已编码的密码
+
+    Returns:
+        tuple: (密码是否正确, 是否需要按首选哈希器重新哈希)
+    """
+    return get_hashing_pool().run(_verify_password, raw_password, encoded)
+
+async def ahash_password(raw_password):
+    """hash_password()的异步版本"""
+    return await get_hashing_pool().arun(_make_password, raw_password)
+
+async def averify_password(raw_password, encoded):
+    """verify_password()的异步版本"""
+    return await get_hashing_pool().arun(_verify_password, raw_password, encoded)
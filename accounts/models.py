@@ -3,6 +3,7 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 import uuid
+from .hashers import hash_password, verify_password, ahash_password, averify_password
 
 class UserManager(BaseUserManager):
     """自定义用户管理器"""
@@ -78,6 +79,35 @@ class User(AbstractUser):
     def __str__(self):
         return self.username or self.phone or self.email
 
+    def set_password(self, raw_password):
+        """在密码哈希进程池中计算密码哈希"""
+        if raw_password is None:
+            return super().set_password(raw_password)
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        在密码哈希进程池中验证密码
+
+        验证通过且密码不是按当前首选哈希器（或迭代次数）编码时，重新哈希并保存
+        """
+        is_correct, must_update = verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            # 哈希升级不视为修改密码
+            self._password = None
+            self.save(update_fields=['password'])
+        return is_correct
+
+    async def acheck_password(self, raw_password):
+        """check_password()的异步版本"""
+        is_correct, must_update = await averify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.password = await ahash_password(raw_password)
+            await self.asave(update_fields=['password'])
+        return is_correct
+
 class VerificationCode(models.Model):
     """
     验证码模型
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from backend.surrogate_keys import purge_surrogate_keys, user_key
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def purge_user_surrogate_key(sender, instance, using, **kwargs):
+    """用户信息修改（包括登录时更新last_login）或删除后，在事务提交后清除代理层缓存中的用户信息"""
+    # 删除后instance.pk会被置为None，先取出ID
+    keys = [user_key(instance.pk)]
+    transaction.on_commit(lambda: purge_surrogate_keys(keys), using=using)
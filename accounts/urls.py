@@ -10,7 +10,8 @@ from .views import (
     WechatCallbackView,
     BindPhoneView,
     WechatMiniLoginView,
-    WechatConfigDebugView
+    WechatConfigDebugView,
+    PasswordHashingStatsView
 )
 
 urlpatterns = [
@@ -34,4 +35,7 @@ urlpatterns = [
 
     # 用户信息
     path('profile/', UserProfileView.as_view(), name='user-profile'),
+
+    # 密码哈希统计
+    path('hashing-stats/', PasswordHashingStatsView.as_view(), name='password-hashing-stats'),
 ]
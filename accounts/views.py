@@ -1,6 +1,8 @@
 from rest_framework import status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.utils.cache import patch_vary_headers
+from backend.surrogate_keys import set_surrogate_keys, user_key
 from backend.utils import api_success_response, api_error_response
 from rest_framework_simplejwt.views import TokenRefreshView
 from django.contrib.auth import get_user_model
@@ -16,6 +18,7 @@ from .serializers import (
     WechatMiniLoginSerializer
 )
 from .sms import send_verification_code
+from .hashers import get_hashing_pool
 import requests
 from django.conf import settings
 
@@ -367,10 +370,13 @@ class UserProfileView(APIView):
 
     def get(self, request):
         serializer = UserSerializer(request.user)
-        return api_success_response(
+        response = api_success_response(
             data={'user': serializer.data},
             message='获取用户信息成功'
         )
+        # 响应内容取决于认证的用户，代理层需要按Authorization分别缓存
+        patch_vary_headers(response, ['Authorization'])
+        return set_surrogate_keys(response, [user_key(request.user.pk)])
 
     def patch(self, request):
         serializer = UserSerializer(request.user, data=request.data, partial=True)
@@ -743,4 +749,38 @@ class WechatConfigDebugView(APIView):
         return api_success_response(
             data=config,
             message='当前微信配置'
-        )
\ No newline at end of file
+        )
+
+class PasswordHashingStatsView(APIView):
+    """
+    密码哈希统计视图
+    ---
+    get:
+        描述: 获取当前进程的密码哈希统计，仅管理员可用
+        响应:
+            200:
+                描述: 获取密码哈希统计成功
+                示例:
+                    {
+                        "code": 0,
+                        "message": "获取密码哈希统计成功",
+                        "data": {
+                            "completed": 120,
+                            "rejected": 0,
+                            "in_flight": 1,
+                            "cpu_seconds": 36.2,
+                            "wall_seconds": 38.9,
+                            "workers": 2,
+                            "max_pending": 16,
+                            "avg_cpu_ms": 301.67
+                        },
+                        "pagination": null
+                    }
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return api_success_response(
+            data=get_hashing_pool().get_stats(),
+            message='获取密码哈希统计成功'
+        )
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Task
+from .search import search_tasks
 
 # Register your models here.
 @admin.register(Task)
@@ -8,3 +9,9 @@ class TaskAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('title', 'description')
     date_hierarchy = 'created_at'
+
+    def get_search_results(self, request, queryset, search_term):
+        """使用全文索引搜索，不再对标题和描述做模糊匹配扫描"""
+        if not search_term.strip():
+            return queryset, False
+        return search_tasks(queryset, search_term), False
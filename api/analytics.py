@@ -0,0 +1,216 @@
+import datetime
+import hashlib
+import itertools
+import json
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import NotSupportedError, connections
+from django.db.models import FloatField, Func
+from django.utils import timezone
+from .models import ArchivedTask, Task
+from .sharding import shard_querysets
+
+# 统计的时间粒度
+CYCLE_TIME_PERIODS = ('day', 'week')
+
+class EpochSeconds(Func):
+    """
+    时间字段的Unix时间戳（秒，浮点数）
+
+    在数据库中转换，读取时不需要逐行构造datetime对象，可以直接装入NumPy数组
+    """
+    arity = 1
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"{connection.vendor}数据库不支持任务周期统计")
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite按文本保存时间，julianday返回儒略日，2440587.5为1970-01-01的儒略日
+        return super().as_sql(
+            compiler, connection, template='((julianday(%(expressions)s) - 2440587.5) * 86400.0)', **extra_context
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        # EXTRACT在PostgreSQL 14以上返回numeric，转换为double precision避免逐行构造Decimal
+        return super().as_sql(
+            compiler, connection, template='EXTRACT(EPOCH FROM %(expressions)s)::double precision', **extra_context
+        )
+
+def bucket_start(value, period):
+    """
+    时间所在统计区间的起始时间（当前时区的0点，按周统计时为周一0点）
+
+    Args:
+        value: 带时区的时间
+        period: day或week
+
+    Returns:
+        datetime: 带时区的区间起始时间
+    """
+    date = timezone.localtime(value).date()
+    if period == 'week':
+        date -= datetime.timedelta(days=date.weekday())
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+def get_bucket_bounds(start, end, period):
+    """
+    覆盖[start, end)的统计区间边界
+
+    边界按当前时区的日期计算后再转换为时间戳，夏令时切换的日期也按自然日划分
+
+    Returns:
+        list: 区间边界，n个区间对应n+1个边界
+    """
+    step = datetime.timedelta(days=7 if period == 'week' else 1)
+    date = timezone.localtime(bucket_start(start, period)).date()
+    bounds = []
+    while True:
+        bound = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+        bounds.append(bound)
+        if bound >= end:
+            return bounds
+        date += step
+
+def load_cycle_times(start, end):
+    """
+    读取在[start, end)内完成的任务的完成时间戳和周期时间
+
+    已完成任务的完成时间为updated_at，周期时间为updated_at - created_at。
+    按(status, updated_at, id)索引查询任务表，并查询归档表（只保存已完成和已取消的任务），
+    启用分片时查询所有分片。每行只读取两个时间戳，按块装入NumPy数组
+
+    Returns:
+        tuple: (完成时间戳数组, 周期时间数组)，单位为秒
+    """
+    querysets = [
+        model.objects.filter(status='completed', updated_at__gte=start, updated_at__lt=end)
+        for model in (Task, ArchivedTask)
+    ]
+    chunks = [np.empty((0, 2))]
+    for part in querysets:
+        for queryset in shard_querysets(part):
+            # 用values_list生成SQL后直接从游标按块读取，不经过ORM逐行转换
+            query = queryset.order_by().values_list(EpochSeconds('updated_at'), EpochSeconds('created_at')).query
+            sql, params = query.get_compiler(using=queryset.db).as_sql()
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute(sql, params)
+                while rows := cursor.fetchmany(settings.TASK_ANALYTICS_CHUNK_SIZE):
+                    chunks.append(np.array(rows, dtype=np.float64))
+    values = np.concatenate(chunks)
+    completed_at = values[:, 0]
+    # 时钟回拨等原因产生的负值按0计算
+    return completed_at, np.maximum(completed_at - values[:, 1], 0.0)
+
+def summarize_cycle_times(durations, percentiles, histogram_edges):
+    """
+    计算一组周期时间的统计值
+
+    Args:
+        durations: 周期时间数组（秒）
+        percentiles: 百分位列表，如[50, 90]
+        histogram_edges: 直方图的区间边界（秒），升序；n个边界对应n+1个区间，最后一个区间没有上限
+
+    Returns:
+        dict: count、mean、min、max、percentiles和histogram，没有数据时统计值为None
+    """
+    histogram = np.bincount(
+        np.searchsorted(histogram_edges, durations, side='right'), minlength=len(histogram_edges) + 1
+    )
+    summary = {
+        'count': int(durations.size),
+        'mean': None,
+        'min': None,
+        'max': None,
+        'percentiles': {f"p{p:g}": None for p in percentiles},
+        'histogram': histogram.tolist(),
+    }
+    if durations.size:
+        values = np.percentile(durations, percentiles)
+        summary.update({
+            'mean': round(float(durations.mean()), 3),
+            'min': round(float(durations.min()), 3),
+            'max': round(float(durations.max()), 3),
+            'percentiles': {f"p{p:g}": round(float(value), 3) for p, value in zip(percentiles, values)},
+        })
+    return summary
+
+def _cache_key(period, bound, config):
+    return f"task_cycle_time:{config}:{period}:{int(bound.timestamp())}"
+
+def get_cycle_time_stats(start, end, period='day'):
+    """
+    按天或周统计任务的周期时间（从创建到完成）
+
+    已经结束超过TASK_CHANGES_SETTLE_SECONDS秒的区间按区间缓存TASK_ANALYTICS_CACHE_TTL秒，
+    刷新时只从数据库读取未缓存的区间（通常只有当前区间）。连续的未缓存区间合并为一次查询，
+    读取的数据用searchsorted按区间边界分组后分别计算百分位和直方图。
+
+    缓存期间已完成任务的修改（updated_at变化会使任务移到新的区间）和删除不会反映到已缓存的区间
+
+    Args:
+        start: 带时区的开始时间，向前取整到区间起点
+        end: 带时区的结束时间（不包含）
+        period: day或week
+
+    Returns:
+        dict: 区间列表和整个时间范围的汇总
+    """
+    percentiles = settings.TASK_ANALYTICS_PERCENTILES
+    edges = np.asarray(settings.TASK_ANALYTICS_HISTOGRAM_EDGES, dtype=np.float64)
+    # 统计配置变化后不再读取按旧配置缓存的结果
+    config = hashlib.md5(json.dumps([percentiles, edges.tolist()]).encode('utf-8')).hexdigest()[:8]
+
+    bounds = get_bucket_bounds(start, end, period)
+    settled = timezone.now() - datetime.timedelta(seconds=settings.TASK_CHANGES_SETTLE_SECONDS)
+    keys = [_cache_key(period, bound, config) for bound in bounds[:-1]]
+    cached = cache.get_many([key for key, bucket_end in zip(keys, bounds[1:]) if bucket_end <= settled])
+
+    summaries = [cached.get(key) for key in keys]
+    missing = [index for index, summary in enumerate(summaries) if summary is None]
+    to_cache = {}
+    # 连续的未缓存区间一次查询
+    for _, group in itertools.groupby(enumerate(missing), key=lambda item: item[1] - item[0]):
+        indexes = [index for _, index in group]
+        first, last = indexes[0], indexes[-1]
+        completed_at, durations = load_cycle_times(bounds[first], bounds[last + 1])
+        group_bounds = np.array([bound.timestamp() for bound in bounds[first + 1:last + 1]])
+        positions = np.searchsorted(group_bounds, completed_at, side='right')
+        order = np.argsort(positions, kind='stable')
+        splits = np.searchsorted(positions[order], np.arange(1, len(indexes)))
+        for index, part in zip(indexes, np.split(durations[order], splits)):
+            summaries[index] = summarize_cycle_times(part, percentiles, edges)
+            if bounds[index + 1] <= settled:
+                to_cache[keys[index]] = summaries[index]
+    if to_cache:
+        cache.set_many(to_cache, settings.TASK_ANALYTICS_CACHE_TTL)
+
+    count = sum(summary['count'] for summary in summaries)
+    total = {
+        'count': count,
+        'mean': None,
+        'min': None,
+        'max': None,
+        'histogram': np.sum([summary['histogram'] for summary in summaries], axis=0).tolist(),
+    }
+    if count:
+        counted = [summary for summary in summaries if summary['count']]
+        total.update({
+            'mean': round(sum(summary['mean'] * summary['count'] for summary in counted) / count, 3),
+            'min': min(summary['min'] for summary in counted),
+            'max': max(summary['max'] for summary in counted),
+        })
+
+    return {
+        'period': period,
+        'start': bounds[0],
+        'end': bounds[-1],
+        'percentiles': percentiles,
+        'histogram_edges': edges.tolist(),
+        'buckets': [
+            {'start': bucket_from, 'end': bucket_to, **summary}
+            for bucket_from, bucket_to, summary in zip(bounds, bounds[1:], summaries)
+        ],
+        'total': total,
+    }
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # 注册信号处理函数和启动检查
+        from . import signals  # noqa: F401
+        from backend import checks  # noqa: F401
@@ -0,0 +1,83 @@
+from collections import Counter
+from django.db import transaction
+from backend.utils import bump_table_generation
+from .models import ArchivedTask, Task, TaskStatusCounter
+from .signals import send_tasks_changed
+
+# 可以归档的任务状态
+TASK_ARCHIVE_STATUSES = ('completed', 'cancelled')
+
+# 任务表和归档表共有的字段
+ARCHIVED_TASK_FIELDS = ('id', 'title', 'description', 'status', 'created_at', 'updated_at', 'owner_id', 'due_at')
+
+def _on_commit_bump_archive_generation(using):
+    transaction.on_commit(lambda: bump_table_generation(ArchivedTask), using=using)
+
+def archive_tasks(before, batch_size=1000, max_batches=None, using=None):
+    """
+    把before之前完成或取消的任务移到归档表
+
+    按(status, updated_at, id)索引每次选取batch_size个任务，在单独的事务中锁定、写入归档表
+    并从任务表删除，每个事务持有的锁和产生的WAL都是有界的，可以在业务运行时执行。
+    归档不写入墓碑，任务仍然存在，只是不再出现在默认的任务列表中
+
+    Args:
+        before: 最后更新时间早于该时间的任务才会归档
+        batch_size: 每批归档的任务数
+        max_batches: 最多执行的批数，为None时直到没有可归档的任务
+        using: 数据库别名，启用分片时每个分片分别归档
+
+    Returns:
+        int: 归档的任务数
+    """
+    queryset = Task._base_manager.using(using).filter(status__in=TASK_ARCHIVE_STATUSES, updated_at__lt=before)
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic(using=using):
+            rows = list(
+                queryset.select_for_update().order_by('updated_at', 'id')
+                .values(*ARCHIVED_TASK_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            pks = [row['id'] for row in rows]
+            ArchivedTask.objects.using(using).bulk_create([ArchivedTask(**row) for row in rows])
+            Task._base_manager.using(using).filter(pk__in=pks).delete()
+
+            deltas = Counter()
+            for row in rows:
+                deltas[row['status']] -= 1
+            TaskStatusCounter.apply(deltas, using=using)
+            send_tasks_changed(Task, 'archive', pks, using=using)
+            _on_commit_bump_archive_generation(using)
+        total += len(rows)
+        batches += 1
+    return total
+
+def restore_archived_tasks(queryset, batch_size=1000):
+    """
+    把归档的任务恢复到任务表
+
+    每批在单独的事务中用Task.objects.bulk_create写入（保留原来的ID，维护状态计数并发送create信号），
+    再从归档表删除。恢复后的updated_at为恢复时间，变更同步接口会把任务重新发给客户端
+
+    Args:
+        queryset: 要恢复的ArchivedTask查询集，启用分片时每个分片分别恢复
+        batch_size: 每批恢复的任务数
+
+    Returns:
+        int: 恢复的任务数
+    """
+    using = queryset.db
+    total = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(queryset.select_for_update().order_by('id').values(*ARCHIVED_TASK_FIELDS)[:batch_size])
+            if not rows:
+                break
+            Task.objects.using(using).bulk_create([Task(**row) for row in rows])
+            ArchivedTask.objects.using(using).filter(pk__in=[row['id'] for row in rows]).delete()
+            _on_commit_bump_archive_generation(using)
+        total += len(rows)
+    return total
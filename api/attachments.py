@@ -0,0 +1,402 @@
+import datetime
+import fcntl
+import hashlib
+import os
+import re
+import uuid
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ArchivedTask, Task, TaskAttachment, TaskAttachmentUpload
+from .sharding import get_task_shards
+
+# 附件文件和上传临时文件在MEDIA_ROOT下的目录。直接使用本地文件系统而不是Storage，
+# 下载时由nginx按路径发送文件（X-Accel-Redirect）
+ATTACHMENT_DIR = 'attachments'
+ATTACHMENT_UPLOAD_DIR = os.path.join(ATTACHMENT_DIR, 'uploads')
+
+# 内容哈希按该大小分块计算，参见compute_content_hash
+ATTACHMENT_HASH_BLOCK_SIZE = 4 * 1024 * 1024
+# 读写文件时每次处理的字节数
+ATTACHMENT_IO_CHUNK_SIZE = 64 * 1024
+
+_CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# MIME类型只允许不带参数的type/subtype（RFC 6838中的字符），控制字符和换行不会进入响应头
+_MIME_TYPE_RE = re.compile(r'[a-z0-9][a-z0-9!#$&^_.+-]*/[a-z0-9][a-z0-9!#$&^_.+-]*')
+
+# 未指定或不合法的MIME类型
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+
+class UploadConflict(Exception):
+    """分块的起始位置与已接收的字节数不一致，或同一上传的另一个分块正在写入"""
+
+    def __init__(self, received):
+        super().__init__(received)
+        self.received = received
+
+class RangeNotSatisfiable(Exception):
+    """Range请求头的范围超出文件大小"""
+
+def compute_content_hash(block_hashes):
+    """
+    计算文件的内容哈希
+
+    文件按ATTACHMENT_HASH_BLOCK_SIZE分块，内容哈希为各块SHA-256摘要依次拼接后的SHA-256（与Dropbox的content_hash相同）。
+    各块的摘要可以在分块上传时逐块计算，不需要在上传完成后重新读取整个文件
+
+    Args:
+        block_hashes: 各块SHA-256摘要的十六进制字符串，依次拼接
+
+    Returns:
+        str: 十六进制的内容哈希
+    """
+    return hashlib.sha256(bytes.fromhex(block_hashes)).hexdigest()
+
+def attachment_name(content_hash):
+    """附件文件相对于MEDIA_ROOT的路径，按哈希前缀分两级目录"""
+    return os.path.join(ATTACHMENT_DIR, content_hash[:2], content_hash[2:4], content_hash)
+
+def attachment_path(content_hash):
+    return os.path.join(settings.MEDIA_ROOT, attachment_name(content_hash))
+
+def normalize_content_type(value):
+    """
+    校验并规范化附件的MIME类型
+
+    Args:
+        value: 客户端提供的MIME类型
+
+    Returns:
+        str: 小写的type/subtype，不合法时为None
+    """
+    value = value.strip().lower()
+    return value if _MIME_TYPE_RE.fullmatch(value) else None
+
+def attachment_content_type(content_type):
+    """
+    下载附件时使用的Content-Type，以及是否允许在浏览器中直接打开
+
+    只有TASK_ATTACHMENT_INLINE_TYPES中的类型可以inline打开，其余类型总是作为附件下载，
+    避免上传的HTML、SVG等内容在本站的域名下执行。保存的类型不合法时按DEFAULT_CONTENT_TYPE返回
+
+    Args:
+        content_type: 附件保存的MIME类型
+
+    Returns:
+        tuple: (Content-Type, 是否允许inline)
+    """
+    content_type = normalize_content_type(content_type) or DEFAULT_CONTENT_TYPE
+    return content_type, content_type in settings.TASK_ATTACHMENT_INLINE_TYPES
+
+def upload_path(upload):
+    """上传临时文件的绝对路径"""
+    return os.path.join(settings.MEDIA_ROOT, ATTACHMENT_UPLOAD_DIR, f"{upload.pk}.part")
+
+def parse_content_range(header, size):
+    """
+    解析分块上传的Content-Range请求头
+
+    Args:
+        header: 如"bytes 0-4194303/10485760"
+        size: 上传的文件总字节数，必须与请求头中的总数一致
+
+    Returns:
+        tuple: (起始位置, 字节数)，没有请求头时表示整个文件
+
+    Raises:
+        ValueError: 格式错误或范围无效
+    """
+    if not header:
+        return 0, size
+    match = _CONTENT_RANGE_RE.match(header.strip())
+    if not match:
+        raise ValueError('Content-Range格式应为"bytes 起始-结束/总字节数"')
+    start, end, total = map(int, match.groups())
+    if total != size or start > end or end >= size:
+        raise ValueError('Content-Range的范围无效')
+    return start, end - start + 1
+
+def parse_range(header, size):
+    """
+    解析下载的Range请求头，只支持单个范围，多个范围时返回整个文件
+
+    Args:
+        header: 如"bytes=0-1023"、"bytes=1024-"、"bytes=-500"
+        size: 文件字节数
+
+    Returns:
+        tuple: (起始位置, 结束位置)，包含结束位置；返回整个文件时为None
+
+    Raises:
+        RangeNotSatisfiable: 范围超出文件大小
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # 最后N个字节
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise RangeNotSatisfiable()
+    return start, end
+
+def iter_file_range(path, start, end):
+    """按ATTACHMENT_IO_CHUNK_SIZE逐块读取文件的[start, end]范围"""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = file.read(min(ATTACHMENT_IO_CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+class _BlockHasher:
+    """逐块计算SHA-256，每满ATTACHMENT_HASH_BLOCK_SIZE字节输出一个摘要"""
+
+    def __init__(self):
+        self.digests = []
+        self._hash = hashlib.sha256()
+        self._filled = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        while view:
+            take = min(ATTACHMENT_HASH_BLOCK_SIZE - self._filled, len(view))
+            self._hash.update(view[:take])
+            self._filled += take
+            view = view[take:]
+            if self._filled == ATTACHMENT_HASH_BLOCK_SIZE:
+                self.digests.append(self._hash.hexdigest())
+                self._hash = hashlib.sha256()
+                self._filled = 0
+
+    def finish(self):
+        """输出最后一个未满的块的摘要"""
+        if self._filled:
+            self.digests.append(self._hash.hexdigest())
+            self._hash = hashlib.sha256()
+            self._filled = 0
+
+def create_upload(task, filename, content_type, size, uploaded_by=None):
+    """
+    开始上传附件，空文件直接完成
+
+    Returns:
+        TaskAttachmentUpload或TaskAttachment: 未完成的上传，或空文件的附件
+    """
+    upload = TaskAttachmentUpload.objects.using(task._state.db).create(
+        task_id=task.pk, filename=filename, content_type=content_type, size=size, uploaded_by=uploaded_by
+    )
+    path = upload_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    if size == 0:
+        return complete_upload(upload)
+    return upload
+
+def write_upload_chunk(upload, stream, start, length):
+    """
+    把一个分块写入上传的临时文件
+
+    分块从请求体中按ATTACHMENT_IO_CHUNK_SIZE逐块读取并写入文件，内存占用与分块大小无关。
+    写入时对临时文件加排他锁，同一上传的分块不能并发写入；分块中途断开时已写入的部分被丢弃，
+    客户端从received重新上传。每个分块都要重新读取最后一个未满的哈希块，
+    分块大小为ATTACHMENT_HASH_BLOCK_SIZE的整数倍时不需要重新读取
+
+    Args:
+        upload: TaskAttachmentUpload
+        stream: 请求体，file-like对象
+        start: 分块的起始位置，必须等于已接收的字节数
+        length: 分块的字节数
+
+    Returns:
+        TaskAttachmentUpload或TaskAttachment: 未完成的上传，或上传完成后的附件
+
+    Raises:
+        UploadConflict: 起始位置不等于已接收的字节数，或同一上传正在写入其他分块
+        ValueError: 请求体比Content-Range声明的短
+    """
+    using = upload._state.db
+    path = upload_path(upload)
+    try:
+        file = open(path, 'r+b')
+    except FileNotFoundError:
+        # 临时文件已被清理，只能重新开始
+        raise UploadConflict(0)
+    with file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadConflict(upload.received)
+        upload.refresh_from_db(fields=['received', 'block_hashes'])
+        if start != upload.received:
+            raise UploadConflict(upload.received)
+
+        # 重新计算最后一个未满的哈希块
+        hasher = _BlockHasher()
+        block_start = len(upload.block_hashes) // 64 * ATTACHMENT_HASH_BLOCK_SIZE
+        file.seek(block_start)
+        remaining = start - block_start
+        while remaining > 0:
+            data = file.read(min(ATTACHMENT_IO_CHUNK_SIZE, remaining))
+            hasher.update(data)
+            remaining -= len(data)
+
+        # 丢弃之前中断的分块写入的部分
+        file.seek(start)
+        file.truncate()
+        remaining = length
+        while remaining > 0:
+            data = stream.read(min(ATTACHMENT_IO_CHUNK_SIZE, remaining))
+            if not data:
+                raise ValueError(f"请求体比Content-Range声明的短{remaining}字节")
+            file.write(data)
+            hasher.update(data)
+            remaining -= len(data)
+        file.flush()
+
+        upload.received = start + length
+        if upload.received == upload.size:
+            hasher.finish()
+        upload.block_hashes += ''.join(hasher.digests)
+        upload.save(using=using, update_fields=['received', 'block_hashes', 'updated_at'])
+
+    if upload.received == upload.size:
+        return complete_upload(upload)
+    return upload
+
+def complete_upload(upload):
+    """
+    完成上传：按内容哈希保存文件并创建附件
+
+    相同内容的文件已存在时直接删除临时文件，否则把临时文件移到附件目录（同一文件系统内的rename，不复制数据）
+
+    Returns:
+        TaskAttachment: 新建的附件
+    """
+    using = upload._state.db
+    content_hash = compute_content_hash(upload.block_hashes)
+    path = attachment_path(content_hash)
+    if os.path.exists(path):
+        # 更新修改时间，避免被purge_task_attachments当作未引用的旧文件清理
+        os.utime(path)
+        os.remove(upload_path(upload))
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(upload_path(upload), path)
+
+    with transaction.atomic(using=using):
+        attachment = TaskAttachment.objects.using(using).create(
+            task_id=upload.task_id,
+            filename=upload.filename,
+            content_type=upload.content_type,
+            size=upload.size,
+            content_hash=content_hash,
+            uploaded_by=upload.uploaded_by,
+        )
+        upload.delete(using=using)
+    return attachment
+
+def cancel_upload(upload):
+    """取消上传，删除临时文件"""
+    path = upload_path(upload)
+    upload.delete()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def purge_attachments(expire_hours, batch_size=1000):
+    """
+    清理过期的上传、任务已删除的附件和不再被引用的文件
+
+    任务删除后附件记录由这里清理（任务归档后仍然保留）。文件只在所有分片都没有引用、
+    并且超过expire_hours小时未修改时才删除，避免删除刚上传完成、正在去重引用的文件
+
+    Args:
+        expire_hours: 上传过期和文件保留的小时数
+        batch_size: 每批检查的附件或文件数
+
+    Returns:
+        dict: 清理的上传数、附件数和文件数
+    """
+    boundary = timezone.now() - datetime.timedelta(hours=expire_hours)
+    result = {'uploads': 0, 'attachments': 0, 'files': 0}
+    for alias in get_task_shards():
+        for upload in TaskAttachmentUpload.objects.using(alias).filter(updated_at__lt=boundary).iterator():
+            cancel_upload(upload)
+            result['uploads'] += 1
+
+        last_id = 0
+        while True:
+            rows = list(
+                TaskAttachment.objects.using(alias).filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'task_id')[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            task_ids = {task_id for _, task_id in rows}
+            existing = set(Task._base_manager.using(alias).filter(pk__in=task_ids).values_list('pk', flat=True))
+            existing |= set(ArchivedTask.objects.using(alias).filter(pk__in=task_ids).values_list('pk', flat=True))
+            orphans = [pk for pk, task_id in rows if task_id not in existing]
+            if orphans:
+                result['attachments'] += TaskAttachment.objects.using(alias).filter(pk__in=orphans).delete()[0]
+
+    result['files'] = _purge_files(boundary.timestamp(), batch_size)
+    return result
+
+def _purge_files(before, batch_size):
+    """删除早于before（时间戳）且没有附件引用的文件，以及没有对应上传记录的临时文件"""
+    root = os.path.join(settings.MEDIA_ROOT, ATTACHMENT_DIR)
+    upload_root = os.path.join(settings.MEDIA_ROOT, ATTACHMENT_UPLOAD_DIR)
+    candidates = {}
+    removed = 0
+
+    def flush():
+        nonlocal removed
+        referenced = set()
+        for alias in get_task_shards():
+            referenced.update(
+                TaskAttachment.objects.using(alias).filter(content_hash__in=list(candidates))
+                .values_list('content_hash', flat=True)
+            )
+        for content_hash, path in candidates.items():
+            if content_hash not in referenced:
+                os.remove(path)
+                removed += 1
+        candidates.clear()
+
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if os.path.getmtime(path) >= before:
+                continue
+            if directory == upload_root:
+                # 对应的上传记录已在前面按updated_at清理，剩下的是没有记录的临时文件
+                try:
+                    upload_id = uuid.UUID(name.removesuffix('.part'))
+                except ValueError:
+                    continue
+                if not any(
+                    TaskAttachmentUpload.objects.using(alias).filter(pk=upload_id).exists()
+                    for alias in get_task_shards()
+                ):
+                    os.remove(path)
+                    removed += 1
+                continue
+            candidates[name] = path
+            if len(candidates) >= batch_size:
+                flush()
+    if candidates:
+        flush()
+    return removed
@@ -0,0 +1,135 @@
+import datetime
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from backend.serialization import get_serialization_plan
+from backend.utils import decode_cursor, encode_cursor, get_oldest_write_transaction_start, keyset_filter
+from .models import Task, TaskTombstone
+from .serializers import TaskSerializer
+from .sharding import get_task_shards, merge_shards
+
+# 任务按(updated_at, id)读取，使用api_task_updated_id_idx索引
+TASK_CHANGES_ORDERING = ('updated_at', 'id')
+# 墓碑按(deleted_at, id)读取，使用api_tombstone_deleted_idx索引
+TOMBSTONE_CHANGES_ORDERING = ('deleted_at', 'id')
+
+class ChangeCursorExpired(Exception):
+    """同步游标早于墓碑保留期限，客户端需要重新全量同步"""
+
+def get_settled_before(now):
+    """
+    读取变更的时间上界，早于该时间的变更都已提交
+
+    updated_at和deleted_at由应用在写入时生成，早于事务提交的时间。上界为TASK_CHANGES_SETTLE_SECONDS秒之前；
+    PostgreSQL上还不晚于各分片上仍未结束的写事务的开始时间（同样减去该秒数），
+    运行较久的事务提交的行不会落在已经越过的游标之前。被遗忘的事务由idle_in_transaction_session_timeout结束
+
+    Args:
+        now: 当前时间
+
+    Returns:
+        datetime: 时间上界
+    """
+    settle = datetime.timedelta(seconds=settings.TASK_CHANGES_SETTLE_SECONDS)
+    settled_before = now - settle
+    for alias in get_task_shards():
+        started = get_oldest_write_transaction_start(connections[alias])
+        if started is not None:
+            settled_before = min(settled_before, started - settle)
+    return settled_before
+
+def _position(row, names):
+    values = []
+    for name in names:
+        value = row[name] if isinstance(row, dict) else getattr(row, name)
+        values.append(value.isoformat() if isinstance(value, datetime.datetime) else value)
+    return values
+
+def _parse_position(position):
+    """校验游标中的位置[ISO时间, ID]，返回解析后的时间，无效时返回None"""
+    if not isinstance(position, list) or len(position) != 2:
+        return None
+    value, pk = position
+    if not isinstance(value, str) or not isinstance(pk, int) or isinstance(pk, bool):
+        return None
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        return None
+
+def _parse_cursor(cursor):
+    data = decode_cursor(cursor)
+    if not isinstance(data, dict):
+        raise ValidationError({'changed_since': '无效的游标'})
+    task_position, tombstone_position = data.get('t'), data.get('d')
+    deleted_at = _parse_position(tombstone_position)
+    if deleted_at is None or task_position is not None and _parse_position(task_position) is None:
+        raise ValidationError({'changed_since': '无效的游标'})
+    return task_position, tombstone_position, deleted_at
+
+def get_task_changes(changed_since, page_size=100, fields=None):
+    """
+    读取游标之后的任务变更
+
+    任务和墓碑分别按(updated_at, id)和(deleted_at, id)的游标读取，每次各最多返回page_size条。
+    只返回get_settled_before之前的变更，避免游标越过尚未提交的事务写入的数据。
+    首次同步（changed_since为空）返回全部任务，不返回在此之前删除的任务
+
+    Args:
+        changed_since: 上次同步返回的next_cursor，首次同步为空
+        page_size: 每次最多返回的任务数和墓碑数
+        fields: 任务只输出的字段，为None时输出全部字段
+
+    Returns:
+        tuple: (变更的任务列表, 删除的任务列表, 下次同步的游标, 是否还有更多变更)
+
+    Raises:
+        ValidationError: 游标格式无效
+        ChangeCursorExpired: 游标早于墓碑保留期限
+    """
+    now = timezone.now()
+    settled_before = get_settled_before(now)
+    if changed_since:
+        task_position, tombstone_position, deleted_at = _parse_cursor(changed_since)
+        if deleted_at < now - datetime.timedelta(days=settings.TASK_TOMBSTONE_RETENTION_DAYS):
+            raise ChangeCursorExpired()
+    else:
+        task_position, tombstone_position = None, [settled_before.isoformat(), 0]
+
+    # 新增和更新的任务
+    # 启用分片时各分片按相同的游标读取后归并
+    tasks = merge_shards(Task.objects.order_by(*TASK_CHANGES_ORDERING)).filter(updated_at__lt=settled_before)
+    if task_position is not None:
+        tasks = tasks.filter(keyset_filter(TASK_CHANGES_ORDERING, task_position))
+    plan = get_serialization_plan(TaskSerializer, fields)
+    if plan is not None:
+        tasks = tasks.values(*dict.fromkeys(plan.sources + TASK_CHANGES_ORDERING))
+    rows = list(tasks[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if rows:
+        task_position = _position(rows[-1], TASK_CHANGES_ORDERING)
+    upserted = plan.serialize(rows) if plan is not None else TaskSerializer(rows, many=True, fields=fields).data
+
+    # 删除的任务
+    tombstones = list(
+        merge_shards(TaskTombstone.objects.order_by(*TOMBSTONE_CHANGES_ORDERING))
+        .filter(deleted_at__lt=settled_before)
+        .filter(keyset_filter(TOMBSTONE_CHANGES_ORDERING, tombstone_position))
+        .values('id', 'task_id', 'deleted_at')[:page_size + 1]
+    )
+    has_more = has_more or len(tombstones) > page_size
+    tombstones = tombstones[:page_size]
+    if tombstones:
+        tombstone_position = _position(tombstones[-1], TOMBSTONE_CHANGES_ORDERING)
+    datetime_field = serializers.DateTimeField()
+    deleted = [
+        {'id': row['task_id'], 'deleted_at': datetime_field.to_representation(row['deleted_at'])}
+        for row in tombstones
+    ]
+
+    next_cursor = encode_cursor({'t': task_position, 'd': tombstone_position})
+    return upserted, deleted, next_cursor, has_more
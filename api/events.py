@@ -0,0 +1,271 @@
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+class EventBackend(ABC):
+    """
+    任务事件后端抽象基类
+
+    负责把事件从写入任务的进程送到所有提供事件流的进程
+    """
+
+    @abstractmethod
+    def publish(self, message):
+        """
+        发布事件
+
+        Args:
+            message: 可JSON序列化的字典
+        """
+        pass
+
+    @abstractmethod
+    def start(self, callback):
+        """
+        开始接收事件，每收到一条事件调用callback(message)，callback可能在任意线程中调用
+
+        Args:
+            callback: 接收事件的函数
+        """
+        pass
+
+class LocalEventBackend(EventBackend):
+    """进程内事件后端，事件只在当前进程内广播，用于开发环境、测试和单进程部署"""
+
+    def __init__(self):
+        self._callback = None
+
+    def publish(self, message):
+        if self._callback is not None:
+            self._callback(message)
+
+    def start(self, callback):
+        self._callback = callback
+
+class PostgresEventBackend(EventBackend):
+    """
+    基于PostgreSQL LISTEN/NOTIFY的事件后端
+
+    发布时执行pg_notify，每个提供事件流的进程使用一个独立的数据库连接LISTEN，
+    所有进程按相同的顺序收到事件。需要psycopg2，单条事件不能超过8000字节
+    """
+    channel = 'task_events'
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def publish(self, message):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, json.dumps(message)])
+
+    def start(self, callback):
+        thread = threading.Thread(
+            target=self._listen, args=(callback,), name='task-events-listener', daemon=True
+        )
+        thread.start()
+
+    def _listen(self, callback):
+        while True:
+            try:
+                wrapper = connections[self.using]
+                connection = wrapper.get_new_connection(wrapper.get_connection_params())
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                while True:
+                    if select.select([connection], [], [], 60) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        callback(json.loads(notify.payload))
+            except Exception:
+                logger.exception("任务事件监听连接异常，5秒后重新连接")
+                time.sleep(5)
+
+class Subscriber:
+    """
+    事件流订阅者
+
+    每个订阅者有一个有界队列，队列满（客户端读取过慢）时标记为落后并不再入队，
+    事件流发送完已入队的事件后关闭，客户端带Last-Event-ID重连后从缓冲区补发
+    """
+
+    def __init__(self, loop, max_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(max_size)
+        self.lagged = False
+
+    def deliver(self, message):
+        """在订阅者的事件循环中调用"""
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+class TaskEventBroadcaster:
+    """
+    进程内的任务事件广播器
+
+    从事件后端接收事件，保存在长度为TASK_EVENTS_BUFFER_SIZE的环形缓冲区中，
+    再分发给当前进程的所有订阅者。事件后端在第一个订阅者出现时才开始接收
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._buffer = deque(maxlen=settings.TASK_EVENTS_BUFFER_SIZE)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._started = False
+        self._counter = itertools.count()
+        self._stats = {
+            'published': 0,
+            'received': 0,
+            'lagged': 0,
+        }
+
+    def make_event_id(self):
+        """生成事件ID，只要求唯一，顺序以缓冲区中的顺序为准"""
+        return f"{time.time_ns():x}-{next(self._counter):x}"
+
+    def publish(self, action, pks=None):
+        """
+        发布任务变更事件
+
+        Args:
+            action: 变更类型，可选值包括 create, update, delete
+            pks: 变更的任务ID列表，数量超过TASK_EVENTS_MAX_IDS或未知时为None
+        """
+        if pks is not None and len(pks) > settings.TASK_EVENTS_MAX_IDS:
+            pks = None
+        message = {'id': self.make_event_id(), 'action': action, 'ids': pks}
+        self.backend.publish(message)
+        with self._lock:
+            self._stats['published'] += 1
+
+    def _receive(self, message):
+        with self._lock:
+            self._buffer.append(message)
+            self._stats['received'] += 1
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.deliver, message)
+
+    def subscribe(self, last_event_id=None):
+        """
+        订阅事件，必须在事件循环中调用
+
+        Args:
+            last_event_id: 客户端收到的最后一个事件ID，重连时传入
+
+        Returns:
+            tuple: (订阅者, 需要补发的事件列表)，last_event_id已不在缓冲区时补发列表为None，
+            客户端需要重新获取全部数据
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._started:
+                self.backend.start(self._receive)
+                self._started = True
+
+            backlog = []
+            if last_event_id:
+                ids = [message['id'] for message in self._buffer]
+                if last_event_id in ids:
+                    backlog = list(self._buffer)[ids.index(last_event_id) + 1:]
+                else:
+                    backlog = None
+
+            subscriber = Subscriber(loop, settings.TASK_EVENTS_QUEUE_SIZE)
+            self._subscribers.add(subscriber)
+        return subscriber, backlog
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if subscriber.lagged:
+                self._stats['lagged'] += 1
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def get_stats(self):
+        """获取当前进程的事件统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['subscribers'] = len(self._subscribers)
+            stats['buffered'] = len(self._buffer)
+        stats['backend'] = type(self.backend).__name__
+        return stats
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+def get_task_broadcaster():
+    """获取任务事件广播器，事件后端由TASK_EVENTS_BACKEND指定"""
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                _broadcaster = TaskEventBroadcaster(import_string(settings.TASK_EVENTS_BACKEND)())
+    return _broadcaster
+
+def format_event(message):
+    """
+    格式化为SSE事件文本
+
+    Args:
+        message: 事件字典，包含id和action
+
+    Returns:
+        str: SSE事件
+    """
+    data = json.dumps({'action': message['action'], 'ids': message.get('ids')})
+    return f"id: {message['id']}\nevent: {message['action']}\ndata: {data}\n\n"
+
+async def stream_task_events(broadcaster, subscriber, backlog):
+    """
+    生成SSE事件流
+
+    先补发缓冲区中的事件（或在无法补发时发送reset事件），再等待新事件，
+    空闲TASK_EVENTS_HEARTBEAT秒发送一次注释作为心跳。订阅者落后时发送完已入队的事件后结束事件流
+
+    Yields:
+        str: SSE文本
+    """
+    try:
+        yield f"retry: {settings.TASK_EVENTS_RETRY_MS}\n\n"
+        if backlog is None:
+            yield 'event: reset\ndata: {}\n\n'
+        else:
+            for message in backlog:
+                yield format_event(message)
+
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=settings.TASK_EVENTS_HEARTBEAT
+                )
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield format_event(message)
+            if subscriber.lagged and subscriber.queue.empty():
+                # 队列曾经溢出，发送完已入队的事件后断开，客户端重连后从缓冲区补发其余事件
+                break
+    finally:
+        broadcaster.unsubscribe(subscriber)
@@ -0,0 +1,89 @@
+import csv
+import itertools
+from rest_framework.utils.encoders import JSONEncoder
+from backend.serialization import get_serialization_plan
+from .serializers import TaskSerializer
+
+# 支持的导出格式: (Content-Type, 文件扩展名)
+TASK_EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+class _Echo:
+    """只返回写入内容的伪文件对象，供csv.writer逐行生成CSV文本"""
+
+    def write(self, value):
+        return value
+
+def iter_serialized_tasks(queryset, fields=None, chunk_size=2000):
+    """
+    逐块读取并序列化任务
+
+    使用QuerySet.iterator(chunk_size)读取，PostgreSQL上使用服务端游标，
+    内存占用只与chunk_size有关，与导出的总行数无关。
+    TaskSerializer支持快速序列化时用.values()读取，否则逐块使用完整的序列化器
+
+    Args:
+        queryset: 已过滤和排序的任务查询集
+        fields: 只输出的字段，为None时输出全部字段
+        chunk_size: 每次从数据库读取的行数
+
+    Yields:
+        dict: 与TaskSerializer输出相同的字典
+    """
+    plan = get_serialization_plan(TaskSerializer, fields)
+    if plan is not None:
+        rows = queryset.values(*plan.sources).iterator(chunk_size=chunk_size)
+    else:
+        rows = queryset.iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        if plan is not None:
+            yield from plan.serialize(chunk)
+        else:
+            yield from TaskSerializer(chunk, many=True, fields=fields).data
+
+def stream_tasks_ndjson(queryset, fields=None, chunk_size=2000):
+    """
+    以NDJSON格式逐行生成任务，每行一个JSON对象
+
+    Yields:
+        str: 以换行结尾的JSON文本
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+    for item in iter_serialized_tasks(queryset, fields, chunk_size):
+        yield encoder.encode(item) + '\n'
+
+def stream_tasks_csv(queryset, fields=None, chunk_size=2000):
+    """
+    以CSV格式逐行生成任务，第一行为表头，空值输出为空字符串
+
+    Yields:
+        str: 一行CSV文本
+    """
+    names = fields or TaskSerializer.Meta.fields
+    writer = csv.writer(_Echo())
+    yield writer.writerow(names)
+    for item in iter_serialized_tasks(queryset, fields, chunk_size):
+        yield writer.writerow(['' if item[name] is None else item[name] for name in names])
+
+def stream_tasks(queryset, export_format, fields=None, chunk_size=2000):
+    """
+    按导出格式逐行生成任务
+
+    Args:
+        queryset: 已过滤和排序的任务查询集
+        export_format: TASK_EXPORT_FORMATS中的格式
+        fields: 只输出的字段，为None时输出全部字段
+        chunk_size: 每次从数据库读取的行数
+
+    Returns:
+        generator: 逐行生成的文本
+    """
+    if export_format == 'csv':
+        return stream_tasks_csv(queryset, fields, chunk_size)
+    return stream_tasks_ndjson(queryset, fields, chunk_size)
@@ -0,0 +1,118 @@
+import datetime
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from .models import Task
+
+# 支持的排序字段，每种排序都追加id作为唯一的次级排序字段，
+# 与Task.Meta.indexes中的复合索引一一对应
+TASK_ORDERINGS = {
+    'created_at': ('created_at', 'id'),
+    '-created_at': ('-created_at', '-id'),
+    'updated_at': ('updated_at', 'id'),
+    '-updated_at': ('-updated_at', '-id'),
+}
+TASK_DEFAULT_ORDERING = '-created_at'
+
+# 时间范围过滤参数，参数名: 查询条件
+TASK_RANGE_FILTERS = {
+    'created_after': 'created_at__gte',
+    'created_before': 'created_at__lt',
+    'updated_after': 'updated_at__gte',
+    'updated_before': 'updated_at__lt',
+    'due_after': 'due_at__gte',
+    'due_before': 'due_at__lt',
+}
+
+def parse_datetime_param(name, value):
+    """
+    解析时间参数，支持ISO 8601格式的日期时间或日期
+
+    Raises:
+        ValidationError: 格式无效
+    """
+    parsed = None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            date = parse_date(value)
+            if date is not None:
+                parsed = datetime.datetime.combine(date, datetime.time.min)
+    except (TypeError, ValueError):
+        # 非字符串（如JSON请求体中的数字）和超出范围的日期
+        pass
+    if parsed is None:
+        raise ValidationError({name: '无效的时间格式'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def filter_tasks(queryset, params):
+    """
+    按参数过滤任务
+
+    Args:
+        queryset: 任务查询集
+        params: 过滤参数，支持以下键：
+            - status: 任务状态，多个状态用逗号分隔或传入列表
+            - owner_id: 所有者ID
+            - created_after / created_before: 创建时间范围
+            - updated_after / updated_before: 更新时间范围
+            - due_after / due_before: 截止时间范围
+
+    Returns:
+        QuerySet: 过滤后的查询集
+
+    Raises:
+        ValidationError: 参数无效
+    """
+    status = params.get('status')
+    if status:
+        statuses = status.split(',') if isinstance(status, str) else list(status)
+        valid_statuses = {choice for choice, _ in Task.STATUS_CHOICES}
+        invalid = [s for s in statuses if s not in valid_statuses]
+        if invalid:
+            raise ValidationError({'status': f"无效的任务状态: {','.join(invalid)}"})
+        if len(statuses) == 1:
+            queryset = queryset.filter(status=statuses[0])
+        else:
+            queryset = queryset.filter(status__in=statuses)
+
+    owner_id = params.get('owner_id')
+    if owner_id:
+        try:
+            queryset = queryset.filter(owner_id=int(owner_id))
+        except (TypeError, ValueError):
+            raise ValidationError({'owner_id': '所有者ID必须是整数'})
+
+    for name, lookup in TASK_RANGE_FILTERS.items():
+        value = params.get(name)
+        if value:
+            queryset = queryset.filter(**{lookup: parse_datetime_param(name, value)})
+
+    return queryset
+
+def get_task_ordering(params):
+    """
+    获取任务列表的排序字段
+
+    Args:
+        params: 请求参数，ordering为排序字段，只允许TASK_ORDERINGS中的值
+
+    Returns:
+        tuple: 排序字段
+
+    Raises:
+        ValidationError: 排序字段不在白名单中
+    """
+    ordering = params.get('ordering') or TASK_DEFAULT_ORDERING
+    if ordering not in TASK_ORDERINGS:
+        raise ValidationError({'ordering': f"不支持的排序字段，可选值: {', '.join(TASK_ORDERINGS)}"})
+    return TASK_ORDERINGS[ordering]
+
+class TaskFilterBackend(BaseFilterBackend):
+    """任务过滤器，参见filter_tasks"""
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_tasks(queryset, request.query_params)
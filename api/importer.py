@@ -0,0 +1,133 @@
+import csv
+import itertools
+import json
+from rest_framework.exceptions import ValidationError
+from .models import Task
+from .serializers import TaskSerializer
+from .sharding import task_shards_atomic
+
+# 支持的导入格式，与导出格式相同
+TASK_IMPORT_FORMATS = ('ndjson', 'csv')
+
+def iter_text_lines(stream):
+    """
+    逐行读取二进制流并按UTF-8解码，忽略开头的BOM
+
+    Args:
+        stream: 支持readline()的二进制流，如request.stream或打开的文件
+
+    Yields:
+        str: 解码后的一行，保留换行符
+    """
+    if stream is None:
+        return
+    first = True
+    for line in iter(stream.readline, b''):
+        text = line.decode('utf-8', errors='replace')
+        if first:
+            text = text.lstrip('\ufeff')
+            first = False
+        yield text
+
+def parse_ndjson(lines):
+    """
+    解析NDJSON，每行一个JSON对象，忽略空行
+
+    Yields:
+        tuple: (行号, 字典, 解析错误)，解析失败时字典为None
+    """
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield line_no, None, '无效的JSON'
+            continue
+        if not isinstance(item, dict):
+            yield line_no, None, '每行必须是JSON对象'
+            continue
+        yield line_no, item, None
+
+def parse_csv(lines):
+    """
+    解析CSV，第一行为表头，空值视为未传该字段
+
+    Yields:
+        tuple: (行号, 字典, 解析错误)
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip() for name in header]
+    for row in reader:
+        if not any(row):
+            continue
+        if len(row) != len(header):
+            yield reader.line_num, None, f"列数与表头不一致: {len(row)} != {len(header)}"
+            continue
+        yield reader.line_num, {name: value for name, value in zip(header, row) if value != ''}, None
+
+def import_tasks(stream, import_format='ndjson', chunk_size=1000, batch_size=500, max_errors=100,
+                 owner_id=None):
+    """
+    流式导入任务
+
+    逐行解析输入，每chunk_size行校验一次，校验通过的行在一个事务中用
+    bulk_create(batch_size=batch_size)写入，内存占用只与chunk_size有关。
+    某一行校验失败不影响其他行，只记录错误
+
+    Args:
+        stream: 支持readline()的二进制流
+        import_format: TASK_IMPORT_FORMATS中的格式
+        chunk_size: 每次校验和提交的行数
+        batch_size: bulk_create每条INSERT语句的行数
+        max_errors: 汇总中最多返回的错误数，超过后只计数
+        owner_id: 导入任务的所有者ID
+
+    Returns:
+        dict: 导入汇总，包含total、created、failed、errors和errors_truncated
+    """
+    parse = parse_csv if import_format == 'csv' else parse_ndjson
+    records = parse(iter_text_lines(stream))
+    serializer = TaskSerializer()
+    summary = {
+        'total': 0,
+        'created': 0,
+        'failed': 0,
+        'errors': [],
+        'errors_truncated': False,
+    }
+
+    def add_error(line_no, errors):
+        summary['failed'] += 1
+        if len(summary['errors']) < max_errors:
+            summary['errors'].append({'line': line_no, 'errors': errors})
+        else:
+            summary['errors_truncated'] = True
+
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            break
+        summary['total'] += len(chunk)
+
+        tasks = []
+        for line_no, item, error in chunk:
+            if error is not None:
+                add_error(line_no, error)
+                continue
+            try:
+                attrs = serializer.run_validation(item)
+            except ValidationError as exc:
+                add_error(line_no, exc.detail)
+                continue
+            tasks.append(Task(**attrs, owner_id=owner_id))
+
+        if tasks:
+            with task_shards_atomic():
+                Task.objects.bulk_create(tasks, batch_size=batch_size)
+            summary['created'] += len(tasks)
+
+    return summary
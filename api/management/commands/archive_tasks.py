@@ -0,0 +1,25 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.archive import archive_tasks
+from api.sharding import get_task_shards
+
+class Command(BaseCommand):
+    help = '把完成或取消超过指定天数的任务分批移到归档表，建议每天定时执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TASK_ARCHIVE_AFTER_DAYS,
+                            help='归档最后更新超过该天数的任务，默认为TASK_ARCHIVE_AFTER_DAYS')
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_ARCHIVE_BATCH_SIZE,
+                            help='每个事务归档的任务数')
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='最多执行的批数，默认直到没有可归档的任务')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - datetime.timedelta(days=options['days'])
+        archived = sum(
+            archive_tasks(before, options['batch_size'], options['max_batches'], using=alias)
+            for alias in get_task_shards()
+        )
+        self.stdout.write(self.style.SUCCESS(f"已归档{archived}个{before:%Y-%m-%d %H:%M:%S}之前完成或取消的任务"))
@@ -0,0 +1,63 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+from backend.serialization import get_serialization_plan
+from api.models import Task
+from api.serializers import TaskSerializer
+
+class _Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = '比较任务列表完整序列化和快速序列化的耗时，并检查两者输出是否相同'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=1000, help='每页数量')
+        parser.add_argument('--repeat', type=int, default=20, help='重复次数')
+        parser.add_argument('--fields', default='', help='只输出的字段（逗号分隔）')
+
+    def handle(self, *args, **options):
+        size = options['page_size']
+        fields = [name for name in options['fields'].split(',') if name] or None
+        plan = get_serialization_plan(TaskSerializer, fields)
+        if plan is None:
+            raise CommandError('TaskSerializer包含快速序列化不支持的字段')
+
+        # 任务不足时临时创建，测试结束后回滚
+        try:
+            with transaction.atomic():
+                missing = size - Task.objects.count()
+                if missing > 0:
+                    Task.objects.bulk_create(
+                        Task(title=f"基准测试任务{i}", description='基准测试' * 20) for i in range(missing)
+                    )
+                self.run(plan, size, fields, options['repeat'])
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def run(self, plan, size, fields, repeat):
+        queryset = Task.objects.order_by('-created_at', '-id')
+
+        def full():
+            return TaskSerializer(list(queryset[:size]), many=True, fields=fields).data
+
+        def fast():
+            return plan.serialize(queryset.values(*plan.sources)[:size])
+
+        encoder = JSONEncoder()
+        if encoder.encode(full()) != encoder.encode(fast()):
+            raise CommandError('快速序列化的输出与TaskSerializer不同')
+
+        results = {}
+        for name, func in (('full', full), ('fast', fast)):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            results[name] = (time.perf_counter() - started) * 1000 / repeat
+            self.stdout.write(f"{name}: {results[name]:.2f} ms/页（{size}条）")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"输出相同，快速序列化提速 {results['full'] / results['fast']:.1f} 倍"
+        ))
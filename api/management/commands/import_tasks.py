@@ -0,0 +1,50 @@
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.importer import TASK_IMPORT_FORMATS, import_tasks
+
+class Command(BaseCommand):
+    help = '从NDJSON或CSV文件流式导入任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='文件路径，-表示标准输入')
+        parser.add_argument('--format', dest='import_format', choices=TASK_IMPORT_FORMATS,
+                            help='导入格式，默认按文件扩展名判断')
+        parser.add_argument('--chunk-size', type=int, default=settings.TASK_IMPORT_CHUNK_SIZE,
+                            help='每次校验和提交的行数')
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_IMPORT_BATCH_SIZE,
+                            help='每条INSERT语句的行数')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['import_format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+
+        started = time.monotonic()
+        if path == '-':
+            summary = self.run(sys.stdin.buffer, import_format, options)
+        else:
+            try:
+                with open(path, 'rb') as stream:
+                    summary = self.run(stream, import_format, options)
+            except OSError as exc:
+                raise CommandError(f"无法读取文件: {exc}")
+        elapsed = time.monotonic() - started
+
+        for error in summary['errors']:
+            self.stdout.write(self.style.ERROR(f"第{error['line']}行: {error['errors']}"))
+        if summary['errors_truncated']:
+            self.stdout.write(self.style.WARNING('错误过多，只显示前面的部分'))
+        rate = summary['total'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"共{summary['total']}行，导入{summary['created']}行，失败{summary['failed']}行，"
+            f"耗时{elapsed:.2f}秒（{rate:.0f}行/秒）"
+        ))
+
+    def run(self, stream, import_format, options):
+        return import_tasks(
+            stream, import_format,
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            max_errors=settings.TASK_IMPORT_MAX_ERRORS
+        )
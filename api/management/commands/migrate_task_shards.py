@@ -0,0 +1,11 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from api.sharding import get_task_shards
+
+class Command(BaseCommand):
+    help = '在default和所有任务分片上执行数据库迁移，其他分片只迁移api应用'
+
+    def handle(self, *args, **options):
+        for alias in get_task_shards():
+            self.stdout.write(f"迁移数据库 {alias}")
+            call_command('migrate', database=alias, interactive=False, verbosity=options['verbosity'])
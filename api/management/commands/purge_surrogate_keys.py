@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from backend.surrogate_keys import TASK_COLLECTION_KEY, TASK_ITEM_KEY, get_purge_queue
+
+class Command(BaseCommand):
+    help = '按Surrogate-Key清除代理层缓存，用于绕过ORM直接修改数据库之后'
+
+    def add_arguments(self, parser):
+        parser.add_argument('keys', nargs='*',
+                            help=f"要清除的键，如{TASK_COLLECTION_KEY}、task-12、user-3，默认清除所有任务的响应")
+
+    def handle(self, *args, **options):
+        keys = options['keys'] or [TASK_COLLECTION_KEY, TASK_ITEM_KEY]
+        queue = get_purge_queue()
+        queue.add(keys)
+        queue.flush()
+        self.stdout.write(self.style.SUCCESS(f"已清除: {' '.join(keys)}"))
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.attachments import purge_attachments
+
+class Command(BaseCommand):
+    help = '清理过期的附件上传、已删除任务的附件和不再被引用的附件文件，建议每天定时执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=settings.TASK_ATTACHMENT_UPLOAD_EXPIRE_HOURS,
+                            help='未完成的上传和未被引用的文件保留的小时数，默认为TASK_ATTACHMENT_UPLOAD_EXPIRE_HOURS')
+
+    def handle(self, *args, **options):
+        result = purge_attachments(options['hours'])
+        self.stdout.write(self.style.SUCCESS(
+            f"已清理{result['uploads']}个过期的上传、{result['attachments']}个已删除任务的附件和{result['files']}个文件"
+        ))
@@ -0,0 +1,20 @@
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import TaskTombstone
+from api.sharding import shard_querysets
+
+class Command(BaseCommand):
+    help = '清理超过保留期限的已删除任务墓碑，建议每天定时执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TASK_TOMBSTONE_RETENTION_DAYS,
+                            help='保留天数，默认为TASK_TOMBSTONE_RETENTION_DAYS')
+
+    def handle(self, *args, **options):
+        boundary = timezone.now() - datetime.timedelta(days=options['days'])
+        deleted = sum(
+            queryset.delete()[0] for queryset in shard_querysets(TaskTombstone.objects.filter(deleted_at__lt=boundary))
+        )
+        self.stdout.write(self.style.SUCCESS(f"已清理{deleted}条{boundary:%Y-%m-%d %H:%M:%S}之前的墓碑"))
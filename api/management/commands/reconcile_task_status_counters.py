@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from api.models import TaskStatusCounter
+from api.sharding import get_task_shards
+
+class Command(BaseCommand):
+    help = '重新统计各状态的任务数量，修复计数表的偏差，建议定期执行或在直接修改数据库后执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只报告偏差，不修改计数表')
+
+    def handle(self, *args, **options):
+        for alias in get_task_shards():
+            self.reconcile(alias, options['dry_run'])
+
+    def reconcile(self, alias, dry_run):
+        drift = TaskStatusCounter.reconcile(using=alias, dry_run=dry_run)
+        if not drift:
+            self.stdout.write(self.style.SUCCESS(f"[{alias}] 任务状态计数与任务表一致"))
+            return
+        for status, (stored, actual) in drift.items():
+            self.stdout.write(f"[{alias}] {status}: 计数表 {stored}，实际 {actual}")
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"[{alias}] {len(drift)}个状态的计数有偏差，未修改"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"[{alias}] 已修复{len(drift)}个状态的计数"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from api.sharding import get_task_shards
+from backend.utils import get_table_sizes
+
+# 输出大小的数据表
+TABLES = ('api_task', 'api_archivedtask')
+
+class Command(BaseCommand):
+    help = '输出任务表、归档表及其各个索引占用的空间，可以在迁移前后分别执行以对比大小'
+
+    def handle(self, *args, **options):
+        for alias in get_task_shards():
+            for table in TABLES:
+                self.report(alias, table)
+
+    def report(self, alias, table):
+        sizes = get_table_sizes(connections[alias], table)
+        if sizes is None:
+            self.stdout.write(self.style.WARNING(f"[{alias}] {table}: 当前数据库不支持统计表大小"))
+            return
+        self.stdout.write(f"[{alias}] {table}: 表 {sizes['table']} 字节")
+        for name, size in sizes['indexes'].items():
+            self.stdout.write(f"[{alias}]   {name}: {size} 字节")
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from api.archive import restore_archived_tasks
+from api.filters import parse_datetime_param
+from api.models import ArchivedTask
+from api.sharding import shard_querysets
+
+class Command(BaseCommand):
+    help = '把归档的任务恢复到任务表'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='要恢复的任务ID')
+        parser.add_argument('--archived-after', help='恢复在该时间之后归档的任务（ISO 8601格式）')
+        parser.add_argument('--all', action='store_true', help='恢复全部归档的任务')
+        parser.add_argument('--batch-size', type=int, default=settings.TASK_ARCHIVE_BATCH_SIZE,
+                            help='每个事务恢复的任务数')
+
+    def handle(self, *args, **options):
+        queryset = ArchivedTask.objects.all()
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+        if options['archived_after']:
+            try:
+                archived_after = parse_datetime_param('archived_after', options['archived_after'])
+            except ValidationError:
+                raise CommandError('无效的时间格式')
+            queryset = queryset.filter(archived_at__gte=archived_after)
+        if not (options['ids'] or options['archived_after'] or options['all']):
+            raise CommandError('请指定任务ID、--archived-after或--all')
+
+        restored = sum(
+            restore_archived_tasks(part, options['batch_size']) for part in shard_querysets(queryset)
+        )
+        self.stdout.write(self.style.SUCCESS(f"已恢复{restored}个任务"))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from api.events import LocalEventBackend
+from api.scheduler import TASK_DUE_ACTIONS, DueScheduler
+
+class Command(BaseCommand):
+    help = '运行任务截止时间调度进程，到期前推送reminder事件，到期时推送due事件或自动取消任务。只需运行一个实例'
+
+    def handle(self, *args, **options):
+        if settings.TASK_DUE_ACTION not in TASK_DUE_ACTIONS:
+            raise CommandError(f"TASK_DUE_ACTION必须是: {', '.join(TASK_DUE_ACTIONS)}")
+        if settings.TASK_EVENTS_ENABLED and issubclass(import_string(settings.TASK_EVENTS_BACKEND), LocalEventBackend):
+            # 任务变更通过数据库轮询读取，不受影响；但推送的reminder和due事件只能送达调度进程自己
+            raise CommandError(
+                "TASK_EVENTS_BACKEND为进程内的事件后端，reminder和due事件无法送达Web进程中的事件流连接，"
+                "请设置TASK_EVENTS_BACKEND=api.events.PostgresEventBackend，或设置TASK_EVENTS_ENABLED=False不推送事件"
+            )
+        scheduler = DueScheduler()
+        self.stdout.write(
+            f"任务调度进程已启动，到期处理: {scheduler.action}，窗口: {settings.TASK_SCHEDULER_WINDOW}秒，"
+            f"最多加载{scheduler.max_loaded}个定时器"
+        )
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            self.stdout.write(f"任务调度进程已停止: {scheduler.stats}")
@@ -0,0 +1,71 @@
+"""
+任务全文索引
+
+SQLite使用FTS5外部内容表，由触发器在插入、更新和删除时增量维护；PostgreSQL使用tsvector表达式上的GIN索引。
+SQL在迁移中固定下来，不随api.search变化
+"""
+from django.db import migrations
+
+SQLITE_CREATE_SQL = [
+    # 外部内容表，只保存索引，不重复保存标题和描述
+    """CREATE VIRTUAL TABLE IF NOT EXISTS api_task_fts
+       USING fts5(title, description, content='api_task', content_rowid='id')""",
+    "DROP TRIGGER IF EXISTS api_task_fts_insert",
+    "DROP TRIGGER IF EXISTS api_task_fts_delete",
+    "DROP TRIGGER IF EXISTS api_task_fts_update",
+    """CREATE TRIGGER api_task_fts_insert AFTER INSERT ON api_task BEGIN
+           INSERT INTO api_task_fts(rowid, title, description)
+           VALUES (new.id, new.title, new.description);
+       END""",
+    """CREATE TRIGGER api_task_fts_delete AFTER DELETE ON api_task BEGIN
+           INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+           VALUES ('delete', old.id, old.title, old.description);
+       END""",
+    """CREATE TRIGGER api_task_fts_update AFTER UPDATE OF title, description ON api_task BEGIN
+           INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+           VALUES ('delete', old.id, old.title, old.description);
+           INSERT INTO api_task_fts(rowid, title, description)
+           VALUES (new.id, new.title, new.description);
+       END""",
+    "INSERT INTO api_task_fts(api_task_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS api_task_fts_insert",
+    "DROP TRIGGER IF EXISTS api_task_fts_delete",
+    "DROP TRIGGER IF EXISTS api_task_fts_update",
+    "DROP TABLE IF EXISTS api_task_fts",
+]
+
+PG_CREATE_SQL = [
+    "CREATE INDEX IF NOT EXISTS api_task_search_idx ON api_task USING GIN "
+    "(to_tsvector('simple', coalesce(api_task.title, '') || ' ' || coalesce(api_task.description, '')))",
+]
+
+PG_DROP_SQL = [
+    "DROP INDEX IF EXISTS api_task_search_idx",
+]
+
+
+def run_statements(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def forwards(apps, schema_editor):
+    run_statements(schema_editor, {'sqlite': SQLITE_CREATE_SQL, 'postgresql': PG_CREATE_SQL})
+
+
+def backwards(apps, schema_editor):
+    run_statements(schema_editor, {'sqlite': SQLITE_DROP_SQL, 'postgresql': PG_DROP_SQL})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_task_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 10:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_task_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(verbose_name='任务ID')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='删除时间')),
+            ],
+            options={
+                'verbose_name': '任务墓碑',
+                'verbose_name_plural': '任务墓碑',
+                'indexes': [models.Index(fields=['deleted_at', 'id'], name='api_tombstone_deleted_idx')],
+            },
+        ),
+    ]
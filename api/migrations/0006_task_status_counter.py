@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 10:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    """按现有任务统计各状态的初始数量"""
+    Task = apps.get_model('api', 'Task')
+    TaskStatusCounter = apps.get_model('api', 'TaskStatusCounter')
+    using = schema_editor.connection.alias
+    rows = Task.objects.using(using).order_by().values('status').annotate(total=Count('pk'))
+    TaskStatusCounter.objects.using(using).bulk_create(
+        TaskStatusCounter(status=row['status'], count=row['total']) for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_task_tombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20, unique=True, verbose_name='状态')),
+                ('count', models.BigIntegerField(default=0, verbose_name='数量')),
+            ],
+            options={
+                'verbose_name': '任务状态计数',
+                'verbose_name_plural': '任务状态计数',
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 10:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_task_status_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200, verbose_name='标题')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='描述')),
+                ('status', models.CharField(choices=[('pending', '待处理'), ('in_progress', '进行中'), ('completed', '已完成'), ('cancelled', '已取消')], max_length=20, verbose_name='状态')),
+                ('created_at', models.DateTimeField(verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(verbose_name='更新时间')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='归档时间')),
+            ],
+            options={
+                'verbose_name': '已归档任务',
+                'verbose_name_plural': '已归档任务',
+                'indexes': [models.Index(fields=['created_at', 'id'], name='api_archived_created_id_idx'), models.Index(fields=['updated_at', 'id'], name='api_archived_updated_id_idx'), models.Index(fields=['archived_at'], name='api_archived_archived_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_archived_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskIdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_value', models.BigIntegerField(default=1, verbose_name='下一个序号')),
+            ],
+            options={
+                'verbose_name': '任务ID序列',
+                'verbose_name_plural': '任务ID序列',
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='owner_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='所有者ID'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='owner_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='所有者ID'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner_id', 'created_at', 'id'], name='api_task_owner_created_idx'),
+        ),
+    ]
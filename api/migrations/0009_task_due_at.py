@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_task_sharding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtask',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='截止时间'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='截止时间'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('due_at__isnull', False)), fields=['due_at', 'id'], name='api_task_due_idx'),
+        ),
+    ]
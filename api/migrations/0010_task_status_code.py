@@ -0,0 +1,128 @@
+"""
+任务状态改为小整数编码存储（第一步，不在事务中执行）
+
+在大表上直接修改列类型需要在排他锁下重写整张表和所有相关索引，这里分步进行，每一步只持有短时间的锁：
+    1. 添加status_code列，数据库默认值为0（表示尚未转换）。PostgreSQL 11及以上只修改元数据，不重写表
+    2. PostgreSQL上添加触发器，迁移期间仍在运行的旧版本写入status时同步写入status_code
+    3. 按ID范围分批转换已有的行，每批在单独的事务中提交
+    4. 在status_code上建立新的索引，PostgreSQL上使用CREATE INDEX CONCURRENTLY，不阻塞写入
+下一个迁移删除status列并把status_code重命名为status
+"""
+from django.db import migrations, models, transaction
+from django.db.models import Case, Max, Min, Value, When
+
+# 与api.models.TASK_STATUS_CODES相同，迁移中固定下来，不随模型变化
+STATUS_CODES = {
+    'pending': 1,
+    'in_progress': 2,
+    'completed': 3,
+    'cancelled': 4,
+}
+
+# 每批转换的ID范围
+BACKFILL_BATCH_SIZE = 10000
+
+TABLES = ('api_task', 'api_archivedtask')
+
+_PG_CASE = 'CASE NEW.status {} ELSE 0 END'.format(
+    ' '.join(f"WHEN '{name}' THEN {code}" for name, code in STATUS_CODES.items())
+)
+
+PG_CREATE_SYNC_SQL = [
+    f"""CREATE OR REPLACE FUNCTION api_task_status_code_sync() RETURNS trigger AS $$
+        BEGIN
+            NEW.status_code := {_PG_CASE};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql""",
+] + [
+    f"""CREATE TRIGGER {table}_status_code_sync BEFORE INSERT OR UPDATE OF status ON {table}
+        FOR EACH ROW EXECUTE FUNCTION api_task_status_code_sync()"""
+    for table in TABLES
+]
+
+PG_DROP_SYNC_SQL = [
+    f"DROP TRIGGER IF EXISTS {table}_status_code_sync ON {table}" for table in TABLES
+] + [
+    "DROP FUNCTION IF EXISTS api_task_status_code_sync()",
+]
+
+# 按状态过滤、按创建时间或更新时间排序的索引，先用临时名称建立，下一个迁移重命名
+STATUS_CODE_INDEXES = [
+    models.Index(fields=['status_code', 'created_at', 'id'], name='api_task_statcode_created_idx'),
+    models.Index(fields=['status_code', 'updated_at', 'id'], name='api_task_statcode_updated_idx'),
+]
+
+
+def create_status_sync(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in PG_CREATE_SYNC_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_status_sync(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in PG_DROP_SYNC_SQL:
+            schema_editor.execute(sql)
+
+
+def backfill_status_codes(apps, schema_editor):
+    """按ID范围分批转换已有的行，每批一个短事务，只锁定该批的行"""
+    using = schema_editor.connection.alias
+    code = Case(
+        *[When(status=name, then=Value(value)) for name, value in STATUS_CODES.items()],
+        default=Value(0),
+    )
+    for model_name in ('Task', 'ArchivedTask'):
+        manager = apps.get_model('api', model_name)._base_manager.using(using)
+        bounds = manager.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            continue
+        for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_BATCH_SIZE):
+            with transaction.atomic(using=using):
+                manager.filter(
+                    pk__gte=start, pk__lt=start + BACKFILL_BATCH_SIZE, status_code=0
+                ).update(status_code=code)
+
+
+def create_status_code_indexes(apps, schema_editor):
+    model = apps.get_model('api', 'Task')
+    concurrently = schema_editor.connection.vendor == 'postgresql'
+    for index in STATUS_CODE_INDEXES:
+        if concurrently:
+            schema_editor.add_index(model, index, concurrently=True)
+        else:
+            schema_editor.add_index(model, index)
+
+
+def drop_status_code_indexes(apps, schema_editor):
+    model = apps.get_model('api', 'Task')
+    for index in STATUS_CODE_INDEXES:
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    # 分批转换和CREATE INDEX CONCURRENTLY不能在一个事务中执行
+    atomic = False
+
+    dependencies = [
+        ('api', '0009_task_due_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='status_code',
+            field=models.SmallIntegerField(db_default=0, verbose_name='状态'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='status_code',
+            field=models.SmallIntegerField(db_default=0, verbose_name='状态'),
+        ),
+        migrations.RunPython(create_status_sync, drop_status_sync),
+        migrations.RunPython(backfill_status_codes, migrations.RunPython.noop),
+        # 索引只在数据库中建立，模型状态在下一个迁移中更新
+        migrations.RunPython(create_status_code_indexes, drop_status_code_indexes),
+    ]
@@ -0,0 +1,145 @@
+"""
+任务状态改为小整数编码存储（第二步）
+
+删除旧的status列和它的索引，把status_code重命名为status，并把上一个迁移建立的索引改为原来的名称。
+PostgreSQL上删除列、重命名列和索引、删除数据库默认值都只修改元数据，事务只持有很短时间的排他锁。
+迁移开始后仍在运行的旧版本无法再写入状态字符串，应在迁移完成后尽快切换到新版本。
+删除列后PostgreSQL不会立即回收旧值占用的表空间，行被更新或执行VACUUM FULL（或pg_repack）后才会缩小
+"""
+from django.db import migrations, models
+
+import api.models
+
+TABLES = ('api_task', 'api_archivedtask')
+
+PG_DROP_SYNC_SQL = [
+    f"DROP TRIGGER IF EXISTS {table}_status_code_sync ON {table}" for table in TABLES
+] + [
+    "DROP FUNCTION IF EXISTS api_task_status_code_sync()",
+]
+
+# SQLite重建api_task表时会删除全文索引的触发器，这里重新创建。
+# 与0004_task_search_index建立的全文索引相同，迁移中固定下来，不随api.search变化
+SQLITE_SEARCH_TRIGGER_SQL = [
+    "DROP TRIGGER IF EXISTS api_task_fts_insert",
+    "DROP TRIGGER IF EXISTS api_task_fts_delete",
+    "DROP TRIGGER IF EXISTS api_task_fts_update",
+    """CREATE TRIGGER api_task_fts_insert AFTER INSERT ON api_task BEGIN
+           INSERT INTO api_task_fts(rowid, title, description)
+           VALUES (new.id, new.title, new.description);
+       END""",
+    """CREATE TRIGGER api_task_fts_delete AFTER DELETE ON api_task BEGIN
+           INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+           VALUES ('delete', old.id, old.title, old.description);
+       END""",
+    """CREATE TRIGGER api_task_fts_update AFTER UPDATE OF title, description ON api_task BEGIN
+           INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+           VALUES ('delete', old.id, old.title, old.description);
+           INSERT INTO api_task_fts(rowid, title, description)
+           VALUES (new.id, new.title, new.description);
+       END""",
+    "INSERT INTO api_task_fts(api_task_fts) VALUES ('rebuild')",
+]
+
+# (上一个迁移建立的临时索引, 最终的索引)
+STATUS_INDEXES = [
+    ('api_task_statcode_created_idx',
+     models.Index(fields=['status', 'created_at', 'id'], name='api_task_status_created_idx')),
+    ('api_task_statcode_updated_idx',
+     models.Index(fields=['status', 'updated_at', 'id'], name='api_task_status_updated_idx')),
+]
+
+
+def drop_status_sync(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in PG_DROP_SYNC_SQL:
+            schema_editor.execute(sql)
+
+
+def rename_status_indexes(apps, schema_editor):
+    """
+    把临时索引重命名为原来的名称
+
+    SQLite删除列时会重建表，只保留模型状态中的索引，临时索引已不存在，此时重新建立索引
+    """
+    connection = schema_editor.connection
+    model = apps.get_model('api', 'Task')
+    for old_name, index in STATUS_INDEXES:
+        if connection.vendor == 'postgresql':
+            schema_editor.execute(
+                f"ALTER INDEX IF EXISTS {schema_editor.quote_name(old_name)} "
+                f"RENAME TO {schema_editor.quote_name(index.name)}"
+            )
+        else:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(old_name)}")
+            schema_editor.add_index(model, index)
+
+
+def restore_search_index(apps, schema_editor):
+    # PostgreSQL上的全文索引是表达式索引，不受影响
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_SEARCH_TRIGGER_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_task_status_code'),
+    ]
+
+    operations = [
+        # 无法恢复为字符串存储
+        migrations.RunPython(drop_status_sync),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='api_task_status_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='api_task_status_updated_idx',
+        ),
+        migrations.RemoveField(
+            model_name='task',
+            name='status',
+        ),
+        migrations.RemoveField(
+            model_name='archivedtask',
+            name='status',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.RenameField(
+            model_name='archivedtask',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='status',
+            field=api.models.TaskStatusField(
+                choices=[('pending', '待处理'), ('in_progress', '进行中'), ('completed', '已完成'), ('cancelled', '已取消')],
+                default='pending', verbose_name='状态'
+            ),
+        ),
+        migrations.AlterField(
+            model_name='archivedtask',
+            name='status',
+            field=api.models.TaskStatusField(
+                choices=[('pending', '待处理'), ('in_progress', '进行中'), ('completed', '已完成'), ('cancelled', '已取消')],
+                verbose_name='状态'
+            ),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(rename_status_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name='task', index=index) for _, index in STATUS_INDEXES
+            ],
+        ),
+        migrations.RunPython(restore_search_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 10:44
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_task_status_swap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(verbose_name='任务ID')),
+                ('filename', models.CharField(max_length=255, verbose_name='文件名')),
+                ('content_type', models.CharField(max_length=100, verbose_name='MIME类型')),
+                ('size', models.BigIntegerField(verbose_name='字节数')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='内容哈希')),
+                ('uploaded_by', models.BigIntegerField(blank=True, null=True, verbose_name='上传者ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '任务附件',
+                'verbose_name_plural': '任务附件',
+                'indexes': [models.Index(fields=['task_id', 'id'], name='api_attachment_task_idx'), models.Index(fields=['content_hash'], name='api_attachment_hash_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskAttachmentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(verbose_name='任务ID')),
+                ('filename', models.CharField(max_length=255, verbose_name='文件名')),
+                ('content_type', models.CharField(max_length=100, verbose_name='MIME类型')),
+                ('size', models.BigIntegerField(verbose_name='字节数')),
+                ('received', models.BigIntegerField(default=0, verbose_name='已接收字节数')),
+                ('block_hashes', models.TextField(blank=True, default='', verbose_name='哈希块')),
+                ('uploaded_by', models.BigIntegerField(blank=True, null=True, verbose_name='上传者ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '附件上传',
+                'verbose_name_plural': '附件上传',
+                'indexes': [models.Index(fields=['updated_at'], name='api_attach_upload_updated_idx')],
+            },
+        ),
+    ]
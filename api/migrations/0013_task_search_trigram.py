@@ -0,0 +1,59 @@
+"""
+任务全文索引改为三元组索引
+
+SQLite的FTS5表改用trigram分词器，PostgreSQL的tsvector索引改为pg_trgm的GIN索引，
+使不使用空格分词的中文文本也能按子串搜索。SQLite上重建FTS5表时会重新读取所有任务。
+SQL在迁移中固定下来，不随api.search变化
+"""
+from django.db import migrations
+
+SQLITE_SQL = [
+    "DROP TRIGGER IF EXISTS api_task_fts_insert",
+    "DROP TRIGGER IF EXISTS api_task_fts_delete",
+    "DROP TRIGGER IF EXISTS api_task_fts_update",
+    "DROP TABLE IF EXISTS api_task_fts",
+    # trigram分词器按连续的3个字符建立索引（需要SQLite 3.34以上）
+    """CREATE VIRTUAL TABLE IF NOT EXISTS api_task_fts
+       USING fts5(title, description, content='api_task', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER api_task_fts_insert AFTER INSERT ON api_task BEGIN
+           INSERT INTO api_task_fts(rowid, title, description)
+           VALUES (new.id, new.title, new.description);
+       END""",
+    """CREATE TRIGGER api_task_fts_delete AFTER DELETE ON api_task BEGIN
+           INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+           VALUES ('delete', old.id, old.title, old.description);
+       END""",
+    """CREATE TRIGGER api_task_fts_update AFTER UPDATE OF title, description ON api_task BEGIN
+           INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+           VALUES ('delete', old.id, old.title, old.description);
+           INSERT INTO api_task_fts(rowid, title, description)
+           VALUES (new.id, new.title, new.description);
+       END""",
+    "INSERT INTO api_task_fts(api_task_fts) VALUES ('rebuild')",
+]
+
+PG_SQL = [
+    "DROP INDEX IF EXISTS api_task_search_idx",
+    "DROP INDEX IF EXISTS api_task_search_trgm_idx",
+    # 创建扩展需要相应的数据库权限
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS api_task_search_trgm_idx ON api_task USING GIN "
+    "((coalesce(api_task.title, '') || ' ' || coalesce(api_task.description, '')) gin_trgm_ops)",
+]
+
+
+def forwards(apps, schema_editor):
+    statements = {'sqlite': SQLITE_SQL, 'postgresql': PG_SQL}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_task_attachments'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,236 @@
-from django.db import models
+import contextvars
+import uuid
+from collections import Counter
+from django.db import models, router, transaction
+from django.db.models import Count, F, Max, Q
 from django.utils import timezone
+from .sharding import get_task_shards, group_by_shard, is_sharded, shard_for_task, shard_querysets
+from .signals import send_tasks_changed
 
 # Create your models here.
 
+# 按条件删除和更新状态时每条DELETE/UPDATE语句及墓碑INSERT语句包含的ID数
+WRITE_BATCH_SIZE = 500
+
+# 任务状态在数据库中的编码，只能追加新的状态，不能修改已有状态的编码
+TASK_STATUS_CODES = {
+    'pending': 1,
+    'in_progress': 2,
+    'completed': 3,
+    'cancelled': 4,
+}
+TASK_STATUS_NAMES = {code: name for name, code in TASK_STATUS_CODES.items()}
+
+# bulk_update内部按批调用update()，此时由bulk_update统一发送带ID的信号并维护状态计数
+_update_signal_muted = contextvars.ContextVar('task_update_signal_muted', default=False)
+
+class TaskQuerySet(models.QuerySet):
+    """
+    任务查询集
+
+    批量写入（按条件更新和删除、批量创建和更新）后发送tasks_changed信号，
+    并在同一事务中维护TaskStatusCounter。启用分片且未用using()指定数据库时，
+    批量写入分别在每个分片上执行
+    """
+
+    def _on_shards(self):
+        """启用分片且未指定数据库时返回每个分片上的查询集，否则返回None"""
+        if is_sharded() and self._db is None:
+            return shard_querysets(self)
+        return None
+
+    def create(self, **kwargs):
+        if self._on_shards() is not None:
+            return self.using(shard_for_task(self.model(**kwargs))).create(**kwargs)
+        return super().create(**kwargs)
+
+    def update(self, **kwargs):
+        # 与save()的auto_now行为一致，按条件更新时同样更新updated_at
+        kwargs.setdefault('updated_at', timezone.now())
+        querysets = self._on_shards()
+        if querysets is not None:
+            return sum(queryset.update(**kwargs) for queryset in querysets)
+        if 'status' in kwargs and not _update_signal_muted.get():
+            rows = self._update_status(kwargs)
+        else:
+            rows = super().update(**kwargs)
+        if rows and not _update_signal_muted.get():
+            send_tasks_changed(self.model, 'update', using=self.db)
+        return rows
+
+    def _update_status(self, kwargs):
+        """
+        更新包含status时，锁定匹配的行并按原来的状态分组统计，再用原来的条件执行一次UPDATE，按统计结果调整计数
+
+        锁定后这些行不会被其他事务修改；UPDATE的行数与统计的行数不一致时（锁定后其他事务插入了匹配的行），
+        在同一事务中重新统计计数
+        """
+        status = kwargs['status']
+        with transaction.atomic(using=self.db):
+            if not isinstance(status, str):
+                # 新状态是表达式时无法预先得知，更新后重新统计
+                rows = super().update(**kwargs)
+                TaskStatusCounter.reconcile(using=self.db)
+                return rows
+
+            locked = self.model._base_manager.using(self.db).filter(pk__in=self.select_for_update().values('pk'))
+            old = dict(locked.order_by().values('status').annotate(total=Count('pk')).values_list('status', 'total'))
+            rows = super().update(**kwargs)
+            if rows != sum(old.values()):
+                TaskStatusCounter.reconcile(using=self.db)
+                return rows
+            deltas = Counter()
+            for old_status, total in old.items():
+                deltas[old_status] -= total
+            deltas[status] += rows
+            TaskStatusCounter.apply(deltas, using=self.db)
+        return rows
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if self._on_shards() is not None:
+            groups = group_by_shard(objs, key=lambda obj: obj._state.db or shard_for_task(obj))
+            return sum(
+                self.using(alias).bulk_update(group, fields, *args, **kwargs) for alias, group in groups.items()
+            )
+        with transaction.atomic(using=self.db):
+            deltas = Counter()
+            if 'status' in fields:
+                old = dict(
+                    self.model._base_manager.using(self.db).select_for_update()
+                    .filter(pk__in=[obj.pk for obj in objs]).values_list('pk', 'status')
+                )
+                for obj in objs:
+                    if obj.pk in old:
+                        deltas[old[obj.pk]] -= 1
+                        deltas[obj.status] += 1
+            token = _update_signal_muted.set(True)
+            try:
+                rows = super().bulk_update(objs, fields, *args, **kwargs)
+            finally:
+                _update_signal_muted.reset(token)
+            TaskStatusCounter.apply(deltas, using=self.db)
+        if rows:
+            send_tasks_changed(self.model, 'update', [obj.pk for obj in objs], using=self.db)
+        return rows
+
+    def delete(self):
+        querysets = self._on_shards()
+        if querysets is not None:
+            deleted, rows = 0, Counter()
+            for queryset in querysets:
+                count, per_model = queryset.delete()
+                deleted += count
+                rows.update(per_model)
+            return deleted, dict(rows)
+
+        # 先读取要删除的ID，按ID分批删除并写入墓碑，供变更同步接口返回已删除的任务
+        with transaction.atomic(using=self.db):
+            old = list(self.select_for_update().values_list('pk', 'status'))
+            pks = [pk for pk, _ in old]
+            base = self.model._base_manager.using(self.db)
+            deleted, rows = 0, Counter()
+            for start in range(0, len(pks), WRITE_BATCH_SIZE):
+                batch = pks[start:start + WRITE_BATCH_SIZE]
+                count, per_model = base.filter(pk__in=batch).delete()
+                deleted += count
+                rows.update(per_model)
+            TaskTombstone.objects.using(self.db).bulk_create(
+                [TaskTombstone(task_id=pk) for pk in pks], batch_size=WRITE_BATCH_SIZE
+            )
+            deltas = Counter()
+            for _, status in old:
+                deltas[status] -= 1
+            TaskStatusCounter.apply(deltas, using=self.db)
+        if deleted:
+            send_tasks_changed(self.model, 'delete', pks, using=self.db)
+        return deleted, dict(rows)
+
+    def transition(self, to_status, batch_size=None):
+        """
+        将查询集中的任务转换为指定状态
+
+        使用UPDATE ... WHERE直接更新，不逐条加载和保存。指定batch_size时
+        每批在单独的事务中更新，避免长时间锁住大量数据
+
+        Args:
+            to_status: 目标状态
+            batch_size: 每批更新的数量，为None时一次更新全部
+
+        Returns:
+            int: 更新的任务数量
+        """
+        querysets = self._on_shards()
+        if querysets is not None:
+            return sum(queryset.transition(to_status, batch_size) for queryset in querysets)
+
+        queryset = self.exclude(status=to_status)
+        if not batch_size:
+            return queryset.update(status=to_status)
+
+        total = 0
+        while True:
+            with transaction.atomic(using=self.db):
+                pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                total += self.model.objects.using(self.db).filter(pk__in=pks).update(status=to_status)
+        return total
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if self._on_shards() is not None:
+            for alias, group in group_by_shard(objs).items():
+                self.using(alias).bulk_create(group, *args, **kwargs)
+            return objs
+
+        with transaction.atomic(using=self.db):
+            if is_sharded():
+                new = [obj for obj in objs if obj.pk is None]
+                for obj, pk in zip(new, TaskIdSequence.allocate(self.db, len(new))):
+                    obj.pk = pk
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                # 冲突的行未插入或改为更新，无法得知实际变化，重新统计
+                TaskStatusCounter.reconcile(using=self.db)
+            else:
+                TaskStatusCounter.apply(Counter(obj.status for obj in objs), using=self.db)
+        if objs:
+            send_tasks_changed(self.model, 'create', [obj.pk for obj in objs], using=self.db)
+        return objs
+
+class TaskStatusField(models.Field):
+    """
+    以小整数存储的任务状态
+
+    数据库中保存TASK_STATUS_CODES中的编码（smallint，2字节），比保存状态字符串的行和索引都更小，
+    比较也更快。模型实例、查询条件（filter(status='pending')、status__in等）和values()的结果
+    仍然使用状态字符串，读写时自动转换，序列化器和接口不受影响。
+    在表达式中使用状态字符串时需要指定output_field，如Value('completed', output_field=Task._meta.get_field('status'))
+    """
+    description = '任务状态'
+
+    def get_internal_type(self):
+        # 不使用PositiveSmallIntegerField：它的CHECK约束在大表上添加时需要扫描全表，状态由choices校验
+        return 'SmallIntegerField'
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return TASK_STATUS_NAMES.get(value, value)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return TASK_STATUS_CODES[value]
+        except KeyError:
+            raise ValueError(f"无效的任务状态: {value!r}") from None
+
 class Task(models.Model):
     """
     任务模型
@@ -10,13 +238,15 @@ class Task(models.Model):
     字段说明:
         - title: 任务标题，最大长度200个字符
         - description: 任务描述，可以为空
-        - status: 任务状态，可选值包括：
+        - status: 任务状态，数据库中以小整数编码存储（参见TaskStatusField），可选值包括：
             - pending: 待处理
             - in_progress: 进行中
             - completed: 已完成
             - cancelled: 已取消
         - created_at: 创建时间，自动设置为当前时间
         - updated_at: 更新时间，自动更新
+        - owner_id: 创建任务的用户ID，匿名创建时为空，启用分片时作为分片键
+        - due_at: 截止时间，可以为空，到期提醒和处理由run_task_scheduler命令执行
     """
     STATUS_CHOICES = (
         ('pending', '待处理'),
@@ -27,14 +257,348 @@ class Task(models.Model):
 
     title = models.CharField(max_length=200, verbose_name='标题')
     description = models.TextField(blank=True, null=True, verbose_name='描述')
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    status = TaskStatusField(choices=STATUS_CHOICES, default='pending', verbose_name='状态')
     created_at = models.DateTimeField(default=timezone.now, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    # 不使用外键：启用分片后任务和用户可能不在同一个数据库
+    owner_id = models.BigIntegerField(blank=True, null=True, verbose_name='所有者ID')
+    due_at = models.DateTimeField(blank=True, null=True, verbose_name='截止时间')
+
+    objects = TaskQuerySet.as_manager()
 
     class Meta:
         verbose_name = '任务'
         verbose_name_plural = '任务'
         ordering = ['-created_at']
+        # 每个索引对应任务列表支持的一组过滤和排序条件，参见api/filters.py
+        indexes = [
+            # 按创建时间排序或过滤，列表默认排序及游标分页使用
+            models.Index(fields=['created_at', 'id'], name='api_task_created_id_idx'),
+            # 按更新时间排序或过滤
+            models.Index(fields=['updated_at', 'id'], name='api_task_updated_id_idx'),
+            # 按状态过滤，按创建时间或更新时间排序
+            models.Index(fields=['status', 'created_at', 'id'], name='api_task_status_created_idx'),
+            models.Index(fields=['status', 'updated_at', 'id'], name='api_task_status_updated_idx'),
+            # 按所有者过滤，按创建时间排序
+            models.Index(fields=['owner_id', 'created_at', 'id'], name='api_task_owner_created_idx'),
+            # 按截止时间过滤，调度进程按(due_at, id)分段加载即将到期的任务；只索引有截止时间的任务
+            models.Index(fields=['due_at', 'id'], name='api_task_due_idx', condition=Q(due_at__isnull=False)),
+        ]
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            if self.pk is None and is_sharded():
+                self.pk = TaskIdSequence.allocate(using, 1)[0]
+                kwargs['force_insert'] = True
+            # 状态可能变化时锁定并读取原来的状态，行不存在时视为新建
+            old_status = None
+            counted = adding or update_fields is None or 'status' in update_fields
+            if counted and not adding:
+                old_status = (
+                    type(self)._base_manager.using(using).select_for_update()
+                    .filter(pk=self.pk).values_list('status', flat=True).first()
+                )
+            super().save(*args, **kwargs)
+            if counted:
+                deltas = Counter({self.status: 1})
+                if old_status is not None:
+                    deltas[old_status] -= 1
+                TaskStatusCounter.apply(deltas, using=using)
+        send_tasks_changed(type(self), 'create' if adding else 'update', [self.pk], using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        using = kwargs.get('using') or self._state.db
+        with transaction.atomic(using=using):
+            status = (
+                type(self)._base_manager.using(using).select_for_update()
+                .filter(pk=pk).values_list('status', flat=True).first()
+            )
+            result = super().delete(*args, **kwargs)
+            TaskTombstone.objects.using(using).create(task_id=pk)
+            if status is not None:
+                TaskStatusCounter.apply({status: -1}, using=using)
+        send_tasks_changed(type(self), 'delete', [pk], using=using)
+        return result
+
+class TaskTombstone(models.Model):
+    """
+    已删除任务的墓碑
+
+    任务删除时写入，变更同步接口据此通知客户端删除本地数据，
+    超过TASK_TOMBSTONE_RETENTION_DAYS天的墓碑由purge_task_tombstones命令清理
+
+    字段说明:
+        - task_id: 已删除的任务ID
+        - deleted_at: 删除时间
+    """
+    task_id = models.BigIntegerField(verbose_name='任务ID')
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name='删除时间')
+
+    class Meta:
+        verbose_name = '任务墓碑'
+        verbose_name_plural = '任务墓碑'
+        indexes = [
+            # 变更同步按(deleted_at, id)游标读取，清理时按deleted_at范围删除
+            models.Index(fields=['deleted_at', 'id'], name='api_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}@{self.deleted_at}"
+
+class TaskStatusCounter(models.Model):
+    """
+    各状态的任务数量
+
+    由Task和TaskQuerySet的写入方法在同一事务中增量维护，读取各状态数量时不需要
+    对任务表执行GROUP BY。直接执行SQL等绕过ORM的写入会导致计数偏差，
+    可以用reconcile_task_status_counters命令重新统计并修复
+
+    字段说明:
+        - status: 任务状态
+        - count: 该状态的任务数量
+    """
+    status = models.CharField(max_length=20, unique=True, verbose_name='状态')
+    count = models.BigIntegerField(default=0, verbose_name='数量')
+
+    class Meta:
+        verbose_name = '任务状态计数'
+        verbose_name_plural = '任务状态计数'
+
+    def __str__(self):
+        return f"{self.status}: {self.count}"
+
+    @classmethod
+    def apply(cls, deltas, using=None):
+        """
+        按增量调整计数，必须在修改任务的事务中调用
+
+        按状态排序后依次更新，并发事务以相同顺序锁定计数行，避免死锁
+
+        Args:
+            deltas: {状态: 增量}
+            using: 数据库别名
+        """
+        manager = cls.objects.using(using)
+        for status, delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            if not manager.filter(status=status).update(count=F('count') + delta):
+                manager.get_or_create(status=status)
+                manager.filter(status=status).update(count=F('count') + delta)
+
+    @classmethod
+    def get_counts(cls, using=None):
+        """
+        读取各状态的任务数量
+
+        Args:
+            using: 数据库别名，为None且启用分片时汇总所有分片
+
+        Returns:
+            dict: {状态: 数量}，包含STATUS_CHOICES中的全部状态
+        """
+        counts = {status: 0 for status, _ in Task.STATUS_CHOICES}
+        aliases = get_task_shards() if using is None and is_sharded() else [using]
+        for alias in aliases:
+            for status, count in cls.objects.using(alias).values_list('status', 'count'):
+                counts[status] = counts.get(status, 0) + count
+        return counts
+
+    @classmethod
+    def reconcile(cls, using=None, dry_run=False):
+        """
+        对任务表重新统计各状态数量，修复与计数表不一致的状态
+
+        先锁定计数行，与同时写入任务的事务串行执行
+
+        Args:
+            using: 数据库别名
+            dry_run: 为True时只返回偏差，不修改计数表
+
+        Returns:
+            dict: 有偏差的状态 {状态: (计数表中的数量, 实际数量)}
+        """
+        with transaction.atomic(using=using):
+            stored = dict(cls.objects.using(using).select_for_update().values_list('status', 'count'))
+            actual = dict(
+                Task._base_manager.using(using).order_by()
+                .values('status').annotate(total=Count('pk')).values_list('status', 'total')
+            )
+            drift = {}
+            for status in sorted(set(stored) | set(actual)):
+                if stored.get(status, 0) != actual.get(status, 0):
+                    drift[status] = (stored.get(status, 0), actual.get(status, 0))
+            if not dry_run:
+                manager = cls.objects.using(using)
+                for status, (_, count) in drift.items():
+                    manager.update_or_create(status=status, defaults={'count': count})
+        return drift
+
+class ArchivedTask(models.Model):
+    """
+    已归档的任务
+
+    完成或取消超过TASK_ARCHIVE_AFTER_DAYS天的任务由archive_tasks命令从任务表移到归档表，
+    保留原来的ID和时间，使任务表及其索引只包含活跃数据。
+    任务列表传include_archived参数时同时读取归档表，restore_archived_tasks命令可以恢复
+
+    字段说明:
+        - 与Task相同的字段，id为原任务ID
+        - archived_at: 归档时间
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID')
+    title = models.CharField(max_length=200, verbose_name='标题')
+    description = models.TextField(blank=True, null=True, verbose_name='描述')
+    status = TaskStatusField(choices=Task.STATUS_CHOICES, verbose_name='状态')
+    created_at = models.DateTimeField(verbose_name='创建时间')
+    updated_at = models.DateTimeField(verbose_name='更新时间')
+    owner_id = models.BigIntegerField(blank=True, null=True, verbose_name='所有者ID')
+    due_at = models.DateTimeField(blank=True, null=True, verbose_name='截止时间')
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name='归档时间')
+
+    class Meta:
+        verbose_name = '已归档任务'
+        verbose_name_plural = '已归档任务'
+        indexes = [
+            # 与任务表相同的排序索引，合并读取时每个表按相同的顺序读取
+            models.Index(fields=['created_at', 'id'], name='api_archived_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='api_archived_updated_id_idx'),
+            # 按归档时间恢复
+            models.Index(fields=['archived_at'], name='api_archived_archived_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+class TaskIdSequence(models.Model):
+    """
+    分片上的任务ID序列
+
+    启用分片后各分片的自增ID会重复，新建任务的ID改为由每个分片上的这张单行表分配，
+    分配的ID满足 id % 分片数 == 分片序号，按ID即可找到任务所在的分片
+
+    字段说明:
+        - next_value: 下一个可分配的序号
+    """
+    next_value = models.BigIntegerField(default=1, verbose_name='下一个序号')
+
+    class Meta:
+        verbose_name = '任务ID序列'
+        verbose_name_plural = '任务ID序列'
+
+    def __str__(self):
+        return str(self.next_value)
+
+    @classmethod
+    def allocate(cls, using, count):
+        """
+        在分片上分配任务ID，必须在写入任务的事务中调用
+
+        序列行在事务提交前保持锁定，事务回滚时分配的ID一并回滚，不会重复分配
+
+        Args:
+            using: 分片的数据库别名
+            count: 需要的ID数量
+
+        Returns:
+            list: 任务ID
+        """
+        if not count:
+            return []
+        shards = get_task_shards()
+        index, size = shards.index(using), len(shards)
+        manager = cls.objects.using(using)
+        with transaction.atomic(using=using):
+            if not manager.filter(pk=1).update(next_value=F('next_value') + count):
+                # 首次分配时从分片上已有的最大ID之后开始
+                max_id = max(
+                    Task._base_manager.using(using).aggregate(value=Max('pk'))['value'] or 0,
+                    ArchivedTask.objects.using(using).aggregate(value=Max('pk'))['value'] or 0,
+                )
+                manager.get_or_create(pk=1, defaults={'next_value': max_id // size + 1})
+                manager.filter(pk=1).update(next_value=F('next_value') + count)
+            end = manager.values_list('next_value', flat=True).get(pk=1)
+        return [value * size + index for value in range(end - count, end)]
+
+class TaskAttachment(models.Model):
+    """
+    任务附件
+
+    文件按内容哈希保存在MEDIA_ROOT/attachments/下，内容相同的文件只保存一份，多个附件可以引用同一个文件。
+    附件与任务保存在同一个分片；删除附件或任务时只删除附件记录，不再被引用的文件由purge_task_attachments命令清理
+
+    字段说明:
+        - task_id: 任务ID，不使用外键，任务归档后附件仍然保留
+        - filename: 上传时的文件名
+        - content_type: 文件的MIME类型
+        - size: 文件字节数
+        - content_hash: 内容哈希，参见api.attachments.compute_content_hash
+        - uploaded_by: 上传者的用户ID
+        - created_at: 上传完成时间
+    """
+    task_id = models.BigIntegerField(verbose_name='任务ID')
+    filename = models.CharField(max_length=255, verbose_name='文件名')
+    content_type = models.CharField(max_length=100, verbose_name='MIME类型')
+    size = models.BigIntegerField(verbose_name='字节数')
+    content_hash = models.CharField(max_length=64, verbose_name='内容哈希')
+    uploaded_by = models.BigIntegerField(blank=True, null=True, verbose_name='上传者ID')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='创建时间')
+
+    class Meta:
+        verbose_name = '任务附件'
+        verbose_name_plural = '任务附件'
+        indexes = [
+            # 列出任务的附件
+            models.Index(fields=['task_id', 'id'], name='api_attachment_task_idx'),
+            # 清理文件时检查内容哈希是否仍被引用
+            models.Index(fields=['content_hash'], name='api_attachment_hash_idx'),
+        ]
+
+    def __str__(self):
+        return self.filename
+
+class TaskAttachmentUpload(models.Model):
+    """
+    未完成的附件分块上传
+
+    客户端按顺序上传分块，每个分块直接追加到MEDIA_ROOT/attachments/uploads/下的临时文件，
+    同时计算已满的哈希块的SHA-256，断线后从received继续上传。
+    超过TASK_ATTACHMENT_UPLOAD_EXPIRE_HOURS小时未完成的上传由purge_task_attachments命令清理
+
+    字段说明:
+        - id: 上传ID
+        - task_id: 任务ID
+        - filename / content_type / size: 与TaskAttachment相同，size为文件的总字节数
+        - received: 已接收的字节数，下一个分块必须从这里开始
+        - block_hashes: 已满的哈希块的SHA-256（十六进制，依次拼接）
+        - uploaded_by: 上传者的用户ID
+        - created_at / updated_at: 创建时间、最后接收分块的时间
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, verbose_name='ID')
+    task_id = models.BigIntegerField(verbose_name='任务ID')
+    filename = models.CharField(max_length=255, verbose_name='文件名')
+    content_type = models.CharField(max_length=100, verbose_name='MIME类型')
+    size = models.BigIntegerField(verbose_name='字节数')
+    received = models.BigIntegerField(default=0, verbose_name='已接收字节数')
+    block_hashes = models.TextField(blank=True, default='', verbose_name='哈希块')
+    uploaded_by = models.BigIntegerField(blank=True, null=True, verbose_name='上传者ID')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '附件上传'
+        verbose_name_plural = '附件上传'
+        indexes = [
+            # 清理过期的上传
+            models.Index(fields=['updated_at'], name='api_attach_upload_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
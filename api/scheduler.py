@@ -0,0 +1,279 @@
+import datetime
+import heapq
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from backend.utils import keyset_filter
+from .changes import get_settled_before
+from .models import Task
+from .sharding import group_by_shard, merge_shards, shard_for_pk
+
+logger = logging.getLogger(__name__)
+
+# 需要到期处理的任务状态
+TASK_DUE_ACTIVE_STATUSES = ('pending', 'in_progress')
+# 到期处理方式，参见TASK_DUE_ACTION
+TASK_DUE_ACTIONS = ('notify', 'cancel')
+# 按(due_at, id)索引分段加载，每段的任务数
+TASK_DUE_LOAD_BATCH_SIZE = 1000
+TASK_DUE_ORDERING = ('due_at', 'id')
+# 按(updated_at, id)索引轮询变更的任务
+TASK_POLL_ORDERING = ('updated_at', 'id')
+
+# 定时器类型，同时作为推送的事件名
+REMINDER = 'reminder'
+DUE = 'due'
+
+class DueScheduler:
+    """
+    任务截止时间调度器
+
+    只把截止时间在未来TASK_SCHEDULER_WINDOW秒内的任务按(due_at, id)索引分段加载到内存中的最小堆，
+    内存占用只与窗口内的定时器数有关（不超过TASK_SCHEDULER_MAX_LOADED），与待到期任务的总数无关。
+    时间推进时从上次加载的位置继续加载，不重新扫描已加载的部分；每轮按updated_at水位从数据库读取变更的任务
+    （与Web进程是否在同一进程、使用哪种事件后端无关），按(updated_at, id)索引分页读取并更新这些任务的定时器，
+    另外每TASK_SCHEDULER_RELOAD秒重新加载一次当前窗口作为兜底。
+    每次休眠不超过TASK_SCHEDULER_TICK秒，到期处理的延迟不超过该值加上处理本身的耗时
+    """
+
+    def __init__(self, action=None, remind_before=None, window=None, max_loaded=None):
+        self.action = action or settings.TASK_DUE_ACTION
+        if remind_before is None:
+            remind_before = settings.TASK_DUE_REMIND_BEFORE
+        self.remind_before = datetime.timedelta(seconds=remind_before)
+        self.window = datetime.timedelta(seconds=window or settings.TASK_SCHEDULER_WINDOW)
+        self.max_loaded = max_loaded or settings.TASK_SCHEDULER_MAX_LOADED
+
+        # notify只通知调度器运行期间到期的任务；cancel还会处理调度器停止期间已经过期的任务
+        self.started_at = timezone.now()
+        self.lower = None if self.action == 'cancel' else self.started_at
+
+        self._heap = []
+        self._timers = {}
+        self._position = None
+        self._horizon = None
+        self._capped = False
+        self._watermark = None
+        self.stats = {
+            'reminders': 0,
+            'due': 0,
+            'reloads': 0,
+        }
+
+    # 定时器
+
+    def _schedule(self, pk, due_at, now):
+        """为任务添加提醒和到期定时器，已过期的提醒不再添加"""
+        if self.remind_before and due_at > now:
+            self._push(pk, REMINDER, due_at - self.remind_before)
+        self._push(pk, DUE, due_at)
+
+    def _push(self, pk, kind, fire_at):
+        self._timers[(pk, kind)] = fire_at
+        heapq.heappush(self._heap, (fire_at, pk, kind))
+
+    def _remove(self, pk):
+        """移除任务的定时器，堆中对应的项在弹出时丢弃"""
+        self._timers.pop((pk, REMINDER), None)
+        self._timers.pop((pk, DUE), None)
+
+    def _compact(self):
+        """失效的项过多时重建堆"""
+        if len(self._heap) > 2 * len(self._timers) + TASK_DUE_LOAD_BATCH_SIZE:
+            self._heap = [(fire_at, pk, kind) for (pk, kind), fire_at in self._timers.items()]
+            heapq.heapify(self._heap)
+
+    @property
+    def loaded(self):
+        """内存中的定时器数"""
+        return len(self._timers)
+
+    def next_fire_at(self):
+        return self._heap[0][0] if self._heap else None
+
+    # 加载
+
+    def _active_tasks(self):
+        queryset = merge_shards(Task.objects.order_by(*TASK_DUE_ORDERING)).filter(
+            status__in=TASK_DUE_ACTIVE_STATUSES, due_at__isnull=False
+        )
+        if self.lower is not None:
+            queryset = queryset.filter(due_at__gte=self.lower)
+        return queryset
+
+    def _load(self, now):
+        """从上次加载的位置继续，加载截止时间早于窗口上界的任务"""
+        horizon = now + self.window + self.remind_before
+        queryset = self._active_tasks().filter(due_at__lt=horizon)
+        while self.loaded < self.max_loaded:
+            page = queryset
+            if self._position is not None:
+                page = page.filter(keyset_filter(TASK_DUE_ORDERING, self._position))
+            rows = list(page.values('id', 'due_at')[:TASK_DUE_LOAD_BATCH_SIZE])
+            for row in rows:
+                self._schedule(row['id'], row['due_at'], now)
+            if rows:
+                self._position = [rows[-1]['due_at'], rows[-1]['id']]
+            if len(rows) < TASK_DUE_LOAD_BATCH_SIZE:
+                self._horizon, self._capped = horizon, False
+                return
+        # 定时器数达到上限，只加载到当前位置，触发一部分定时器后继续加载
+        self._horizon, self._capped = self._position[0], True
+
+    def reload(self, now):
+        """清空内存中的定时器，重新加载当前窗口"""
+        # 重新加载读取的是当前的数据，之前已提交的变更不需要再轮询
+        self._watermark = get_settled_before(now)
+        self._heap, self._timers = [], {}
+        self._position, self._horizon = None, None
+        self._load(now)
+        self.stats['reloads'] += 1
+
+    def extend(self, now):
+        """窗口过半或定时器数低于上限后继续加载"""
+        if self._capped:
+            if self.loaded < self.max_loaded:
+                self._load(now)
+        elif self._horizon <= now + self.window / 2 + self.remind_before:
+            self._load(now)
+
+    # 变更
+
+    def poll_changes(self, now):
+        """
+        按updated_at水位读取上次轮询之后变更的任务，更新它们的定时器
+
+        所有写入（包括按条件批量更新和bulk_update）都会更新updated_at，数据库是唯一可靠的变更来源。
+        水位只推进到get_settled_before（与变更同步接口相同），之后的变更在下一轮重新读取，
+        提交较晚、updated_at早于本轮时间的事务写入的任务不会遗漏。
+        变更按(updated_at, id)索引每次读取TASK_DUE_LOAD_BATCH_SIZE个，只读到本轮的时间为止，
+        耗时与变更数成正比，持续大量写入时也不会退化为重新加载整个窗口。
+        删除和归档的任务不会出现在结果中，它们的定时器在触发前确认任务状态时丢弃
+        """
+        since, self._watermark = self._watermark, get_settled_before(now)
+        # 晚于本轮时间的变更在下一轮的重叠部分中读取
+        queryset = merge_shards(Task.objects.order_by(*TASK_POLL_ORDERING)).filter(
+            updated_at__gte=since, updated_at__lt=now
+        )
+        position = None
+        while True:
+            page = queryset
+            if position is not None:
+                page = page.filter(keyset_filter(TASK_POLL_ORDERING, position))
+            rows = list(page.values('id', 'updated_at', 'status', 'due_at')[:TASK_DUE_LOAD_BATCH_SIZE])
+            for row in rows:
+                self._apply_change(row, now)
+            if len(rows) < TASK_DUE_LOAD_BATCH_SIZE:
+                break
+            position = [rows[-1]['updated_at'], rows[-1]['id']]
+        self._compact()
+
+    def _apply_change(self, row, now):
+        """按任务当前的状态和截止时间更新它的定时器"""
+        self._remove(row['id'])
+        due_at = row['due_at']
+        if row['status'] not in TASK_DUE_ACTIVE_STATUSES or due_at is None or due_at >= self._horizon:
+            return
+        if self.lower is not None and due_at < self.lower:
+            return
+        self._schedule(row['id'], due_at, now)
+
+    # 触发
+
+    def fire(self, now):
+        """触发到期的定时器"""
+        fired = {REMINDER: [], DUE: []}
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, pk, kind = heapq.heappop(self._heap)
+            if self._timers.get((pk, kind)) != fire_at:
+                continue
+            del self._timers[(pk, kind)]
+            fired[kind].append(pk)
+        if fired[REMINDER]:
+            self.remind(fired[REMINDER])
+        if fired[DUE]:
+            self.expire(fired[DUE], now)
+
+    def _still_active(self, pks, **filters):
+        """再次确认任务仍然需要处理，避免使用内存中已过时的状态"""
+        result = []
+        for alias, group in group_by_shard(pks, shard_for_pk).items():
+            result += Task.objects.using(alias).filter(
+                pk__in=group, status__in=TASK_DUE_ACTIVE_STATUSES, **filters
+            ).values_list('id', flat=True)
+        return result
+
+    def remind(self, pks):
+        pks = self._still_active(pks)
+        if pks:
+            self.publish(REMINDER, pks)
+            self.stats['reminders'] += len(pks)
+
+    def expire(self, pks, now):
+        pks = self._still_active(pks, due_at__lte=now)
+        if not pks:
+            return
+        if self.action == 'cancel':
+            Task.objects.filter(pk__in=pks, status__in=TASK_DUE_ACTIVE_STATUSES).transition('cancelled')
+        self.publish(DUE, pks)
+        self.stats['due'] += len(pks)
+
+    def publish(self, action, pks):
+        """推送到期事件，参见api.events"""
+        if not settings.TASK_EVENTS_ENABLED:
+            return
+        from .events import get_task_broadcaster
+        try:
+            get_task_broadcaster().publish(action, pks)
+        except Exception:
+            logger.exception("发布%s事件失败", action)
+
+    # 主循环
+
+    def run_once(self, now=None):
+        """
+        执行一轮调度：轮询变更、继续加载、触发到期的定时器
+
+        Returns:
+            float: 距离下一个定时器的秒数，没有定时器时为None
+        """
+        now = now or timezone.now()
+        if self._horizon is None:
+            self.reload(now)
+        else:
+            self.poll_changes(now)
+            self.extend(now)
+        self.fire(now)
+        next_fire_at = self.next_fire_at()
+        return (next_fire_at - now).total_seconds() if next_fire_at is not None else None
+
+    def run(self, stop=None, tick=None, reload_interval=None):
+        """
+        持续运行，直到stop被设置
+
+        Args:
+            stop: threading.Event，为None时一直运行
+            tick: 最长休眠秒数，默认为TASK_SCHEDULER_TICK
+            reload_interval: 重新加载窗口的间隔秒数，默认为TASK_SCHEDULER_RELOAD
+        """
+        stop = stop or threading.Event()
+        tick = tick or settings.TASK_SCHEDULER_TICK
+        reload_interval = reload_interval or settings.TASK_SCHEDULER_RELOAD
+
+        last_reload = time.monotonic()
+        while not stop.is_set():
+            delay = tick
+            try:
+                close_old_connections()
+                if time.monotonic() - last_reload >= reload_interval:
+                    self.reload(timezone.now())
+                    last_reload = time.monotonic()
+                remaining = self.run_once()
+                if remaining is not None:
+                    delay = max(0, min(tick, remaining))
+            except Exception:
+                logger.exception("任务调度异常，%s秒后重试", tick)
+            stop.wait(delay)
@@ -0,0 +1,81 @@
+import re
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# 三元组索引只能用于不少于3个字符的搜索词，更短的词（如两个汉字的词）退回到模糊匹配
+TRIGRAM_MIN_LENGTH = 3
+
+# 索引覆盖的文本，PostgreSQL的表达式索引和查询必须使用完全相同的表达式。
+# 全文索引由迁移0013_task_search_trigram建立：SQLite为trigram分词的FTS5外部内容表api_task_fts，
+# PostgreSQL为该表达式上的pg_trgm GIN索引api_task_search_trgm_idx。
+# SQLite上重建api_task表的迁移会删除维护索引的触发器，需要在迁移中重新创建（参见0011_task_status_swap）
+PG_SEARCH_TEXT = "(coalesce(api_task.title, '') || ' ' || coalesce(api_task.description, ''))"
+
+def _tokenize(query):
+    """按空白和标点拆分搜索词"""
+    return [token for token in re.split(r'[\s"\'\\:&|!()*^+\-]+', query) if token]
+
+def _like_pattern(token):
+    """包含搜索词的LIKE模式，转义通配符"""
+    return '%' + re.sub(r'([\\%_])', r'\\\1', token) + '%'
+
+def search_tasks(queryset, query):
+    """
+    全文搜索任务
+
+    每个搜索词按子串匹配（不区分大小写），多个搜索词之间为AND关系。
+    不少于3个字符的搜索词使用三元组索引，更短的搜索词退回到对标题和描述的模糊匹配。
+    结果带有search_rank注解，值越大相关度越高
+
+    Args:
+        queryset: 任务查询集
+        query: 搜索内容
+
+    Returns:
+        QuerySet: 过滤并注解了search_rank的查询集
+    """
+    tokens = _tokenize(query)
+    if not tokens:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        indexed = [token for token in tokens if len(token) >= TRIGRAM_MIN_LENGTH]
+        condition = Q()
+        for token in tokens:
+            if len(token) < TRIGRAM_MIN_LENGTH:
+                condition &= Q(title__icontains=token) | Q(description__icontains=token)
+        queryset = queryset.filter(condition)
+        if not indexed:
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        match = ' '.join(f'"{token}"' for token in indexed)
+        # 与全文索引表连接，bm25在MATCH查询中直接计算，不需要为每行再执行一次子查询
+        return queryset.extra(
+            tables=['api_task_fts'],
+            where=['api_task_fts.rowid = api_task.id', 'api_task_fts MATCH %s'],
+            params=[match],
+        ).annotate(
+            # bm25值越小越相关，取负数使值越大越相关
+            search_rank=RawSQL("-bm25(api_task_fts)", [], output_field=FloatField())
+        )
+
+    if vendor == 'postgresql':
+        # ILIKE可以使用三元组索引，按输入的完整内容计算与文本中最相近部分的相似度作为相关度
+        return queryset.filter(
+            RawSQL(
+                ' AND '.join(f"{PG_SEARCH_TEXT} ILIKE %s" for _ in tokens),
+                [_like_pattern(token) for token in tokens], output_field=BooleanField()
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"word_similarity(%s, {PG_SEARCH_TEXT})",
+                [' '.join(tokens)], output_field=FloatField()
+            )
+        )
+
+    # 其他数据库退回到模糊匹配
+    condition = Q()
+    for token in tokens:
+        condition &= Q(title__icontains=token) | Q(description__icontains=token)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
@@ -1,9 +1,159 @@
+import datetime
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Task
+from rest_framework.exceptions import ValidationError
+from .analytics import CYCLE_TIME_PERIODS
+from .attachments import DEFAULT_CONTENT_TYPE, normalize_content_type
+from .filters import TASK_RANGE_FILTERS, parse_datetime_param
+from .models import Task, TaskAttachment, TaskAttachmentUpload
+
+class TaskListSerializer(serializers.ListSerializer):
+    """任务批量序列化器，批量创建和更新各只执行一次写入"""
+
+    def create(self, validated_data):
+        return Task.objects.bulk_create([Task(**attrs) for attrs in validated_data])
+
+    def update(self, instances, validated_data):
+        now = timezone.now()
+        fields = {'updated_at'}
+        for instance, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(instance, attr, value)
+                fields.add(attr)
+            # bulk_update不会自动更新auto_now字段
+            instance.updated_at = now
+        Task.objects.bulk_update(instances, sorted(fields))
+        return instances
 
 class TaskSerializer(serializers.ModelSerializer):
-    """任务序列化器"""
+    """
+    任务序列化器
+
+    可以通过fields参数只输出部分字段，如TaskSerializer(task, fields=['id', 'title'])。
+    列表和详情接口允许匿名访问，所有者ID（owner_id）不输出，避免暴露用户ID
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Task
-        fields = ['id', 'title', 'description', 'status', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'status', 'due_at', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        list_serializer_class = TaskListSerializer
+
+class TaskStatusListField(serializers.ListField):
+    """任务状态列表，也可以传逗号分隔的字符串"""
+    child = serializers.ChoiceField(choices=Task.STATUS_CHOICES)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = data.split(',')
+        return super().to_internal_value(data)
+
+class TaskTimeFilterField(serializers.CharField):
+    """时间范围过滤条件，格式与任务列表的时间参数相同，校验后原样交给filter_tasks"""
+    default_error_messages = {'invalid': '无效的时间格式'}
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        try:
+            parse_datetime_param(self.field_name, value)
+        except ValidationError:
+            self.fail('invalid')
+        return value
+
+class TaskTransitionFilterSerializer(serializers.Serializer):
+    """
+    按条件转换任务状态的过滤条件
+
+    只接受下列条件，未知的键（如拼写错误）直接报错，不会被忽略而更新整个任务表
+    """
+    status = TaskStatusListField(required=False, allow_empty=False)
+    owner_id = serializers.IntegerField(required=False, min_value=1)
+    created_after = TaskTimeFilterField(required=False)
+    created_before = TaskTimeFilterField(required=False)
+    updated_after = TaskTimeFilterField(required=False)
+    updated_before = TaskTimeFilterField(required=False)
+    due_after = TaskTimeFilterField(required=False)
+    due_before = TaskTimeFilterField(required=False)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            unknown = sorted(set(data) - set(self.fields))
+            if unknown:
+                raise serializers.ValidationError({name: ['未知的过滤条件'] for name in unknown})
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('至少需要一个过滤条件')
+        return attrs
+
+class TaskTransitionSerializer(serializers.Serializer):
+    """按条件批量转换任务状态序列化器"""
+    to_status = serializers.ChoiceField(choices=Task.STATUS_CHOICES)
+    filter = TaskTransitionFilterSerializer()
+    batch_size = serializers.IntegerField(required=False, min_value=1, max_value=100000)
+
+class TaskCycleTimeQuerySerializer(serializers.Serializer):
+    """任务周期统计查询参数序列化器，start和end为当前时区的日期，都包含在内"""
+    period = serializers.ChoiceField(choices=CYCLE_TIME_PERIODS, default='day')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        period = attrs['period']
+        end = attrs.get('end') or timezone.localdate()
+        # 默认按天统计最近30天，按周统计最近12周
+        start = attrs.get('start') or end - datetime.timedelta(days=29 if period == 'day' else 7 * 11)
+        if start > end:
+            raise serializers.ValidationError({'start': '开始日期不能晚于结束日期'})
+        buckets = (end - start).days // (7 if period == 'week' else 1) + 1
+        if buckets > settings.TASK_ANALYTICS_MAX_BUCKETS:
+            raise serializers.ValidationError(f"每次最多统计{settings.TASK_ANALYTICS_MAX_BUCKETS}个区间")
+        attrs.update({
+            'start': timezone.make_aware(datetime.datetime.combine(start, datetime.time.min)),
+            'end': timezone.make_aware(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min)),
+        })
+        return attrs
+
+class TaskAttachmentSerializer(serializers.ModelSerializer):
+    """任务附件序列化器"""
+
+    class Meta:
+        model = TaskAttachment
+        fields = ['id', 'task_id', 'filename', 'content_type', 'size', 'content_hash', 'uploaded_by', 'created_at']
+        read_only_fields = fields
+
+class TaskAttachmentUploadSerializer(serializers.ModelSerializer):
+    """附件上传序列化器，创建上传时校验文件名、类型和大小"""
+    content_type = serializers.CharField(max_length=100, required=False, default=DEFAULT_CONTENT_TYPE)
+    size = serializers.IntegerField(min_value=0)
+
+    class Meta:
+        model = TaskAttachmentUpload
+        fields = ['id', 'task_id', 'filename', 'content_type', 'size', 'received', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'task_id', 'received', 'created_at', 'updated_at']
+
+    def validate_filename(self, value):
+        # 只保留文件名，去掉客户端可能带上的路径
+        value = value.replace('\\', '/').rsplit('/', 1)[-1].strip()
+        if not value:
+            raise serializers.ValidationError('文件名不能为空')
+        return value
+
+    def validate_content_type(self, value):
+        content_type = normalize_content_type(value)
+        if content_type is None:
+            raise serializers.ValidationError('无效的MIME类型，应为type/subtype格式')
+        return content_type
+
+    def validate_size(self, value):
+        if value > settings.TASK_ATTACHMENT_MAX_SIZE:
+            raise serializers.ValidationError(f"附件不能超过{settings.TASK_ATTACHMENT_MAX_SIZE}字节")
+        return value
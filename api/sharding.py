@@ -0,0 +1,154 @@
+import contextlib
+from collections import defaultdict
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from backend.querysets import MergedQuerySet
+
+# 存放在每个分片上的模型：任务、墓碑、状态计数、归档任务、ID序列和附件，
+# 其余应用（用户、认证等）只在default数据库
+SHARDED_APP_LABEL = 'api'
+
+def get_task_shards():
+    """
+    获取任务分片的数据库别名列表
+
+    第一个分片总是default，其余分片由TASK_SHARD_DATABASE_URLS配置。
+    分片数量决定任务ID和所有者到分片的映射，启用后不能再增减分片
+
+    Returns:
+        list: 数据库别名
+    """
+    return settings.TASK_SHARDS
+
+def is_sharded():
+    """是否配置了多个任务分片"""
+    return len(settings.TASK_SHARDS) > 1
+
+def shard_for_owner(owner_id):
+    """
+    按所有者ID选择分片，没有所有者的任务（如匿名创建和命令导入）放在第一个分片
+
+    Args:
+        owner_id: 所有者ID，可以为None
+
+    Returns:
+        str: 数据库别名
+    """
+    shards = get_task_shards()
+    return shards[(owner_id or 0) % len(shards)]
+
+def shard_for_pk(pk):
+    """
+    按任务ID选择分片
+
+    分片上新建的任务ID满足 id % 分片数 == 分片序号，参见TaskIdSequence.allocate
+
+    Args:
+        pk: 任务ID
+
+    Returns:
+        str: 数据库别名
+    """
+    shards = get_task_shards()
+    return shards[int(pk) % len(shards)]
+
+def shard_for_task(task):
+    """已有ID时按ID选择分片，否则按所有者选择"""
+    if task.pk is not None:
+        return shard_for_pk(task.pk)
+    return shard_for_owner(task.owner_id)
+
+def group_by_shard(items, key=shard_for_task):
+    """
+    按分片分组
+
+    Args:
+        items: 任务对象或任务ID
+        key: 计算分片的函数，分组任务ID时传shard_for_pk
+
+    Returns:
+        dict: {数据库别名: 列表}，保持原来的顺序
+    """
+    groups = defaultdict(list)
+    for item in items:
+        groups[key(item)].append(item)
+    return dict(groups)
+
+def shard_querysets(queryset):
+    """
+    把查询集拆分为每个分片上的查询集
+
+    查询集已用using()指定数据库或未启用分片时原样返回
+
+    Returns:
+        list: 查询集列表
+    """
+    if not is_sharded() or queryset._db is not None:
+        return [queryset]
+    return [queryset.using(alias) for alias in get_task_shards()]
+
+def merge_shards(queryset):
+    """
+    合并读取所有分片（scatter-gather）
+
+    返回的MergedQuerySet支持过滤、排序、切片和流式读取，各分片按相同的排序分别查询，
+    结果在内存中归并，可以直接用于页码分页和游标分页。未启用分片时原样返回
+
+    Args:
+        queryset: 任务相关模型的查询集
+
+    Returns:
+        QuerySet或MergedQuerySet
+    """
+    querysets = shard_querysets(queryset)
+    if len(querysets) == 1:
+        return querysets[0]
+    return MergedQuerySet(querysets, queryset.query.order_by)
+
+@contextlib.contextmanager
+def task_shards_atomic():
+    """
+    在每个分片上各开启一个事务
+
+    各分片的事务依次提交，不是分布式事务：某个分片提交失败时其他分片可能已经提交。
+    未启用分片时等同于transaction.atomic()
+    """
+    with contextlib.ExitStack() as stack:
+        for alias in get_task_shards():
+            stack.enter_context(transaction.atomic(using=alias))
+        yield
+
+class TaskShardRouter:
+    """
+    任务分片数据库路由
+
+    模型实例按已加载的数据库、（所属的）任务ID或所有者路由到分片；没有实例的查询使用default，
+    需要读取其他分片时通过using()、shard_querysets()或merge_shards()指定。
+    其他分片只迁移api应用的模型，default迁移全部应用
+    """
+
+    def _db_for_instance(self, model, hints):
+        if model._meta.app_label != SHARDED_APP_LABEL or not is_sharded():
+            return None
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if instance._state.db is not None:
+            return instance._state.db
+        if hasattr(instance, 'task_id'):
+            # 墓碑和附件与任务在同一个分片
+            return shard_for_pk(instance.task_id)
+        if hasattr(instance, 'owner_id'):
+            return shard_for_task(instance)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_instance(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_instance(model, hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db != DEFAULT_DB_ALIAS and db in get_task_shards():
+            return app_label == SHARDED_APP_LABEL
+        return None
@@ -0,0 +1,55 @@
+import logging
+from django.conf import settings
+from django.dispatch import Signal, receiver
+from django.db import transaction
+from backend.surrogate_keys import purge_surrogate_keys, task_surrogate_keys
+from backend.utils import bump_table_generation
+
+logger = logging.getLogger(__name__)
+
+# 任务数据变更信号
+# 所有通过ORM写入任务的路径（保存、删除、批量创建、批量更新、按条件更新和删除）
+# 都会在事务提交后发送该信号
+#
+# 参数:
+#     sender: 模型类
+#     action: 变更类型，可选值包括 create, update, delete, archive（归档，任务移到归档表）
+#     pks: 变更的任务ID列表，按条件批量更新时为None
+tasks_changed = Signal()
+
+def send_tasks_changed(sender, action, pks=None, using=None):
+    """
+    在当前事务提交后发送tasks_changed信号
+
+    Args:
+        sender: 模型类
+        action: 变更类型
+        pks: 变更的任务ID列表
+        using: 数据库别名
+    """
+    transaction.on_commit(
+        lambda: tasks_changed.send(sender=sender, action=action, pks=pks),
+        using=using
+    )
+
+@receiver(tasks_changed)
+def bump_task_generation(sender, **kwargs):
+    """任务数据变更后递增任务表版本号，使缓存的总数等失效"""
+    bump_table_generation(sender)
+
+@receiver(tasks_changed)
+def publish_task_event(sender, action, pks=None, **kwargs):
+    """任务数据变更后发布事件，推送给任务事件流的订阅者"""
+    if not settings.TASK_EVENTS_ENABLED:
+        return
+    from .events import get_task_broadcaster
+    try:
+        get_task_broadcaster().publish(action, pks)
+    except Exception:
+        # 事务已经提交，发布失败不影响写入，订阅者重连后会收到reset事件
+        logger.exception("发布任务事件失败")
+
+@receiver(tasks_changed)
+def purge_task_surrogate_keys(sender, action, pks=None, **kwargs):
+    """任务数据变更后清除代理层缓存中的任务列表和变更任务的详情"""
+    purge_surrogate_keys(task_surrogate_keys(pks))
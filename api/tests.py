@@ -1,3 +1,758 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from backend.checks import check_response_cache
+from backend.response_cache import get_response_cache
+from backend.surrogate_keys import NginxCachePurger, PurgeQueue
+from .archive import archive_tasks, restore_archived_tasks
+from .changes import get_task_changes
+from .filters import TASK_ORDERINGS, filter_tasks
+from .importer import import_tasks
+from .models import ArchivedTask, Task, TaskStatusCounter, TaskTombstone
+from .sharding import get_task_shards, shard_for_owner
 
-# Create your tests here.
+# 任务列表支持的过滤条件组合
+FILTER_CASES = [
+    {},
+    {'status': 'pending'},
+    {'status': 'pending,in_progress'},
+    {'created_after': '2025-01-01T00:00:00Z', 'created_before': '2025-02-01T00:00:00Z'},
+    {'updated_after': '2025-01-01T00:00:00Z', 'updated_before': '2025-02-01T00:00:00Z'},
+    {'due_after': '2025-01-01T00:00:00Z', 'due_before': '2025-02-01T00:00:00Z'},
+    {'status': 'pending', 'created_after': '2025-01-01T00:00:00Z'},
+    {'status': 'completed', 'updated_before': '2025-02-01T00:00:00Z'},
+]
+
+# 全表扫描的执行计划特征
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN api_task\b(?! USING)'),
+    'postgresql': re.compile(r'Seq Scan on api_task\b'),
+}
+
+class TaskQueryPlanMixin:
+    """检查任务列表支持的每种过滤和排序组合都使用索引扫描，由当前数据库对应的测试类执行"""
+
+    def assert_no_full_scan(self):
+        pattern = FULL_SCAN_PATTERNS[connection.vendor]
+        for params in FILTER_CASES:
+            for ordering_name, ordering in TASK_ORDERINGS.items():
+                with self.subTest(filter=params, ordering=ordering_name):
+                    plan = filter_tasks(Task.objects.all(), params).order_by(*ordering)[:10].explain()
+                    self.assertIsNone(pattern.search(plan), plan)
+
+@skipUnless(connection.vendor == 'sqlite', '需要SQLite数据库')
+class SQLiteTaskQueryPlanTests(TaskQueryPlanMixin, TestCase):
+
+    def test_list_queries_use_indexes(self):
+        self.assert_no_full_scan()
+
+@skipUnless(connection.vendor == 'postgresql', '需要PostgreSQL数据库（DATABASE_URL指向PostgreSQL时运行）')
+class PostgresTaskQueryPlanTests(TaskQueryPlanMixin, TestCase):
+
+    def test_list_queries_use_indexes(self):
+        # 表中数据很少时PostgreSQL总是选择顺序扫描，这里只检查索引是否可用
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assert_no_full_scan()
+
+class TaskFilterScopeTests(TestCase):
+    """列表的过滤参数不影响详情、更新和删除接口"""
+    # 启用分片时列表读取所有分片
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.task = Task.objects.create(title='任务', status='pending')
+
+    def test_retrieve_ignores_list_filters(self):
+        response = self.client.get(f'/api/tasks/{self.task.pk}/', {'status': 'completed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['task']['id'], self.task.pk)
+
+    def test_retrieve_ignores_invalid_list_filters(self):
+        response = self.client.get(f'/api/tasks/{self.task.pk}/', {'created_after': 'invalid'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_invalid_id_returns_404(self):
+        for lookup in ('abc', '1.5'):
+            response = self.client.get(f'/api/tasks/{lookup}/')
+            self.assertEqual(response.status_code, 404)
+
+    def test_batch_retrieve_invalid_id_returns_404(self):
+        response = self.client.post(
+            '/api/batch/', {'requests': [{'method': 'GET', 'path': '/api/tasks/abc/'}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['responses'][0]['status'], 404)
+
+    def test_list_applies_filters(self):
+        response = self.client.get('/api/tasks/', {'status': 'completed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['tasks'], [])
+
+@skipUnless(len(settings.TASK_SHARDS) > 1, '需要多个任务分片（--settings=backend.test_settings_shards）')
+class TaskShardingTests(TestCase):
+    """任务按所有者写入分片，按ID路由，列表和批量操作覆盖所有分片"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        User = get_user_model()
+        # 连续的用户ID覆盖每个分片
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='password') for i in range(len(get_task_shards()))
+        ]
+
+    def create_task(self, user, title):
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/tasks/', {'title': title}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['data']['task']['id']
+
+    def assert_on_shard(self, pk, alias):
+        shards = get_task_shards()
+        self.assertEqual(pk % len(shards), shards.index(alias))
+        for other in shards:
+            self.assertEqual(Task.objects.using(other).filter(pk=pk).exists(), other == alias)
+
+    def test_create_routes_by_owner(self):
+        for user in self.users:
+            pk = self.create_task(user, f'任务{user.pk}')
+            self.assert_on_shard(pk, shard_for_owner(user.pk))
+            self.assertEqual(Task.objects.using(shard_for_owner(user.pk)).get(pk=pk).owner_id, user.pk)
+
+    def test_detail_routes_by_id(self):
+        for user in self.users:
+            pk = self.create_task(user, '任务')
+            alias = shard_for_owner(user.pk)
+
+            response = self.client.get(f'/api/tasks/{pk}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['data']['task']['id'], pk)
+
+            response = self.client.patch(f'/api/tasks/{pk}/', {'status': 'completed'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(Task.objects.using(alias).get(pk=pk).status, 'completed')
+
+            response = self.client.delete(f'/api/tasks/{pk}/')
+            self.assertEqual(response.status_code, 204)
+            self.assertFalse(Task.objects.using(alias).filter(pk=pk).exists())
+            self.assertTrue(TaskTombstone.objects.using(alias).filter(task_id=pk).exists())
+
+    def test_list_merges_shards(self):
+        pks = [self.create_task(user, f'任务{i}') for i in range(2) for user in self.users]
+        self.client.force_authenticate(None)
+        expected = [
+            task.pk for task in sorted(
+                (task for alias in get_task_shards() for task in Task.objects.using(alias).all()),
+                key=lambda task: (task.created_at, task.pk), reverse=True
+            )
+        ]
+        self.assertEqual(sorted(expected), sorted(pks))
+
+        response = self.client.get('/api/tasks/', {'page_size': 4})
+        self.assertEqual(response.data['pagination']['total_items'], len(pks))
+        self.assertEqual([task['id'] for task in response.data['data']['tasks']], expected[:4])
+
+        seen, cursor = [], ''
+        while cursor is not None:
+            response = self.client.get('/api/tasks/', {'page_size': 2, 'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            seen += [task['id'] for task in response.data['data']['tasks']]
+            cursor = response.data['pagination']['next_cursor']
+        self.assertEqual(seen, expected)
+
+        owner = self.users[1]
+        response = self.client.get('/api/tasks/', {'owner_id': owner.pk})
+        self.assertEqual(
+            sorted(task['id'] for task in response.data['data']['tasks']),
+            sorted(Task.objects.using(shard_for_owner(owner.pk)).filter(owner_id=owner.pk).values_list('id', flat=True))
+        )
+        self.assertNotIn('owner_id', response.data['data']['tasks'][0])
+
+    def test_bulk_paths(self):
+        pks = []
+        for user in self.users:
+            self.client.force_authenticate(user)
+            response = self.client.post(
+                '/api/tasks/bulk/', {'tasks': [{'title': '批量1'}, {'title': '批量2'}]}, format='json'
+            )
+            self.assertEqual(response.status_code, 201)
+            for result in response.data['data']['results']:
+                self.assert_on_shard(result['task']['id'], shard_for_owner(user.pk))
+                pks.append(result['task']['id'])
+
+        self.client.force_authenticate(self.users[0])
+        response = self.client.patch(
+            '/api/tasks/bulk/', {'tasks': [{'id': pk, 'status': 'in_progress'} for pk in pks[::2]]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            '/api/tasks/transition/', {'filter': {'status': 'pending'}, 'to_status': 'completed'}, format='json'
+        )
+        self.assertEqual(response.data['data']['affected'], len(pks[1::2]))
+
+        response = self.client.get('/api/tasks/status-summary/')
+        counts = response.data['data']['counts']
+        self.assertEqual((counts['in_progress'], counts['completed']), (len(pks[::2]), len(pks[1::2])))
+        for alias in get_task_shards():
+            self.assertEqual(TaskStatusCounter.reconcile(using=alias, dry_run=True), {})
+
+        response = self.client.delete('/api/tasks/bulk/', {'ids': pks}, format='json')
+        self.assertEqual(response.data['data']['deleted'], len(pks))
+        for alias in get_task_shards():
+            self.assertFalse(Task.objects.using(alias).exists())
+
+class ResponseCacheInvalidationTests(TestCase):
+    """响应缓存由共享缓存中的版本号失效，进程内缓存下不启用"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, True)
+
+    def list_titles(self):
+        response = self.client.get('/api/tasks/', {'fields': 'title'})
+        self.assertEqual(response.status_code, 200)
+        return [task['title'] for task in response.data['data']['tasks']]
+
+    def test_write_through_other_cache_instance_invalidates(self):
+        shared = {
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.location}
+        }
+        with override_settings(CACHES=shared, RESPONSE_CACHE_ENABLED=True):
+            self.assertTrue(get_response_cache('tasks', Task).enabled)
+            Task.objects.create(title='旧任务')
+            self.assertEqual(self.list_titles(), ['旧任务'])
+
+            # 模拟另一个进程：通过独立的缓存实例递增版本号
+            other = FileBasedCache(self.location, {})
+            with mock.patch('backend.utils.cache', other), self.captureOnCommitCallbacks(execute=True):
+                Task.objects.create(title='其他进程的任务')
+            self.assertEqual(sorted(self.list_titles()), ['其他进程的任务', '旧任务'])
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}, RESPONSE_CACHE_ENABLED=True
+    )
+    def test_process_local_cache_is_rejected(self):
+        self.assertFalse(get_response_cache('tasks', Task).enabled)
+        self.assertEqual([error.id for error in check_response_cache(None)], ['backend.E001'])
+
+class TaskListValidatorTests(TestCase):
+    """列表的ETag由数据库中的版本生成，不依赖进程内的版本号"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.task = Task.objects.create(title='任务', status='completed')
+
+    def conditional_get(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        return lambda: self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_unchanged_list_returns_304(self):
+        self.assertEqual(self.conditional_get()(), 304)
+
+    def test_writes_without_generation_bump_change_etag(self):
+        # 模拟其他进程的写入：当前进程的版本号不变
+        writes = [
+            lambda: Task.objects.create(title='新任务'),
+            lambda: Task.objects.filter(pk=self.task.pk).update(title='改名'),
+            lambda: Task.objects.filter(pk=self.task.pk).delete(),
+        ]
+        for write in writes:
+            check = self.conditional_get()
+            with mock.patch('api.signals.bump_table_generation'), self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertEqual(check(), 200)
+
+    def test_archive_changes_etag(self):
+        check = self.conditional_get()
+        with mock.patch('api.signals.bump_table_generation'):
+            self.assertEqual(archive_tasks(timezone.now() + datetime.timedelta(seconds=1)), 1)
+        self.assertEqual(check(), 200)
+
+class TaskStatusCounterTests(TestCase):
+    """每种写入方式之后状态计数表与任务表的实际统计一致"""
+    databases = '__all__'
+
+    def setUp(self):
+        User = get_user_model()
+        # 每个分片至少有一个所有者，写入分布到所有分片
+        self.owners = [
+            User.objects.create_user(username=f'counter{i}', password='password') for i in range(len(get_task_shards()))
+        ]
+        self.tasks = [
+            Task.objects.create(title=f'任务{i}', owner_id=self.owners[i % len(self.owners)].pk) for i in range(6)
+        ]
+
+    def assertCountsMatch(self):
+        actual = {status: 0 for status, _ in Task.STATUS_CHOICES}
+        for alias in get_task_shards():
+            for row in Task._base_manager.using(alias).order_by().values('status').annotate(total=Count('pk')):
+                actual[row['status']] += row['total']
+        self.assertEqual(TaskStatusCounter.get_counts(), actual)
+
+    def test_create_and_save(self):
+        self.assertCountsMatch()
+        task = self.tasks[0]
+        task.status = 'in_progress'
+        task.save()
+        self.assertCountsMatch()
+        task.title = '只改标题'
+        task.save()
+        self.assertCountsMatch()
+
+    def test_queryset_update(self):
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks[:3]]).update(status='completed')
+        self.assertCountsMatch()
+        Task.objects.filter(status='completed').update(title='已完成')
+        self.assertCountsMatch()
+
+    def test_delete(self):
+        self.tasks[0].delete()
+        self.assertCountsMatch()
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks[1:3]]).delete()
+        self.assertCountsMatch()
+
+    def test_bulk_create(self):
+        Task.objects.bulk_create([
+            Task(title=f'批量{i}', status=status, owner_id=self.owners[i % len(self.owners)].pk)
+            for i, status in enumerate(['pending', 'completed', 'cancelled', 'completed'])
+        ])
+        self.assertCountsMatch()
+
+    def test_bulk_update(self):
+        tasks = list(Task.objects.filter(pk__in=[task.pk for task in self.tasks[:4]]))
+        for task, status in zip(tasks, ['completed', 'cancelled', 'in_progress', 'pending']):
+            task.status = status
+        Task.objects.bulk_update(tasks, ['status'])
+        self.assertCountsMatch()
+
+    def test_transition(self):
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks[:2]]).transition('in_progress')
+        self.assertCountsMatch()
+        Task.objects.all().transition('completed', batch_size=2)
+        self.assertCountsMatch()
+
+    def test_archive_and_restore(self):
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks[:3]]).update(status='completed')
+        for alias in get_task_shards():
+            archive_tasks(timezone.now() + datetime.timedelta(seconds=1), using=alias)
+        self.assertCountsMatch()
+        for alias in get_task_shards():
+            restore_archived_tasks(ArchivedTask.objects.using(alias).all())
+        self.assertCountsMatch()
+
+class TaskBulkEndpointTests(TestCase):
+    """批量创建、更新和删除接口"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='bulk', password='password'))
+        self.tasks = [Task.objects.create(title=f'任务{i}') for i in range(3)]
+
+    def task_count(self):
+        """所有分片中的任务数，新任务按所有者写入对应的分片"""
+        return sum(Task.objects.using(alias).count() for alias in get_task_shards())
+
+    def test_bulk_create_is_all_or_nothing(self):
+        response = self.client.post('/api/tasks/bulk/', {'tasks': [{'title': '新任务'}, {'title': ''}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['success'] for result in response.data['data']['results']], [True, False])
+        self.assertEqual(self.task_count(), 3)
+
+        response = self.client.post('/api/tasks/bulk/', {'tasks': [{'title': '新任务'}]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.task_count(), 4)
+
+    def test_bulk_create_rejects_non_array(self):
+        for body in ({}, {'tasks': []}, {'tasks': {'title': '任务'}}):
+            self.assertEqual(self.client.post('/api/tasks/bulk/', body, format='json').status_code, 400)
+
+    def test_bulk_update(self):
+        response = self.client.patch(
+            '/api/tasks/bulk/', {'tasks': [{'id': task.pk, 'status': 'completed'} for task in self.tasks[:2]]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(Task.objects.order_by('pk').values_list('status', flat=True)), ['completed', 'completed', 'pending']
+        )
+
+    def test_bulk_update_rejects_invalid_ids(self):
+        pk = self.tasks[0].pk
+        items = [
+            {'id': [pk], 'title': '列表'},
+            {'id': {'id': pk}, 'title': '对象'},
+            {'id': str(pk), 'title': '字符串'},
+            {'id': True, 'title': '布尔'},
+            {'title': '缺少ID'},
+            {'id': 999999, 'title': '不存在'},
+            {'id': pk, 'title': '有效'},
+            {'id': pk, 'title': '重复'},
+        ]
+        response = self.client.patch('/api/tasks/bulk/', {'tasks': items}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = [result['errors'] and result['errors'].get('id') for result in response.data['data']['results']]
+        self.assertEqual(errors, [['任务ID必须是整数']] * 5 + [['任务不存在'], None, ['重复的任务ID']])
+        self.assertEqual(Task.objects.get(pk=pk).title, '任务0')
+
+    def test_bulk_destroy(self):
+        ids = [self.tasks[0].pk, 999999]
+        response = self.client.delete('/api/tasks/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['deleted'], 1)
+        self.assertEqual([result['success'] for result in response.data['data']['results']], [True, False])
+        self.assertTrue(TaskTombstone.objects.filter(task_id=self.tasks[0].pk).exists())
+
+        response = self.client.delete('/api/tasks/bulk/', {'ids': [[1]]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+class TaskImportTests(TestCase):
+    """流式导入任务"""
+    databases = '__all__'
+
+    def task_count(self):
+        return sum(Task.objects.using(alias).count() for alias in get_task_shards())
+
+    def test_ndjson_errors_and_chunks(self):
+        lines = [
+            '{"title": "任务1"}',
+            '',
+            '不是JSON',
+            '["不是对象"]',
+            '{"title": ""}',
+            '{"title": "任务2", "status": "completed"}',
+            '{"title": "任务3"}',
+        ]
+        stream = io.BytesIO('\n'.join(lines).encode())
+        with mock.patch.object(Task.objects, 'bulk_create', wraps=Task.objects.bulk_create) as bulk_create:
+            summary = import_tasks(stream, chunk_size=2, batch_size=1)
+        self.assertEqual((summary['total'], summary['created'], summary['failed']), (6, 3, 3))
+        self.assertEqual([error['line'] for error in summary['errors']], [3, 4, 5])
+        self.assertEqual(summary['errors'][0]['errors'], '无效的JSON')
+        self.assertIn('title', summary['errors'][2]['errors'])
+        # 空行不计入，每2行一块：第二块（第4、5行）都失败，不写入
+        self.assertEqual([len(call.args[0]) for call in bulk_create.call_args_list], [1, 2])
+        self.assertEqual(self.task_count(), 3)
+        self.assertEqual(TaskStatusCounter.get_counts()['completed'], 1)
+
+    def test_errors_truncated(self):
+        stream = io.BytesIO('\n'.join(['{"title": ""}'] * 5).encode())
+        summary = import_tasks(stream, max_errors=2)
+        self.assertEqual((summary['failed'], len(summary['errors']), summary['errors_truncated']), (5, 2, True))
+
+    def test_csv(self):
+        content = '\ufefftitle,status\n任务1,completed\n,\n任务2\n任务3,\n'.encode()
+        summary = import_tasks(io.BytesIO(content), 'csv')
+        self.assertEqual((summary['total'], summary['created'], summary['failed']), (3, 2, 1))
+        self.assertEqual(summary['errors'][0]['line'], 4)
+        self.assertEqual(
+            sorted(task.status for alias in get_task_shards() for task in Task.objects.using(alias).all()),
+            ['completed', 'pending']
+        )
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='importer', password='password'))
+        response = client.generic('POST', '/api/tasks/import/', 'title\n任务1\n'.encode(), content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['created'], 1)
+
+        response = client.post('/api/tasks/import/?import_format=xml', b'', content_type='application/xml')
+        self.assertEqual(response.status_code, 400)
+
+class TaskAttachmentTests(TestCase):
+    """附件的分块上传、断点续传和下载"""
+    databases = '__all__'
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        media = override_settings(MEDIA_ROOT=media_root, TASK_ATTACHMENT_ACCEL_REDIRECT=False)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='files', password='password'))
+        response = self.client.post('/api/tasks/', {'title': '附件任务'}, format='json')
+        self.url = f"/api/tasks/{response.data['data']['task']['id']}/attachments/"
+
+    def start_upload(self, size, content_type='application/octet-stream'):
+        return self.client.post(
+            self.url, {'filename': 'file.bin', 'size': size, 'content_type': content_type}, format='json'
+        )
+
+    def put_chunk(self, upload_id, content, start, size):
+        return self.client.put(
+            f"{self.url}uploads/{upload_id}/", content, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(content) - 1}/{size}"
+        )
+
+    def upload(self, content, content_type):
+        upload_id = self.start_upload(len(content), content_type).data['data']['upload']['id']
+        response = self.put_chunk(upload_id, content, 0, len(content))
+        self.assertEqual(response.status_code, 201)
+        return f"{self.url}{response.data['data']['attachment']['id']}/"
+
+    def test_rejects_invalid_content_type(self):
+        for content_type in ('text/html\r\nSet-Cookie: a=b', 'html', 'text/html; charset=utf-8', '', 'a/b c'):
+            response = self.start_upload(10, content_type)
+            self.assertEqual(response.status_code, 400, content_type)
+        response = self.start_upload(10, ' Image/PNG ')
+        self.assertEqual(response.data['data']['upload']['content_type'], 'image/png')
+
+    def test_inline_only_for_allowed_types(self):
+        html = self.upload(b'<script>alert(1)</script>', 'text/html')
+        response = self.client.get(html, {'inline': ''})
+        self.assertEqual(response['Content-Type'], 'text/html')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+
+        png = self.upload(b'\x89PNG', 'image/png')
+        self.assertTrue(self.client.get(png, {'inline': ''})['Content-Disposition'].startswith('inline'))
+        self.assertTrue(self.client.get(png)['Content-Disposition'].startswith('attachment'))
+
+    def test_resume_and_conflict(self):
+        content = b'0123456789'
+        upload_id = self.start_upload(len(content)).data['data']['upload']['id']
+        response = self.put_chunk(upload_id, content[:4], 0, len(content))
+        self.assertEqual(response.data['data']['upload']['received'], 4)
+        self.assertEqual(self.client.get(f"{self.url}uploads/{upload_id}/").data['data']['upload']['received'], 4)
+
+        response = self.put_chunk(upload_id, content[:4], 0, len(content))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.data['code'], response.data['data']['received']), (1010, 4))
+
+        response = self.put_chunk(upload_id, content[4:], 4, len(content))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['data']['attachment']['size'], len(content))
+
+    def test_range_download(self):
+        url = self.upload(b'0123456789', 'text/plain')
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+class BatchViewTests(TestCase):
+    """批量请求接口"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='batch', password='password'))
+
+    def batch(self, *items, **extra):
+        response = self.client.post('/api/batch/', {'requests': list(items), **extra}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']['responses']
+
+    def test_subrequests_in_order(self):
+        responses = self.batch(
+            {'id': 'create', 'method': 'POST', 'path': '/api/tasks/', 'body': {'title': '批量任务'}},
+            {'path': '/api/tasks/?page_size=10'},
+        )
+        self.assertEqual([(result.get('id'), result['status']) for result in responses], [('create', 201), (None, 200)])
+        self.assertEqual(responses[1]['body']['data']['tasks'][0]['title'], '批量任务')
+        self.assertIn('ETag', responses[1]['headers'])
+
+    def test_rejected_subrequests(self):
+        responses = self.batch(
+            {'method': 'POST', 'path': '/api/batch/', 'body': {'requests': [{'path': '/api/tasks/'}]}},
+            {'path': '/api/tasks/export/'},
+            {'path': '/api/tasks/events/'},
+            {'path': '/api/missing/'},
+        )
+        self.assertEqual(
+            [(result['status'], result['body']['code']) for result in responses],
+            [(400, 1006), (400, 1006), (400, 1006), (404, 1004)]
+        )
+
+    def test_invalid_batch(self):
+        self.assertEqual(self.client.post('/api/batch/', {'requests': []}, format='json').status_code, 400)
+        response = self.client.post('/api/batch/', {'requests': [{'path': '/admin/'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with override_settings(BATCH_MAX_REQUESTS=1):
+            response = self.client.post(
+                '/api/batch/', {'requests': [{'path': '/api/tasks/'}] * 2}, format='json'
+            )
+        self.assertEqual(response.status_code, 400)
+
+class BatchViewConcurrentTests(TransactionTestCase):
+    """并发执行的子请求在线程池中使用各自的数据库连接，需要已提交的数据"""
+    databases = '__all__'
+
+    @override_settings(BATCH_MAX_WORKERS=3)
+    def test_concurrent(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='concurrent', password='password'))
+        pks = [client.post('/api/tasks/', {'title': f'任务{i}'}, format='json').data['data']['task']['id']
+               for i in range(3)]
+        items = [{'id': str(pk), 'path': f'/api/tasks/{pk}/'} for pk in pks]
+        with mock.patch('backend.batch.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as executor:
+            response = client.post('/api/batch/', {'requests': items, 'concurrent': True}, format='json')
+        executor.assert_called_once_with(max_workers=3)
+        responses = response.data['data']['responses']
+        self.assertEqual([result['id'] for result in responses], [str(pk) for pk in pks])
+        self.assertEqual([result['body']['data']['task']['id'] for result in responses], pks)
+
+class NginxCachePurgerTests(SimpleTestCase):
+    """按nginx缓存文件中保存的Surrogate-Key删除缓存"""
+
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_path, True)
+        self.purger = NginxCachePurger(self.cache_path)
+
+    def write_cache_file(self, name, response, key=b'\nKEY: http/api/tasks/\n'):
+        directory = os.path.join(self.cache_path, name[-1], name[-3:-1])
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            # 二进制头中可能包含换行
+            f.write(b'\x05\x00\n\x00\xff' * 8 + key + response)
+        return path
+
+    def test_read_keys(self):
+        path = self.write_cache_file('a01', (
+            b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nsurrogate-KEY: tasks task-1\r\n\r\n'
+            b'{"Surrogate-Key: task-2"}'
+        ))
+        self.assertEqual(self.purger.read_keys(path), {'tasks', 'task-1'})
+
+        missing = self.write_cache_file('b02', b'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n\r\nbody')
+        self.assertEqual(self.purger.read_keys(missing), set())
+        unknown = self.write_cache_file('c03', b'Surrogate-Key: tasks\r\n\r\n', key=b'')
+        self.assertEqual(self.purger.read_keys(unknown), set())
+
+        # 响应头超出读取长度的部分不检查
+        long_header = b'X-Padding: ' + b'x' * NginxCachePurger.header_read_size + b'\r\n'
+        truncated = self.write_cache_file('d04', b'HTTP/1.1 200 OK\r\n' + long_header + b'Surrogate-Key: tasks\r\n\r\n')
+        self.assertEqual(self.purger.read_keys(truncated), set())
+
+    def test_purge(self):
+        item = self.write_cache_file('a01', b'HTTP/1.1 200 OK\r\nSurrogate-Key: task task-1\r\n\r\n')
+        collection = self.write_cache_file('b02', b'HTTP/1.1 200 OK\r\nSurrogate-Key: tasks\r\n\r\n')
+        self.purger.purge(['task-1', 'task-9'])
+        self.assertEqual((os.path.exists(item), os.path.exists(collection)), (False, True))
+
+class RecordingPurger:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self.called = threading.Event()
+
+    def purge(self, keys):
+        self.batches.append(keys)
+        self.called.set()
+        if self.fail:
+            raise RuntimeError('purge failed')
+
+class PurgeQueueTests(SimpleTestCase):
+    """清除队列的合并、分批和延迟发送"""
+
+    @override_settings(SURROGATE_PURGE_DELAY=0, SURROGATE_PURGE_BATCH_SIZE=2)
+    def test_immediate_batches(self):
+        purger = RecordingPurger()
+        PurgeQueue(purger).add(['task-3', 'tasks', 'task-1', 'task-3'])
+        self.assertEqual(purger.batches, [['task-1', 'task-3'], ['tasks']])
+
+    @override_settings(SURROGATE_PURGE_DELAY=0, SURROGATE_PURGE_BATCH_SIZE=1)
+    def test_failure_does_not_stop_other_batches(self):
+        purger = RecordingPurger(fail=True)
+        with self.assertLogs('backend.surrogate_keys', 'ERROR'):
+            PurgeQueue(purger).add(['task-1', 'task-2'])
+        self.assertEqual(purger.batches, [['task-1'], ['task-2']])
+
+    @override_settings(SURROGATE_PURGE_DELAY=0.05, SURROGATE_PURGE_MAX_DELAY=1.0)
+    def test_coalesces_delayed_keys(self):
+        purger = RecordingPurger()
+        queue = PurgeQueue(purger)
+        queue.add(['task-1'])
+        queue.add(['task-2', 'tasks'])
+        self.assertTrue(purger.called.wait(5))
+        self.assertEqual(purger.batches, [['task-1', 'task-2', 'tasks']])
+
+    @override_settings(SURROGATE_PURGE_DELAY=60, SURROGATE_PURGE_MAX_DELAY=60)
+    def test_flush(self):
+        purger = RecordingPurger()
+        queue = PurgeQueue(purger)
+        queue.add(['task-1'])
+        queue.flush()
+        self.assertEqual(purger.batches, [['task-1']])
+        queue.flush()
+        self.assertEqual(purger.batches, [['task-1']])
+
+class TaskChangesTests(TestCase):
+    """增量同步的游标不越过仍未提交的事务"""
+    databases = '__all__'
+
+    def setUp(self):
+        self.task = Task.objects.create(title='任务')
+        self.updated_at = timezone.now() - datetime.timedelta(seconds=10)
+        Task.objects.filter(pk=self.task.pk).update(updated_at=self.updated_at)
+
+    def test_returns_settled_changes(self):
+        upserted, _, _, _ = get_task_changes(None)
+        self.assertEqual([task['id'] for task in upserted], [self.task.pk])
+
+    def test_stops_before_open_write_transaction(self):
+        # 一个写事务在任务更新之前开始且仍未提交，它提交的行的updated_at可能早于该任务
+        started = self.updated_at - datetime.timedelta(seconds=1)
+        with mock.patch('api.changes.get_oldest_write_transaction_start', return_value=started):
+            upserted, _, cursor, _ = get_task_changes(None)
+            self.assertEqual(upserted, [])
+            self.assertEqual(get_task_changes(cursor)[0], [])
+        upserted, _, _, _ = get_task_changes(cursor)
+        self.assertEqual([task['id'] for task in upserted], [self.task.pk])
+
+class TaskSchedulerTests(TestCase):
+    """任务截止时间调度进程"""
+    databases = '__all__'
+
+    @override_settings(TASK_EVENTS_ENABLED=True, TASK_EVENTS_BACKEND='api.events.LocalEventBackend')
+    def test_refuses_process_local_event_backend(self):
+        with self.assertRaises(CommandError):
+            call_command('run_task_scheduler')
+
+    @mock.patch('api.scheduler.TASK_DUE_LOAD_BATCH_SIZE', 10)
+    def test_polls_changes_in_pages_without_reloading(self):
+        from .scheduler import DUE, DueScheduler
+        scheduler = DueScheduler(action='notify', remind_before=0)
+        scheduler.run_once()
+        due_at = timezone.now() + datetime.timedelta(seconds=60)
+        tasks = [Task.objects.create(title=f'任务{i}', due_at=due_at) for i in range(25)]
+        Task.objects.filter(pk=tasks[0].pk).update(status='completed')
+
+        scheduler.run_once(timezone.now())
+        self.assertEqual(scheduler.stats['reloads'], 1)
+        self.assertEqual(
+            sorted(pk for pk, kind in scheduler._timers if kind == DUE), sorted(task.pk for task in tasks[1:])
+        )
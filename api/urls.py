@@ -1,12 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet
+from .views import TaskViewSet, task_events
 
 # 创建路由器
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet)
 
 urlpatterns = [
+    # 任务事件流，需要放在路由器之前，避免被当作任务详情匹配
+    path('tasks/events/', task_events, name='task-events'),
     path('', include(router.urls)),
     # 添加DRF的登录URL
     path('auth/', include('rest_framework.urls')),
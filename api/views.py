@@ -1,15 +1,54 @@
-from rest_framework import viewsets, permissions, status
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Max
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from rest_framework import viewsets, permissions, serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
-from backend.utils import api_success_response, api_error_response, paginate_queryset
-from .models import Task
-from .serializers import TaskSerializer
+from backend.querysets import MergedQuerySet
+from backend.response_cache import get_response_cache
+from backend.serialization import get_serialization_plan
+from backend.surrogate_keys import TASK_COLLECTION_KEY, TASK_ITEM_KEY, set_surrogate_keys, task_key
+from backend.utils import (
+    api_success_response, api_error_response, paginate_queryset, get_page_size,
+    make_etag, get_not_modified_response, set_validator_headers
+)
+from .models import ArchivedTask, Task, TaskAttachment, TaskAttachmentUpload, TaskStatusCounter, TaskTombstone
+from .serializers import (
+    TaskAttachmentSerializer, TaskAttachmentUploadSerializer, TaskCycleTimeQuerySerializer, TaskSerializer,
+    TaskTransitionSerializer
+)
+from .filters import TaskFilterBackend, filter_tasks, get_task_ordering
+from .search import search_tasks
+from .export import TASK_EXPORT_FORMATS, stream_tasks
+from .importer import TASK_IMPORT_FORMATS, import_tasks
+from .changes import ChangeCursorExpired, get_task_changes
+from .analytics import get_cycle_time_stats
+from .events import get_task_broadcaster, stream_task_events
+from .attachments import (
+    RangeNotSatisfiable, UploadConflict, attachment_content_type, attachment_name, attachment_path, cancel_upload,
+    create_upload, iter_file_range, parse_content_range, parse_range, write_upload_chunk
+)
+from .sharding import (
+    get_task_shards, group_by_shard, is_sharded, shard_for_owner, shard_for_pk, shard_querysets, task_shards_atomic
+)
+
+# 搜索时默认按相关度排序
+TASK_SEARCH_ORDERING = ('-search_rank', '-id')
+
+# 排序、游标分页和ETag依赖的字段，指定fields参数时也总是查询
+TASK_ALWAYS_LOADED_FIELDS = ('id', 'created_at', 'updated_at')
 
 class TaskViewSet(viewsets.ModelViewSet):
     """
     任务管理API
     ---
     list:
-        描述: 获取任务列表
+        描述: 获取任务列表，响应头包含ETag和Last-Modified，可用于条件请求
         参数:
             - name: page
               description: 页码，默认为1
@@ -21,6 +60,71 @@ class TaskViewSet(viewsets.ModelViewSet):
               required: false
               type: integer
               example: 10
+            - name: cursor
+              description: 游标分页，首页传空值，之后传分页信息中的next_cursor或previous_cursor；传入后忽略page参数
+              required: false
+              type: string
+              example: ""
+            - name: status
+              description: 按状态过滤，多个状态用逗号分隔
+              required: false
+              type: string
+              example: "pending,in_progress"
+            - name: created_after
+              description: 创建时间不早于（ISO 8601格式）
+              required: false
+              type: string
+              example: "2025-04-01T00:00:00Z"
+            - name: created_before
+              description: 创建时间早于（ISO 8601格式）
+              required: false
+              type: string
+              example: "2025-05-01"
+            - name: updated_after
+              description: 更新时间不早于（ISO 8601格式）
+              required: false
+              type: string
+              example: "2025-04-18T00:00:00Z"
+            - name: updated_before
+              description: 更新时间早于（ISO 8601格式）
+              required: false
+              type: string
+              example: "2025-04-19T00:00:00Z"
+            - name: due_after
+              description: 截止时间不早于（ISO 8601格式），没有截止时间的任务不返回
+              required: false
+              type: string
+              example: "2025-05-01T00:00:00Z"
+            - name: due_before
+              description: 截止时间早于（ISO 8601格式），没有截止时间的任务不返回
+              required: false
+              type: string
+              example: "2025-05-08T00:00:00Z"
+            - name: ordering
+              description: 排序字段，可选值：created_at, -created_at(默认), updated_at, -updated_at
+              required: false
+              type: string
+              example: "-updated_at"
+            - name: q
+              description: 全文搜索标题和描述，多个词用空格分隔，未指定ordering时按相关度排序
+              required: false
+              type: string
+              example: "测试"
+            - name: owner_id
+              description: 按所有者（创建任务的用户ID）过滤；启用分片时只查询该所有者所在的分片
+              required: false
+              type: integer
+              example: 1
+            - name: include_archived
+              description: 是否同时返回已归档的任务，默认为false；不能与q同时使用
+              required: false
+              type: boolean
+              example: true
+            - name: fields
+              description: 只返回指定字段（逗号分隔），id总是返回；未指定时使用TASK_LIST_DEFAULT_FIELDS，未配置时返回全部字段
+              required: false
+              type: string
+              example: "title,status"
         响应:
             200:
                 描述: 获取任务列表成功
@@ -47,6 +151,8 @@ class TaskViewSet(viewsets.ModelViewSet):
                             "total_items": 1
                         }
                     }
+            304:
+                描述: 请求头If-None-Match或If-Modified-Since与当前版本匹配，列表未变化，响应体为空
 
     create:
         描述: 创建新任务
@@ -66,6 +172,11 @@ class TaskViewSet(viewsets.ModelViewSet):
               required: false
               type: string
               example: "pending"
+            - name: due_at
+              description: 截止时间（ISO 8601格式），到期未完成时由run_task_scheduler推送due事件或取消任务
+              required: false
+              type: string
+              example: "2025-05-01T18:00:00Z"
         响应:
             201:
                 描述: 创建任务成功
@@ -96,13 +207,18 @@ class TaskViewSet(viewsets.ModelViewSet):
                     }
 
     retrieve:
-        描述: 获取任务详情
+        描述: 获取任务详情，响应头包含ETag和Last-Modified，可用于条件请求
         参数:
             - name: id
               description: 任务ID
               required: true
               type: integer
               example: 1
+            - name: fields
+              description: 只返回指定字段（逗号分隔），id总是返回；未指定时返回全部字段
+              required: false
+              type: string
+              example: "title,status"
         响应:
             200:
                 描述: 获取任务详情成功
@@ -122,6 +238,8 @@ class TaskViewSet(viewsets.ModelViewSet):
                         },
                         "pagination": null
                     }
+            304:
+                描述: 请求头If-None-Match或If-Modified-Since与当前版本匹配，任务未变化，响应体为空
             404:
                 描述: 任务不存在
                 示例:
@@ -155,6 +273,11 @@ class TaskViewSet(viewsets.ModelViewSet):
               required: true
               type: string
               example: "completed"
+            - name: due_at
+              description: 截止时间（ISO 8601格式），可以为null
+              required: false
+              type: string
+              example: "2025-05-01T18:00:00Z"
         响应:
             200:
                 描述: 更新任务成功
@@ -271,10 +394,376 @@ class TaskViewSet(viewsets.ModelViewSet):
                         "data": null,
                         "pagination": null
                     }
+
+    bulk_create:
+        描述: 批量创建任务，所有任务在一次校验和一个事务中创建，任一任务校验失败则全部不创建
+        参数:
+            - name: tasks
+              description: 任务数组，每项字段与创建任务相同，最多TASK_BULK_MAX_ITEMS条
+              required: true
+              type: array
+              example: [{"title": "任务1"}, {"title": "任务2", "status": "in_progress"}]
+        响应:
+            201:
+                描述: 批量创建任务成功
+                示例:
+                    {
+                        "code": 0,
+                        "message": "批量创建任务成功",
+                        "data": {
+                            "results": [
+                                {"index": 0, "success": true, "task": {"id": 3, "title": "任务1", "...": "..."}},
+                                {"index": 1, "success": true, "task": {"id": 4, "title": "任务2", "...": "..."}}
+                            ]
+                        },
+                        "pagination": null
+                    }
+            400:
+                描述: 批量创建任务失败，results中包含每项的校验结果
+                示例:
+                    {
+                        "code": 1006,
+                        "message": "批量创建任务失败",
+                        "data": {
+                            "results": [
+                                {"index": 0, "success": true, "errors": null},
+                                {"index": 1, "success": false, "errors": {"title": ["该字段是必填项。"]}}
+                            ]
+                        },
+                        "pagination": null
+                    }
+
+    bulk_update:
+        描述: 批量部分更新任务，在一次校验和一个事务中更新，任一任务校验失败或不存在则全部不更新
+        参数:
+            - name: tasks
+              description: 任务数组，每项必须包含id，其余字段与部分更新任务相同
+              required: true
+              type: array
+              example: [{"id": 1, "status": "completed"}, {"id": 2, "title": "新标题"}]
+        响应:
+            200:
+                描述: 批量更新任务成功，响应格式与批量创建相同
+
+    bulk_destroy:
+        描述: 批量删除任务，按ID分批执行DELETE语句，同时写入墓碑供变更同步使用
+        参数:
+            - name: ids
+              description: 任务ID数组
+              required: true
+              type: array
+              example: [1, 2, 3]
+        响应:
+            200:
+                描述: 批量删除任务成功
+                示例:
+                    {
+                        "code": 0,
+                        "message": "批量删除任务成功",
+                        "data": {
+                            "results": [
+                                {"index": 0, "id": 1, "success": true},
+                                {"index": 1, "id": 2, "success": false, "errors": "任务不存在"}
+                            ],
+                            "deleted": 1
+                        },
+                        "pagination": null
+                    }
+
+    transition:
+        描述: 将符合条件的所有任务转换为指定状态，使用UPDATE ... WHERE一次更新，同时更新updated_at
+        参数:
+            - name: to_status
+              description: 目标状态
+              required: true
+              type: string
+              example: "cancelled"
+            - name: filter
+              description: 过滤条件，只支持status(字符串或列表), owner_id, created_after, created_before, updated_after, updated_before,
+                           due_after, due_before，至少需要一个条件，未知的键返回400
+              required: true
+              type: object
+              example: {"status": "in_progress", "updated_before": "2025-04-01T00:00:00Z"}
+            - name: batch_size
+              description: 每批更新的数量，不传时一次更新全部
+              required: false
+              type: integer
+              example: 5000
+        响应:
+            200:
+                描述: 转换任务状态成功
+                示例:
+                    {
+                        "code": 0,
+                        "message": "转换任务状态成功",
+                        "data": {
+                            "affected": 128
+                        },
+                        "pagination": null
+                    }
+
+    export:
+        描述: 流式导出任务，支持与任务列表相同的过滤、搜索、排序、include_archived和fields参数，不分页，内存占用与导出行数无关
+        参数:
+            - name: export_format
+              description: 导出格式，可选值：ndjson(默认，每行一个JSON对象), csv(第一行为表头)
+              required: false
+              type: string
+              example: "csv"
+        响应:
+            200:
+                描述: 以附件形式返回的NDJSON或CSV文件，每行的字段与任务列表相同
+
+    import_tasks:
+        描述: 流式导入任务，请求体为NDJSON(每行一个任务对象)或CSV(第一行为表头)，逐行解析，分块校验和提交，校验失败的行不影响其他行
+        参数:
+            - name: import_format
+              description: 导入格式，可选值：ndjson, csv；不传时按Content-Type判断，text/csv为csv，其余为ndjson
+              required: false
+              type: string
+              example: "csv"
+        响应:
+            200:
+                描述: 导入任务完成，返回导入汇总，errors中最多包含TASK_IMPORT_MAX_ERRORS条错误
+                示例:
+                    {
+                        "code": 0,
+                        "message": "导入任务完成",
+                        "data": {
+                            "total": 3,
+                            "created": 2,
+                            "failed": 1,
+                            "errors": [
+                                {"line": 2, "errors": {"title": ["该字段是必填项。"]}}
+                            ],
+                            "errors_truncated": false
+                        },
+                        "pagination": null
+                    }
+
+    changes:
+        描述: 增量同步任务变更，返回游标之后新增或更新的任务，以及删除的任务ID
+        参数:
+            - name: changed_since
+              description: 上次同步返回的next_cursor，首次同步不传，此时返回全部任务
+              required: false
+              type: string
+              example: "eyJ0IjpbIjIwMjUtMDQtMThUMTI6MDA6MDArMDA6MDAiLDFdLCJkIjpbIjIwMjUtMDQtMThUMTI6MDA6MDArMDA6MDAiLDBdfQ"
+            - name: page_size
+              description: 每次最多返回的任务数和删除数，默认为100，最大1000
+              required: false
+              type: integer
+              example: 500
+            - name: fields
+              description: 任务只返回指定字段（逗号分隔），id总是返回
+              required: false
+              type: string
+              example: "title,status,updated_at"
+        响应:
+            200:
+                描述: 获取任务变更成功，has_more为true时应立即用next_cursor继续同步
+                示例:
+                    {
+                        "code": 0,
+                        "message": "获取任务变更成功",
+                        "data": {
+                            "upserted": [
+                                {
+                                    "id": 1,
+                                    "title": "测试任务",
+                                    "description": "这是一个测试任务",
+                                    "status": "completed",
+                                    "created_at": "2025-04-18T12:00:00Z",
+                                    "updated_at": "2025-04-18T13:30:00Z"
+                                }
+                            ],
+                            "deleted": [
+                                {"id": 2, "deleted_at": "2025-04-18T13:00:00Z"}
+                            ]
+                        },
+                        "pagination": {
+                            "page_size": 100,
+                            "next_cursor": "eyJ0IjpbIjIwMjUtMDQtMThUMTM6MzA6MDArMDA6MDAiLDFdLCJkIjpbIjIwMjUtMDQtMThUMTM6MDA6MDArMDA6MDAiLDVdfQ",
+                            "has_more": false
+                        }
+                    }
+            410:
+                描述: 游标早于墓碑保留期限，需要清空本地数据后不带changed_since重新同步
+                示例:
+                    {
+                        "code": 1009,
+                        "message": "同步游标已过期，请重新全量同步",
+                        "data": null,
+                        "pagination": null
+                    }
+
+    status_summary:
+        描述: 获取各状态的任务数量，读取增量维护的计数表，不扫描任务表
+        响应:
+            200:
+                描述: 获取任务状态统计成功
+                示例:
+                    {
+                        "code": 0,
+                        "message": "获取任务状态统计成功",
+                        "data": {
+                            "counts": {
+                                "pending": 12,
+                                "in_progress": 3,
+                                "completed": 40,
+                                "cancelled": 1
+                            },
+                            "total": 56
+                        },
+                        "pagination": null
+                    }
+
+    cycle_time:
+        描述: 按天或周统计已完成任务的周期时间（updated_at - created_at，单位为秒）的百分位和直方图，
+              包括归档的任务；按任务的完成时间（updated_at）划分区间，已结束的区间缓存TASK_ANALYTICS_CACHE_TTL秒
+        参数:
+            - name: period
+              description: 统计粒度，day(默认)或week(周一开始)
+              required: false
+              type: string
+              example: week
+            - name: start
+              description: 开始日期（当前时区），默认按天统计最近30天，按周统计最近12周
+              required: false
+              type: string
+              format: date
+              example: 2025-04-01
+            - name: end
+              description: 结束日期（当前时区，包含在内），默认为今天
+              required: false
+              type: string
+              format: date
+              example: 2025-04-30
+        响应:
+            200:
+                描述: 获取任务周期统计成功，histogram[i]为周期时间在[histogram_edges[i-1], histogram_edges[i])内的任务数
+                示例:
+                    {
+                        "code": 0,
+                        "message": "获取任务周期统计成功",
+                        "data": {
+                            "period": "day",
+                            "start": "2025-04-01T00:00:00Z",
+                            "end": "2025-04-02T00:00:00Z",
+                            "percentiles": [50.0, 90.0],
+                            "histogram_edges": [3600.0, 86400.0],
+                            "buckets": [
+                                {
+                                    "start": "2025-04-01T00:00:00Z",
+                                    "end": "2025-04-02T00:00:00Z",
+                                    "count": 3,
+                                    "mean": 28800.0,
+                                    "min": 1800.0,
+                                    "max": 79200.0,
+                                    "percentiles": {"p50": 5400.0, "p90": 64440.0},
+                                    "histogram": [1, 2, 0]
+                                }
+                            ],
+                            "total": {
+                                "count": 3,
+                                "mean": 28800.0,
+                                "min": 1800.0,
+                                "max": 79200.0,
+                                "histogram": [1, 2, 0]
+                            }
+                        },
+                        "pagination": null
+                    }
+
+    attachments:
+        描述: GET获取任务的附件列表；POST开始上传附件，之后用attachment_upload按顺序上传分块
+        参数:
+            - name: filename
+              description: 文件名
+              required: true
+              type: string
+              example: "报告.pdf"
+            - name: size
+              description: 文件字节数，不超过TASK_ATTACHMENT_MAX_SIZE；为0时直接返回附件
+              required: true
+              type: integer
+              example: 10485760
+            - name: content_type
+              description: MIME类型，type/subtype格式，不带参数，默认为application/octet-stream
+              required: false
+              type: string
+              example: "application/pdf"
+        响应:
+            201:
+                描述: 开始上传附件
+                示例:
+                    {
+                        "code": 0,
+                        "message": "开始上传附件",
+                        "data": {
+                            "upload": {
+                                "id": "0b9d5c1e-7f3a-4c1e-9a57-3f2f4f0f6a11",
+                                "task_id": 1,
+                                "filename": "报告.pdf",
+                                "content_type": "application/pdf",
+                                "size": 10485760,
+                                "received": 0,
+                                "created_at": "2025-04-18T12:00:00Z",
+                                "updated_at": "2025-04-18T12:00:00Z"
+                            }
+                        },
+                        "pagination": null
+                    }
+
+    attachment_upload:
+        描述: PUT上传一个分块，请求体为分块的原始内容，Content-Range请求头指定范围（如bytes 0-4194303/10485760），
+              不传时请求体为整个文件；GET查询已接收的字节数，用于断点续传；DELETE取消上传
+        响应:
+            200:
+                描述: 上传分块成功，data.upload.received为已接收的字节数
+            201:
+                描述: 最后一个分块上传完成，data.attachment为新建的附件
+            409:
+                描述: 分块的起始位置与已接收的字节数不一致，data.received为已接收的字节数，客户端从这里继续上传
+
+    attachment:
+        描述: GET下载附件，支持Range（单个范围）、If-Range和If-None-Match，传inline参数时在浏览器中直接打开
+              （只限TASK_ATTACHMENT_INLINE_TYPES中的类型，其余类型总是作为附件下载）；DELETE删除附件
+        响应:
+            200:
+                描述: 附件内容
+            206:
+                描述: Range请求的部分内容
+            416:
+                描述: Range超出文件大小
+
+    cache_stats:
+        描述: 获取当前进程任务响应缓存的命中统计，仅管理员可用
+        响应:
+            200:
+                描述: 获取缓存统计成功
+                示例:
+                    {
+                        "code": 0,
+                        "message": "获取缓存统计成功",
+                        "data": {
+                            "local_hits": 950,
+                            "shared_hits": 12,
+                            "misses": 38,
+                            "hit_rate": 0.962,
+                            "local_entries": 38,
+                            "local_max_entries": 1000,
+                            "enabled": true,
+                            "shared_alias": null,
+                            "generation": 1745000000000000042
+                        },
+                        "pagination": null
+                    }
     """
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [TaskFilterBackend]
 
     def get_permissions(self):
         """允许未登录用户查看和创建任务"""
@@ -282,28 +771,294 @@ class TaskViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return super().get_permissions()
 
+    def get_requested_fields(self):
+        """
+        读取列表和详情接口的fields参数
+
+        未传fields时列表使用TASK_LIST_DEFAULT_FIELDS，其余接口返回全部字段，id总是返回
+
+        Returns:
+            list: 需要返回的字段，返回全部字段时为None
+
+        Raises:
+            ValidationError: 包含未知字段
+        """
+        if self.action not in ('list', 'retrieve', 'export', 'changes'):
+            return None
+        param = self.request.query_params.get('fields')
+        if param:
+            fields = [name.strip() for name in param.split(',') if name.strip()]
+        elif self.action == 'list':
+            fields = settings.TASK_LIST_DEFAULT_FIELDS
+        else:
+            fields = None
+        if not fields:
+            return None
+
+        unknown = sorted(set(fields) - set(TaskSerializer.Meta.fields))
+        if unknown:
+            raise ValidationError({'fields': f"未知字段: {', '.join(unknown)}"})
+        return [name for name in TaskSerializer.Meta.fields if name == 'id' or name in fields]
+
+    def get_queryset(self):
+        """
+        指定fields时只查询需要的列，未使用的列（如description）不从数据库读取
+
+        启用分片时，详情、更新和删除接口按任务ID直接查询所在的分片
+        """
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is not None:
+            queryset = queryset.only(*dict.fromkeys(TASK_ALWAYS_LOADED_FIELDS + tuple(fields)))
+        lookup_value = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup_value is not None and is_sharded():
+            try:
+                queryset = queryset.using(shard_for_pk(lookup_value))
+            except (TypeError, ValueError):
+                pass
+        return queryset
+
+    def filter_queryset(self, queryset):
+        """过滤参数只用于列表和导出接口，详情、更新和删除等接口按ID查询，不受查询参数影响"""
+        if self.action not in ('list', 'export'):
+            return queryset
+        return super().filter_queryset(queryset)
+
+    def get_owner_id(self):
+        """当前用户的ID，作为新建任务的所有者，匿名用户为None"""
+        user = self.request.user
+        return user.pk if user.is_authenticated else None
+
+    def get_archived_queryset(self):
+        """归档表的查询集，与get_queryset一样只查询需要的列"""
+        queryset = ArchivedTask.objects.all()
+        fields = self.get_requested_fields()
+        if fields is not None:
+            queryset = queryset.only(*dict.fromkeys(TASK_ALWAYS_LOADED_FIELDS + tuple(fields)))
+        return queryset
+
+    def get_include_archived(self):
+        """读取列表的include_archived参数"""
+        value = self.request.query_params.get('include_archived')
+        if not value:
+            return False
+        try:
+            return serializers.BooleanField().to_internal_value(value)
+        except ValidationError:
+            raise ValidationError({'include_archived': '无效的布尔值'})
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_response_cache(self):
+        """任务读取接口的响应缓存，任务表写入后失效"""
+        return get_response_cache('tasks', Task)
+
+    def get_surrogate_keys(self):
+        """
+        代理层缓存响应使用的Surrogate-Key，任务写入后按键清除
+
+        代理层的任务缓存不区分用户，只有允许匿名访问的列表和详情可以由代理层缓存；
+        需要登录的接口（统计、变更同步、导出、附件等）不设置，否则代理层会把登录用户的响应返回给匿名请求
+
+        Returns:
+            list: 键列表，为None时不设置
+        """
+        if self.action == 'list':
+            return [TASK_COLLECTION_KEY]
+        if self.action == 'retrieve':
+            return [TASK_ITEM_KEY, task_key(self.kwargs[self.lookup_url_kwarg or self.lookup_field])]
+        return None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        cacheable = response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED)
+        if request.method in ('GET', 'HEAD') and cacheable:
+            set_surrogate_keys(response, self.get_surrogate_keys())
+        return response
+
+    def get_entry_response(self, request, entry, message):
+        """
+        按缓存项生成响应
+
+        Args:
+            request: 请求对象
+            entry: 缓存项，包含data、pagination、etag、last_modified
+            message: 成功提示
+
+        Returns:
+            Response: 请求中的验证器与缓存项匹配时为304响应
+        """
+        not_modified = get_not_modified_response(request, entry['etag'], entry['last_modified'])
+        if not_modified is not None:
+            return not_modified
+        response = api_success_response(
+            data=entry['data'],
+            message=message,
+            pagination=entry['pagination']
+        )
+        return set_validator_headers(response, entry['etag'], entry['last_modified'])
+
+    def get_list_queryset(self, request):
+        """
+        按列表的过滤、搜索和排序参数构建查询集
+
+        Returns:
+            tuple: (查询集, 排序字段)
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # 全文搜索
+        query = request.query_params.get('q')
+        if query:
+            queryset = search_tasks(queryset, query)
+
+        # 排序，只允许有索引支持的排序字段；搜索且未指定排序时按相关度排序
+        if query and not request.query_params.get('ordering'):
+            ordering = TASK_SEARCH_ORDERING
+        else:
+            ordering = get_task_ordering(request.query_params)
+
+        querysets = [queryset]
+        # 同时读取归档表：两个表按相同的条件和排序分别查询，分页时归并
+        if self.get_include_archived():
+            if query:
+                raise ValidationError({'include_archived': '全文搜索不支持读取归档的任务'})
+            querysets.append(filter_tasks(self.get_archived_queryset(), request.query_params))
+
+        # 启用分片时，按所有者过滤只查询所在的分片，否则查询所有分片后归并
+        if is_sharded():
+            owner_id = request.query_params.get('owner_id')
+            if owner_id:
+                querysets = [part.using(shard_for_owner(int(owner_id))) for part in querysets]
+            else:
+                querysets = [part.using(alias) for part in querysets for alias in get_task_shards()]
+
+        if len(querysets) > 1:
+            return MergedQuerySet(querysets).order_by(*ordering), ordering
+        return querysets[0].order_by(*ordering), ordering
+
+    def get_list_version(self):
+        """
+        从数据库读取任务列表的版本，用于生成列表的ETag和Last-Modified
+
+        版本由任务的最后更新时间、任务总数（状态计数表之和）、最后删除时间和最后归档时间组成，
+        任何进程的创建和更新都会使最后更新时间变大，删除会写入墓碑，归档会减少任务总数并写入归档时间。
+        每个分片只读取(updated_at, id)、(deleted_at, id)和archived_at索引的一端以及很小的计数表，不扫描任务表
+
+        Returns:
+            tuple: (版本值, 最后修改时间)，没有任何数据时最后修改时间为None
+        """
+        latest = []
+        for model, field in ((Task, 'updated_at'), (TaskTombstone, 'deleted_at'), (ArchivedTask, 'archived_at')):
+            values = [
+                queryset.aggregate(latest=Max(field))['latest'] for queryset in shard_querysets(model.objects.all())
+            ]
+            latest.append(max((value for value in values if value is not None), default=None))
+        total = sum(TaskStatusCounter.get_counts().values())
+        last_modified = max((value for value in latest if value is not None), default=None)
+        version = [value.isoformat() if value is not None else None for value in latest] + [total]
+        return version, last_modified
+
     def list(self, request, *args, **kwargs):
         """获取任务列表"""
-        queryset = self.filter_queryset(self.get_queryset())
+        # 响应缓存，命中时不查询数据库
+        response_cache = self.get_response_cache()
+        cache_key = response_cache.make_key(
+            'list', request.META.get('QUERY_STRING', ''), request.accepted_renderer.format,
+            self.get_requested_fields()
+        )
+        entry = response_cache.get(cache_key)
+        if entry is not None:
+            return self.get_entry_response(request, entry, '获取任务列表成功')
 
-        # 分页
-        page_data, pagination = paginate_queryset(queryset, request)
+        queryset, ordering = self.get_list_queryset(request)
 
-        serializer = self.get_serializer(page_data, many=True)
-        return api_success_response(
-            data={'tasks': serializer.data},
-            message='获取任务列表成功',
-            pagination=pagination
+        # 条件请求：按数据库中的列表版本生成ETag（参见get_list_version），不依赖进程内的状态，
+        # 其他进程的写入同样会改变ETag。未变化时直接返回304，不再查询分页数据和序列化
+        version, last_modified = self.get_list_version()
+        etag = make_etag(
+            'tasks', request.META.get('QUERY_STRING', ''), request.accepted_renderer.format,
+            self.get_requested_fields(), *version
+        )
+        not_modified = get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        # 快速序列化：用.values()查询，按预编译的计划转换为与序列化器相同的输出，
+        # 不创建模型实例；序列化器包含不支持的字段时使用完整的序列化器
+        plan = None
+        if settings.TASK_FAST_SERIALIZATION:
+            plan = get_serialization_plan(self.get_serializer_class(), self.get_requested_fields())
+        if plan is not None:
+            # 游标分页需要读取排序字段的值
+            names = plan.sources + tuple(field.lstrip('-') for field in ordering)
+            queryset = queryset.values(*dict.fromkeys(names))
+
+        # 分页，带cursor参数时使用游标分页，不统计总数
+        page_data, pagination = paginate_queryset(queryset, request, cursor_ordering=ordering)
+
+        if plan is not None:
+            tasks = plan.serialize(page_data)
+        else:
+            tasks = self.get_serializer(page_data, many=True).data
+        entry = {
+            'data': {'tasks': tasks},
+            'pagination': pagination,
+            'etag': etag,
+            'last_modified': last_modified,
+        }
+        response_cache.set(cache_key, entry)
+        return self.get_entry_response(request, entry, '获取任务列表成功')
+
+    def get_task_etag(self, request, pk, updated_at):
+        """按任务ID、最后更新时间和返回的字段生成ETag"""
+        return make_etag(
+            'task', pk, request.accepted_renderer.format, self.get_requested_fields(),
+            updated_at.isoformat()
         )
 
     def retrieve(self, request, *args, **kwargs):
         """获取任务详情"""
+        lookup_value = kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+        # 响应缓存，命中时不查询数据库
+        response_cache = self.get_response_cache()
+        cache_key = response_cache.make_key(
+            'retrieve', lookup_value, request.accepted_renderer.format, self.get_requested_fields()
+        )
+        entry = response_cache.get(cache_key)
+        if entry is not None:
+            return self.get_entry_response(request, entry, '获取任务详情成功')
+
+        # 条件请求：只查询updated_at生成ETag，未变化时直接返回304，不再读取整行和序列化。
+        # ID格式无效时跳过，由get_object()返回404
+        try:
+            last_modified = self.get_queryset().filter(
+                **{self.lookup_field: lookup_value}
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            last_modified = None
+        if last_modified is not None:
+            etag = self.get_task_etag(request, lookup_value, last_modified)
+            not_modified = get_not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
         instance = self.get_object()
         serializer = self.get_serializer(instance)
-        return api_success_response(
-            data={'task': serializer.data},
-            message='获取任务详情成功'
-        )
+        entry = {
+            'data': {'task': serializer.data},
+            'pagination': None,
+            # 按实际返回的版本生成ETag，两次查询之间任务可能已被更新
+            'etag': self.get_task_etag(request, lookup_value, instance.updated_at),
+            'last_modified': instance.updated_at,
+        }
+        response_cache.set(cache_key, entry)
+        return self.get_entry_response(request, entry, '获取任务详情成功')
 
     def create(self, request, *args, **kwargs):
         """创建任务"""
@@ -321,6 +1076,9 @@ class TaskViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    def perform_create(self, serializer):
+        serializer.save(owner_id=self.get_owner_id())
+
     def update(self, request, *args, **kwargs):
         """更新任务"""
         partial = kwargs.pop('partial', False)
@@ -347,3 +1105,401 @@ class TaskViewSet(viewsets.ModelViewSet):
             message='删除任务成功',
             status=status.HTTP_204_NO_CONTENT
         )
+
+    def get_bulk_items(self, request, key):
+        """
+        读取批量请求中的数组参数
+
+        Raises:
+            ValidationError: 参数不是非空数组或超过数量上限
+        """
+        items = request.data.get(key) if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            raise ValidationError({key: '必须是非空数组'})
+        if len(items) > settings.TASK_BULK_MAX_ITEMS:
+            raise ValidationError({key: f"每次最多{settings.TASK_BULK_MAX_ITEMS}条"})
+        return items
+
+    def bulk_error_response(self, errors, message):
+        """批量校验失败的响应，包含每项的校验结果"""
+        return api_error_response(
+            code=1006,
+            message=message,
+            data={
+                'results': [
+                    {'index': index, 'success': not error, 'errors': error or None}
+                    for index, error in enumerate(errors)
+                ]
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    def bulk_success_response(self, tasks, message, status=status.HTTP_200_OK):
+        """批量写入成功的响应，包含每项的结果"""
+        serializer = self.get_serializer(tasks, many=True)
+        return api_success_response(
+            data={
+                'results': [
+                    {'index': index, 'success': True, 'task': task}
+                    for index, task in enumerate(serializer.data)
+                ]
+            },
+            message=message,
+            status=status
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """批量创建任务"""
+        items = self.get_bulk_items(request, 'tasks')
+        serializer = self.get_serializer(data=items, many=True)
+        if not serializer.is_valid():
+            return self.bulk_error_response(serializer.errors, '批量创建任务失败')
+
+        with task_shards_atomic():
+            tasks = serializer.save(owner_id=self.get_owner_id())
+        return self.bulk_success_response(tasks, '批量创建任务成功', status=status.HTTP_201_CREATED)
+
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        """批量部分更新任务"""
+        items = self.get_bulk_items(request, 'tasks')
+        # 先校验ID是整数，列表、对象等值不能用于查询和去重，对应的项返回校验错误
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        ids = [pk if isinstance(pk, int) and not isinstance(pk, bool) else None for pk in ids]
+
+        with task_shards_atomic():
+            instances = {}
+            for alias, pks in group_by_shard([pk for pk in ids if pk is not None], shard_for_pk).items():
+                instances.update(Task.objects.using(alias).select_for_update().in_bulk(pks))
+
+            serializer = self.get_serializer(
+                [instances.get(pk) for pk in ids], data=items, many=True, partial=True
+            )
+            valid = serializer.is_valid()
+            errors = list(serializer.errors) if not valid else [{} for _ in items]
+            seen = set()
+            for index, pk in enumerate(ids):
+                if pk is None:
+                    errors[index] = {**errors[index], 'id': ['任务ID必须是整数']}
+                elif pk not in instances:
+                    errors[index] = {**errors[index], 'id': ['任务不存在']}
+                elif pk in seen:
+                    errors[index] = {**errors[index], 'id': ['重复的任务ID']}
+                seen.add(pk)
+            if any(errors):
+                return self.bulk_error_response(errors, '批量更新任务失败')
+
+            tasks = serializer.save()
+        return self.bulk_success_response(tasks, '批量更新任务成功')
+
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request):
+        """批量删除任务"""
+        ids = self.get_bulk_items(request, 'ids')
+        if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            raise ValidationError({'ids': '任务ID必须是整数'})
+
+        with task_shards_atomic():
+            existing = set()
+            for alias, pks in group_by_shard(ids, shard_for_pk).items():
+                existing.update(Task.objects.using(alias).filter(id__in=pks).values_list('id', flat=True))
+            deleted, _ = Task.objects.filter(id__in=existing).delete()
+
+        return api_success_response(
+            data={
+                'results': [
+                    {'index': index, 'id': pk, 'success': True} if pk in existing
+                    else {'index': index, 'id': pk, 'success': False, 'errors': '任务不存在'}
+                    for index, pk in enumerate(ids)
+                ],
+                'deleted': deleted
+            },
+            message='批量删除任务成功'
+        )
+
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """按条件批量转换任务状态"""
+        serializer = TaskTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return api_error_response(
+                code=1006,
+                message='转换任务状态失败',
+                data=serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = filter_tasks(Task.objects.all(), serializer.validated_data['filter'])
+        affected = queryset.transition(
+            serializer.validated_data['to_status'],
+            batch_size=serializer.validated_data.get('batch_size')
+        )
+        return api_success_response(
+            data={'affected': affected},
+            message='转换任务状态成功'
+        )
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """流式导出任务"""
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in TASK_EXPORT_FORMATS:
+            raise ValidationError({
+                'export_format': f"不支持的导出格式，可选值: {', '.join(TASK_EXPORT_FORMATS)}"
+            })
+
+        # 过滤参数在这里解析和校验，开始输出后不会再出现参数错误
+        queryset, _ = self.get_list_queryset(request)
+        content_type, extension = TASK_EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            stream_tasks(
+                queryset, export_format,
+                fields=self.get_requested_fields(),
+                chunk_size=settings.TASK_EXPORT_CHUNK_SIZE
+            ),
+            content_type=content_type
+        )
+        filename = f"tasks-{timezone.now():%Y%m%d%H%M%S}.{extension}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_tasks(self, request):
+        """流式导入任务"""
+        import_format = request.query_params.get('import_format')
+        if not import_format:
+            import_format = 'csv' if request.content_type.startswith('text/csv') else 'ndjson'
+        if import_format not in TASK_IMPORT_FORMATS:
+            raise ValidationError({
+                'import_format': f"不支持的导入格式，可选值: {', '.join(TASK_IMPORT_FORMATS)}"
+            })
+
+        # 直接逐行读取请求体，不经过解析器把整个请求体读入内存
+        summary = import_tasks(
+            request.stream, import_format,
+            chunk_size=settings.TASK_IMPORT_CHUNK_SIZE,
+            batch_size=settings.TASK_IMPORT_BATCH_SIZE,
+            max_errors=settings.TASK_IMPORT_MAX_ERRORS,
+            owner_id=self.get_owner_id()
+        )
+        return api_success_response(data=summary, message='导入任务完成')
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """增量同步任务变更"""
+        size = get_page_size(request, page_size=100, max_page_size=1000)
+        try:
+            upserted, deleted, next_cursor, has_more = get_task_changes(
+                request.query_params.get('changed_since'), size, fields=self.get_requested_fields()
+            )
+        except ChangeCursorExpired:
+            return api_error_response(
+                code=1009,
+                message='同步游标已过期，请重新全量同步',
+                status=status.HTTP_410_GONE
+            )
+        return api_success_response(
+            data={'upserted': upserted, 'deleted': deleted},
+            message='获取任务变更成功',
+            pagination={
+                'page_size': size,
+                'next_cursor': next_cursor,
+                'has_more': has_more
+            }
+        )
+
+    def get_upload(self, task, upload_id):
+        try:
+            return TaskAttachmentUpload.objects.using(task._state.db).get(pk=upload_id, task_id=task.pk)
+        except TaskAttachmentUpload.DoesNotExist:
+            raise NotFound('上传不存在或已完成')
+
+    def get_attachment(self, task, attachment_id):
+        try:
+            return TaskAttachment.objects.using(task._state.db).get(pk=attachment_id, task_id=task.pk)
+        except TaskAttachment.DoesNotExist:
+            raise NotFound('附件不存在')
+
+    def upload_response(self, result, message):
+        """上传未完成时返回上传进度，完成时返回201和附件"""
+        if isinstance(result, TaskAttachment):
+            return api_success_response(
+                data={'attachment': TaskAttachmentSerializer(result).data},
+                message='上传附件成功',
+                status=status.HTTP_201_CREATED
+            )
+        return api_success_response(
+            data={'upload': TaskAttachmentUploadSerializer(result).data},
+            message=message
+        )
+
+    @action(detail=True, methods=['get', 'post'])
+    def attachments(self, request, pk=None):
+        """获取任务的附件列表，或开始上传附件"""
+        task = self.get_object()
+        if request.method == 'GET':
+            attachments = TaskAttachment.objects.using(task._state.db).filter(task_id=task.pk).order_by('id')
+            return api_success_response(
+                data={'attachments': TaskAttachmentSerializer(attachments, many=True).data},
+                message='获取附件列表成功'
+            )
+
+        serializer = TaskAttachmentUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = create_upload(task, uploaded_by=self.get_owner_id(), **serializer.validated_data)
+        if isinstance(upload, TaskAttachment):
+            return self.upload_response(upload, '上传附件成功')
+        return api_success_response(
+            data={'upload': TaskAttachmentUploadSerializer(upload).data},
+            message='开始上传附件',
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['get', 'put', 'delete'],
+            url_path=r'attachments/uploads/(?P<upload_id>[0-9a-f-]{36})')
+    def attachment_upload(self, request, pk=None, upload_id=None):
+        """查询上传进度、上传分块或取消上传"""
+        task = self.get_object()
+        upload = self.get_upload(task, upload_id)
+        if request.method == 'GET':
+            return self.upload_response(upload, '获取上传进度成功')
+        if request.method == 'DELETE':
+            cancel_upload(upload)
+            return api_success_response(data=None, message='取消上传成功', status=status.HTTP_204_NO_CONTENT)
+
+        try:
+            start, length = parse_content_range(request.headers.get('Content-Range'), upload.size)
+        except ValueError as exc:
+            raise ValidationError({'Content-Range': str(exc)})
+        content_length = request.headers.get('Content-Length')
+        if content_length is not None and content_length.isdigit() and int(content_length) != length:
+            raise ValidationError({'Content-Length': '请求体长度与Content-Range不一致'})
+
+        try:
+            # 直接逐块读取请求体，不经过解析器把整个分块读入内存
+            result = write_upload_chunk(upload, request.stream, start, length)
+        except UploadConflict as exc:
+            return api_error_response(
+                code=1010,
+                message='分块的起始位置与已接收的字节数不一致，请从received继续上传',
+                status=status.HTTP_409_CONFLICT,
+                data={'received': exc.received}
+            )
+        except ValueError as exc:
+            raise ValidationError({'Content-Range': str(exc)})
+        return self.upload_response(result, '上传分块成功')
+
+    @action(detail=True, methods=['get', 'delete'], url_path=r'attachments/(?P<attachment_id>[0-9]+)')
+    def attachment(self, request, pk=None, attachment_id=None):
+        """下载或删除附件"""
+        task = self.get_object()
+        attachment = self.get_attachment(task, attachment_id)
+        if request.method == 'DELETE':
+            attachment.delete()
+            return api_success_response(data=None, message='删除附件成功', status=status.HTTP_204_NO_CONTENT)
+        return self.attachment_file_response(request, attachment)
+
+    def attachment_file_response(self, request, attachment):
+        """
+        返回附件内容
+
+        开启TASK_ATTACHMENT_ACCEL_REDIRECT时只返回X-Accel-Redirect头，由nginx发送文件并处理Range请求，
+        否则单个范围的Range请求返回206，其余返回FileResponse（WSGI服务器支持时使用sendfile）。
+        内容哈希作为强ETag，支持If-None-Match和If-Range
+        """
+        etag = f'"{attachment.content_hash}"'
+        not_modified = get_not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        content_type, inline_allowed = attachment_content_type(attachment.content_type)
+        inline = inline_allowed and request.query_params.get('inline') is not None
+        disposition = content_disposition_header(not inline, attachment.filename)
+
+        if settings.TASK_ATTACHMENT_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = quote(
+                '/' + settings.MEDIA_URL.strip('/') + '/' + attachment_name(attachment.content_hash)
+            )
+        else:
+            path = attachment_path(attachment.content_hash)
+            byte_range = None
+            if request.headers.get('If-Range', etag) == etag:
+                try:
+                    byte_range = parse_range(request.headers.get('Range'), attachment.size)
+                except RangeNotSatisfiable:
+                    response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                    response['Content-Range'] = f"bytes */{attachment.size}"
+                    return response
+            if byte_range is None:
+                response = FileResponse(open(path, 'rb'), content_type=content_type)
+            else:
+                start, end = byte_range
+                response = StreamingHttpResponse(
+                    iter_file_range(path, start, end),
+                    status=status.HTTP_206_PARTIAL_CONTENT,
+                    content_type=content_type
+                )
+                response['Content-Range'] = f"bytes {start}-{end}/{attachment.size}"
+                response['Content-Length'] = end - start + 1
+            response['Accept-Ranges'] = 'bytes'
+        response['Content-Disposition'] = disposition
+        response['ETag'] = etag
+        return response
+
+    @action(detail=False, methods=['get'], url_path='status-summary')
+    def status_summary(self, request):
+        """获取各状态的任务数量"""
+        counts = TaskStatusCounter.get_counts()
+        return api_success_response(
+            data={'counts': counts, 'total': sum(counts.values())},
+            message='获取任务状态统计成功'
+        )
+
+    @action(detail=False, methods=['get'], url_path='cycle-time')
+    def cycle_time(self, request):
+        """按天或周统计任务的周期时间"""
+        serializer = TaskCycleTimeQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        return api_success_response(
+            data=get_cycle_time_stats(params['start'], params['end'], params['period']),
+            message='获取任务周期统计成功'
+        )
+
+    @action(detail=False, methods=['get'], url_path='cache-stats',
+            permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """获取任务响应缓存的命中统计"""
+        return api_success_response(
+            data=self.get_response_cache().get_stats(),
+            message='获取缓存统计成功'
+        )
+
+async def task_events(request):
+    """
+    任务变更事件流（Server-Sent Events）
+
+    需要通过ASGI（backend/asgi.py）部署，每个连接只占用一个协程。
+    任务创建、更新、删除后推送事件，事件名为变更类型，数据为{"action": ..., "ids": [...]}，
+    ids为null表示变更的任务较多或无法确定，客户端应重新获取列表。
+    断线重连时浏览器自动带上Last-Event-ID请求头，从缓冲区补发错过的事件；
+    无法补发时先发送reset事件，客户端需要重新获取全部数据
+    """
+    broadcaster = get_task_broadcaster()
+    if broadcaster.subscriber_count >= settings.TASK_EVENTS_MAX_SUBSCRIBERS:
+        return JsonResponse(
+            {'code': 1007, 'message': '事件流连接数已达上限，请稍后再试', 'data': None, 'pagination': None},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    subscriber, backlog = broadcaster.subscribe(last_event_id)
+    response = StreamingHttpResponse(
+        stream_task_events(broadcaster, subscriber, backlog),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # 禁止Nginx缓冲事件流
+    response['X-Accel-Buffering'] = 'no'
+    return response
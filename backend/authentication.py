@@ -0,0 +1,103 @@
+import hashlib
+import hmac
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.authentication import BaseAuthentication, BasicAuthentication
+
+# 每个认证方案对应的认证器实例，首次使用时创建
+_profile_authenticators = {}
+
+def get_profile_authenticators(profile):
+    """
+    获取认证方案对应的认证器实例列表
+
+    Args:
+        profile: 认证方案名称，对应settings.AUTHENTICATION_PROFILES中的键
+
+    Returns:
+        list: 认证器实例列表
+    """
+    authenticators = _profile_authenticators.get(profile)
+    if authenticators is None:
+        class_paths = settings.AUTHENTICATION_PROFILES.get(profile)
+        if class_paths is None:
+            raise ValueError(f"未定义的认证方案: {profile}")
+        authenticators = [import_string(path)() for path in class_paths]
+        _profile_authenticators[profile] = authenticators
+    return authenticators
+
+def get_profile_for_path(path):
+    """
+    根据请求路径匹配认证方案
+
+    按settings.AUTHENTICATION_ROUTES的顺序匹配路径前缀，
+    未匹配时使用settings.AUTHENTICATION_DEFAULT_PROFILE
+
+    Args:
+        path: 请求路径
+
+    Returns:
+        str: 认证方案名称
+    """
+    for prefix, profile in settings.AUTHENTICATION_ROUTES:
+        if path.startswith(prefix):
+            return profile
+    return settings.AUTHENTICATION_DEFAULT_PROFILE
+
+class RoutedAuthentication(BaseAuthentication):
+    """
+    按路由选择认证方案的认证类
+
+    /api/ 下的接口只使用JWT认证，不再对每个请求尝试Session和Basic认证，
+    避免Basic认证在请求线程中计算密码哈希、Session认证查询会话表和校验CSRF
+    """
+
+    def get_authenticators(self, request):
+        return get_profile_authenticators(get_profile_for_path(request.path))
+
+    def authenticate(self, request):
+        for authenticator in self.get_authenticators(request):
+            result = authenticator.authenticate(request)
+            if result is not None:
+                return result
+        return None
+
+    def authenticate_header(self, request):
+        for authenticator in self.get_authenticators(request):
+            header = authenticator.authenticate_header(request)
+            if header:
+                return header
+        return None
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    带短期缓存的Basic认证
+
+    供仍在使用Basic认证的服务调用方使用。验证通过的凭据以HMAC摘要为键缓存
+    BASIC_AUTH_CACHE_TTL秒，命中时只需按主键查询用户，不再重新计算密码哈希。
+    缓存值中包含用户当前的密码哈希，修改密码后旧凭据的缓存立即失效。
+    """
+
+    def get_cache_key(self, userid, password):
+        digest = hmac.new(
+            settings.SECRET_KEY.encode('utf-8'),
+            f"{userid}:{password}".encode('utf-8'),
+            hashlib.sha256
+        ).hexdigest()
+        return f"basic-auth:{digest}"
+
+    def authenticate_credentials(self, userid, password, request=None):
+        cache_key = self.get_cache_key(userid, password)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            user_pk, password_hash = cached
+            user = get_user_model().objects.filter(pk=user_pk).first()
+            if user is not None and user.is_active and user.password == password_hash:
+                return (user, None)
+            cache.delete(cache_key)
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        cache.set(cache_key, (user.pk, user.password), settings.BASIC_AUTH_CACHE_TTL)
+        return (user, auth)
@@ -0,0 +1,208 @@
+import asyncio
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.urls import Resolver404, resolve
+from rest_framework import permissions, serializers
+from rest_framework.views import APIView
+from .utils import api_success_response
+
+logger = logging.getLogger(__name__)
+
+# 子请求只能访问该前缀下的接口
+BATCH_PATH_PREFIX = '/api/'
+
+# 不从外层请求复制到子请求的META项：请求体、路径和条件请求头由子请求自己指定
+_EXCLUDED_META = {
+    'CONTENT_TYPE', 'CONTENT_LENGTH', 'QUERY_STRING', 'PATH_INFO', 'SCRIPT_NAME', 'REQUEST_METHOD',
+    'HTTP_RANGE', 'wsgi.input',
+}
+
+# 子请求结果中返回的响应头
+BATCH_RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Location', 'Content-Range')
+
+class BatchItemSerializer(serializers.Serializer):
+    """批量请求中的一个子请求"""
+    id = serializers.CharField(required=False, max_length=100)
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.CharField(max_length=2000)
+    headers = serializers.DictField(child=serializers.CharField(max_length=1000), required=False, default=dict)
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        if not value.startswith(BATCH_PATH_PREFIX):
+            raise serializers.ValidationError(f"只能访问{BATCH_PATH_PREFIX}下的接口")
+        return value
+
+class BatchRequestSerializer(serializers.Serializer):
+    """批量请求"""
+    requests = serializers.ListField(child=BatchItemSerializer(), allow_empty=False)
+    concurrent = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f"每次最多{settings.BATCH_MAX_REQUESTS}个子请求")
+        return value
+
+def build_subrequest(request, item):
+    """
+    按子请求的方法、路径、请求头和请求体构造Django请求
+
+    外层请求的其余请求头（Host、Accept-Language等）原样复制；认证结果直接传给子请求，
+    DRF视图使用ForcedAuthentication，不再重新校验JWT
+
+    Args:
+        request: 外层的DRF请求
+        item: BatchItemSerializer校验后的数据
+
+    Returns:
+        WSGIRequest: 子请求
+    """
+    url = urlsplit(item['path'])
+    body = json.dumps(item['body']).encode('utf-8') if 'body' in item else b''
+    environ = {
+        key: value for key, value in request.META.items()
+        if key not in _EXCLUDED_META and not key.startswith('HTTP_IF_')
+    }
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'SCRIPT_NAME': '',
+        # 与WSGI服务器一致：PATH_INFO为解码后的路径按ISO-8859-1表示的字节，QUERY_STRING保持编码
+        'PATH_INFO': unquote(url.path).encode('utf-8').decode('iso-8859-1'),
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json' if body else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    for name, value in item['headers'].items():
+        key = name.upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[f"HTTP_{key}"] = value
+
+    subrequest = WSGIRequest(environ)
+    subrequest.user = request.user
+    if request.user.is_authenticated:
+        subrequest._force_auth_user = request.user
+        subrequest._force_auth_token = request.auth
+    return subrequest
+
+def _result(item, status, body=None, headers=None):
+    result = {'status': status, 'headers': headers or {}, 'body': body}
+    if 'id' in item:
+        result = {'id': item['id'], **result}
+    return result
+
+def _error(item, status, code, message):
+    return _result(item, status, {'code': code, 'message': message, 'data': None, 'pagination': None})
+
+def dispatch_subrequest(request, item):
+    """
+    通过URL解析器直接调用子请求对应的视图，不经过HTTP和中间件
+
+    Returns:
+        dict: 子请求的结果，包含status、headers和body
+    """
+    try:
+        match = resolve(unquote(urlsplit(item['path']).path))
+    except Resolver404:
+        return _error(item, 404, 1004, '接口不存在')
+    if getattr(match.func, 'view_class', None) is BatchView:
+        return _error(item, 400, 1006, '批量请求不能嵌套')
+    if asyncio.iscoroutinefunction(match.func):
+        return _error(item, 400, 1006, '异步接口（如事件流）不能在批量请求中调用')
+
+    subrequest = build_subrequest(request, item)
+    subrequest.resolver_match = match
+    try:
+        response = match.func(subrequest, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+    except Exception:
+        logger.exception("批量请求的子请求%s %s失败", item['method'], item['path'])
+        return _error(item, 500, 9999, '服务器内部错误')
+
+    try:
+        if response.streaming:
+            return _error(item, 400, 1006, '流式响应（如导出、附件下载）不能在批量请求中返回')
+        headers = {name: response[name] for name in BATCH_RESPONSE_HEADERS if response.has_header(name)}
+        body = None
+        if response.content:
+            if response.get('Content-Type', '').startswith('application/json'):
+                body = json.loads(response.content)
+            else:
+                body = response.content.decode(response.charset, errors='replace')
+        return _result(item, response.status_code, body, headers)
+    finally:
+        response.close()
+
+def _dispatch_in_thread(request, item):
+    try:
+        return dispatch_subrequest(request, item)
+    finally:
+        # 线程池中的线程各自打开数据库连接，结束时关闭
+        connections.close_all()
+
+class BatchView(APIView):
+    """
+    批量请求视图
+    ---
+    post:
+        描述: 在一个HTTP请求中执行多个API请求，只认证一次，子请求通过URL解析器直接调用对应的视图。
+              子请求的权限、限流和参数校验与单独调用时相同，每个子请求的结果单独返回状态码
+        参数:
+            - name: requests
+              description: 子请求列表，最多BATCH_MAX_REQUESTS个；每项包含method(默认GET)、path(必须以/api/开头，可以带查询参数)、
+                           可选的headers(如If-None-Match)、body(JSON)和id(原样返回)
+              required: true
+              type: array
+              example: [{"id": "me", "path": "/api/auth/profile/"}, {"path": "/api/tasks/?page_size=20"}]
+            - name: concurrent
+              description: 是否并发执行子请求，默认为false（按顺序执行）；只应在子请求互不依赖时使用
+              required: false
+              type: boolean
+              example: true
+        响应:
+            200:
+                描述: 批量请求完成，各子请求的结果按请求顺序返回
+                示例:
+                    {
+                        "code": 0,
+                        "message": "批量请求完成",
+                        "data": {
+                            "responses": [
+                                {
+                                    "id": "me",
+                                    "status": 200,
+                                    "headers": {},
+                                    "body": {"code": 0, "message": "获取用户信息成功", "data": {"user": {"id": 1}}, "pagination": null}
+                                },
+                                {
+                                    "status": 200,
+                                    "headers": {"ETag": "W/\"5d41402abc4b2a76b9719d911017c592\""},
+                                    "body": {"code": 0, "message": "获取任务列表成功", "data": {"tasks": []}, "pagination": {}}
+                                }
+                            ]
+                        },
+                        "pagination": null
+                    }
+    """
+    # 子请求各自检查权限，未登录用户也可以调用允许匿名访问的接口
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['requests']
+        workers = min(settings.BATCH_MAX_WORKERS, len(items))
+
+        if serializer.validated_data['concurrent'] and workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                responses = list(executor.map(lambda item: _dispatch_in_thread(request, item), items))
+        else:
+            responses = [dispatch_subrequest(request, item) for item in items]
+        return api_success_response(data={'responses': responses}, message='批量请求完成')
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from .utils import is_process_local_cache
+
+@register(Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    """启用响应缓存时默认缓存必须是共享缓存，否则其他进程的写入不会使缓存失效"""
+    if settings.RESPONSE_CACHE_ENABLED and is_process_local_cache():
+        return [
+            Error(
+                "RESPONSE_CACHE_ENABLED需要共享的默认缓存",
+                hint="设置CACHE_URL为Redis等共享缓存（如redis://redis:6379/0），或设置RESPONSE_CACHE_ENABLED=False",
+                obj='RESPONSE_CACHE_ENABLED',
+                id='backend.E001',
+            )
+        ]
+    return []
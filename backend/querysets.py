@@ -0,0 +1,102 @@
+import functools
+import heapq
+
+def _row_value(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+def ordering_key(ordering):
+    """
+    按排序字段生成排序键，支持升序和降序混合
+
+    Args:
+        ordering: 排序字段，"-"前缀表示降序
+
+    Returns:
+        function: 可用于sorted()和heapq.merge()的key函数
+    """
+    def compare(a, b):
+        for field in ordering:
+            name = field.lstrip('-')
+            x, y = _row_value(a, name), _row_value(b, name)
+            if x == y:
+                continue
+            result = -1 if x < y else 1
+            return -result if field.startswith('-') else result
+        return 0
+    return functools.cmp_to_key(compare)
+
+class MergedQuerySet:
+    """
+    把多个字段相同的查询集合并为一个有序的结果
+
+    支持filter、order_by、values等链式调用（分别作用于每个查询集）和切片，
+    切片时每个查询集各读取前stop行，再按排序字段在内存中归并，
+    因此可以直接交给paginate_queryset按页码或游标分页。
+    最后一个排序字段必须在所有查询集中唯一（如id），否则归并结果的顺序不确定
+
+    Args:
+        querysets: 查询集列表
+        ordering: 排序字段
+    """
+
+    def __init__(self, querysets, ordering=()):
+        self.querysets = list(querysets)
+        self.ordering = tuple(ordering)
+
+    def _chain(self, method, *args, **kwargs):
+        return type(self)(
+            [getattr(queryset, method)(*args, **kwargs) for queryset in self.querysets], self.ordering
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._chain('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._chain('exclude', *args, **kwargs)
+
+    def values(self, *fields):
+        return self._chain('values', *fields)
+
+    def only(self, *fields):
+        return self._chain('only', *fields)
+
+    def order_by(self, *ordering):
+        merged = self._chain('order_by', *ordering)
+        merged.ordering = tuple(ordering)
+        return merged
+
+    @property
+    def ordered(self):
+        return bool(self.ordering)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            if index < 0:
+                raise ValueError('不支持负数索引')
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if stop is None or start < 0 or stop < 0 or index.step not in (None, 1):
+            raise ValueError('只支持非负的有界切片')
+        if not self.ordering:
+            raise TypeError('切片前需要先调用order_by()')
+        parts = [list(queryset[:stop]) for queryset in self.querysets]
+        rows = heapq.merge(*parts, key=ordering_key(self.ordering))
+        return list(rows)[start:stop]
+
+    def iterator(self, chunk_size=None):
+        """逐个查询集流式读取并归并，内存占用与总行数无关"""
+        parts = [queryset.iterator(chunk_size=chunk_size) for queryset in self.querysets]
+        if not self.ordering:
+            for part in parts:
+                yield from part
+            return
+        yield from heapq.merge(*parts, key=ordering_key(self.ordering))
+
+    def __iter__(self):
+        return self.iterator()
@@ -0,0 +1,178 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from .utils import get_table_generation, is_process_local_cache
+
+class LocalLRUCache:
+    """
+    进程内LRU缓存
+
+    条目数超过上限时淘汰最久未使用的条目，条目过期后在下次读取时删除
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class ResponseCache:
+    """
+    按数据表版本号失效的响应缓存
+
+    缓存键由模型的数据表版本号（参见get_table_generation）和请求参数组成，
+    表中数据写入后版本号递增，旧版本的缓存项不再被读取，随LRU淘汰或过期，不需要扫描删除。
+    读取时先查进程内LRU缓存，未命中再查共享缓存（RESPONSE_CACHE_SHARED_ALIAS），
+    共享缓存命中后回填到进程内缓存。
+
+    版本号保存在默认缓存中，默认缓存必须是共享缓存（如Redis），否则其他进程的写入不会使当前进程的缓存失效，
+    因此默认缓存是进程内缓存时不读取也不写入缓存（参见backend.checks）
+    """
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.local = LocalLRUCache(settings.RESPONSE_CACHE_LOCAL_MAX_ENTRIES)
+        self._lock = threading.Lock()
+        self._stats = {
+            'local_hits': 0,
+            'shared_hits': 0,
+            'misses': 0,
+        }
+
+    @property
+    def enabled(self):
+        return settings.RESPONSE_CACHE_ENABLED and not is_process_local_cache()
+
+    @property
+    def shared(self):
+        alias = settings.RESPONSE_CACHE_SHARED_ALIAS
+        return caches[alias] if alias else None
+
+    def make_key(self, *parts):
+        """
+        生成缓存键，先读取版本号再查询数据库，保证缓存的数据不早于键中的版本
+
+        Args:
+            *parts: 能唯一确定响应内容的请求参数，如接口名称、查询字符串、主键
+
+        Returns:
+            str: 缓存键
+        """
+        digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+        return f"resp:{self.name}:{get_table_generation(self.model)}:{digest}"
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, key):
+        """
+        读取缓存项
+
+        Args:
+            key: make_key生成的缓存键
+
+        Returns:
+            缓存的值，未命中或缓存未启用时返回None
+        """
+        if not self.enabled:
+            return None
+
+        value = self.local.get(key)
+        if value is not None:
+            self._count('local_hits')
+            return value
+
+        shared = self.shared
+        if shared is not None:
+            value = shared.get(key)
+            if value is not None:
+                self.local.set(key, value, settings.RESPONSE_CACHE_TTL)
+                self._count('shared_hits')
+                return value
+
+        self._count('misses')
+        return None
+
+    def set(self, key, value):
+        """
+        写入缓存项，同时写入进程内缓存和共享缓存
+
+        Args:
+            key: make_key生成的缓存键
+            value: 可pickle的值，读取方不能修改
+        """
+        if not self.enabled:
+            return
+        self.local.set(key, value, settings.RESPONSE_CACHE_TTL)
+        shared = self.shared
+        if shared is not None:
+            shared.set(key, value, settings.RESPONSE_CACHE_TTL)
+
+    def get_stats(self):
+        """获取当前进程的缓存命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats['local_hits'] + stats['shared_hits']
+        total = hits + stats['misses']
+        stats['hit_rate'] = round(hits / total, 4) if total else None
+        stats['local_entries'] = len(self.local)
+        stats['local_max_entries'] = self.local.max_entries
+        stats['enabled'] = self.enabled
+        stats['shared_alias'] = settings.RESPONSE_CACHE_SHARED_ALIAS or None
+        stats['generation'] = get_table_generation(self.model)
+        return stats
+
+_response_caches = {}
+_response_caches_lock = threading.Lock()
+
+def get_response_cache(name, model):
+    """
+    获取响应缓存实例
+
+    Args:
+        name: 缓存名称，用作缓存键前缀
+        model: 决定缓存失效的模型
+
+    Returns:
+        ResponseCache: 响应缓存实例
+    """
+    cache = _response_caches.get(name)
+    if cache is None:
+        with _response_caches_lock:
+            cache = _response_caches.get(name)
+            if cache is None:
+                cache = ResponseCache(name, model)
+                _response_caches[name] = cache
+    return cache
@@ -0,0 +1,137 @@
+import threading
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str):
+            return value
+        value = field.enforce_timezone(value).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+def _choice_converter(field):
+    mapping = field.choice_strings_to_values
+
+    def convert(value):
+        if value == '':
+            return value
+        return mapping.get(str(value), value)
+    return convert
+
+# 支持的字段类型及其转换函数的构造方法，转换结果与字段的to_representation相同，
+# 转换函数为None表示原样输出。只匹配精确类型，子类可能重写了to_representation
+_CONVERTERS = {
+    serializers.IntegerField: lambda field: int,
+    serializers.FloatField: lambda field: float,
+    serializers.CharField: lambda field: str,
+    serializers.BooleanField: lambda field: field.to_representation,
+    serializers.ReadOnlyField: lambda field: None,
+    serializers.ChoiceField: _choice_converter,
+    serializers.DateTimeField: _datetime_converter,
+}
+
+class SerializationPlan:
+    """
+    预编译的只读序列化计划
+
+    直接把.values()查询得到的字典转换为与ModelSerializer相同的输出，
+    不创建模型实例，也不逐个调用字段的get_attribute和to_representation
+
+    Attributes:
+        sources: 需要查询的数据库字段名，传给QuerySet.values()
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.sources = tuple(dict.fromkeys(source for _, source, _ in fields))
+
+    def serialize(self, rows):
+        """
+        序列化多行数据
+
+        Args:
+            rows: .values()返回的字典，至少包含sources中的字段
+
+        Returns:
+            list: 与ModelSerializer(many=True).data相同的字典列表
+        """
+        fields = self.fields
+        result = []
+        for row in rows:
+            item = {}
+            for name, source, convert in fields:
+                value = row[source]
+                if value is not None and convert is not None:
+                    value = convert(value)
+                item[name] = value
+            result.append(item)
+        return result
+
+def compile_serialization_plan(serializer):
+    """
+    为ModelSerializer实例编译序列化计划
+
+    只支持直接对应模型普通字段的常用字段类型，序列化器重写了to_representation、
+    字段使用嵌套source、关联字段或方法字段时不支持
+
+    Args:
+        serializer: ModelSerializer实例
+
+    Returns:
+        SerializationPlan: 不支持时返回None
+    """
+    if not isinstance(serializer, serializers.ModelSerializer):
+        return None
+    if type(serializer).to_representation is not serializers.Serializer.to_representation:
+        return None
+
+    opts = serializer.Meta.model._meta
+    plan_fields = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        factory = _CONVERTERS.get(type(field))
+        if factory is None or len(field.source_attrs) != 1:
+            return None
+        try:
+            model_field = opts.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.is_relation:
+            return None
+        plan_fields.append((name, model_field.attname, factory(field)))
+    return SerializationPlan(plan_fields)
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+def get_serialization_plan(serializer_class, fields=None):
+    """
+    获取序列化器类的序列化计划，按序列化器类和字段缓存
+
+    Args:
+        serializer_class: ModelSerializer子类
+        fields: 只输出的字段，传给序列化器的fields参数；为None时输出全部字段
+
+    Returns:
+        SerializationPlan: 不支持快速序列化时返回None
+    """
+    key = (serializer_class, tuple(fields) if fields is not None else None)
+    try:
+        return _plans[key]
+    except KeyError:
+        pass
+    serializer = serializer_class(fields=fields) if fields is not None else serializer_class()
+    plan = compile_serialization_plan(serializer)
+    with _plans_lock:
+        _plans[key] = plan
+    return plan
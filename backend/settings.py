@@ -103,9 +103,35 @@ DATABASES = {
     'default': env.db(),  # 从环境变量DATABASE_URL读取数据库配置
 }
 
+# 任务分片：default为第一个分片，TASK_SHARD_DATABASE_URLS（逗号分隔）中的数据库依次为其余分片，
+# 任务按所有者分布到各分片。启用后不能再增减分片
+for index, url in enumerate(env.list('TASK_SHARD_DATABASE_URLS', default=[]), start=1):
+    DATABASES[f'task_shard_{index}'] = env.db_url_config(url)
+TASK_SHARDS = list(DATABASES)
+DATABASE_ROUTERS = ['api.sharding.TaskShardRouter']
+
 # 确保SQLite数据库使用的是相对路径
-if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
-    DATABASES['default']['NAME'] = BASE_DIR / DATABASES['default']['NAME']
+for database in DATABASES.values():
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database['NAME'] = BASE_DIR / database['NAME']
+
+# PostgreSQL上结束空闲超过该毫秒数的事务（0为不限制）。任务变更同步和调度进程的水位不会越过仍未结束的写事务，
+# 被遗忘的事务会使它们一直停在该事务开始的位置，参见api.changes.get_settled_before
+DATABASE_IDLE_IN_TRANSACTION_TIMEOUT = env.int('DATABASE_IDLE_IN_TRANSACTION_TIMEOUT', default=60000)
+for database in DATABASES.values():
+    if database['ENGINE'] == 'django.db.backends.postgresql' and DATABASE_IDLE_IN_TRANSACTION_TIMEOUT:
+        options = database.setdefault('OPTIONS', {})
+        options['options'] = ' '.join(filter(None, [
+            options.get('options'), f"-c idle_in_transaction_session_timeout={DATABASE_IDLE_IN_TRANSACTION_TIMEOUT}"
+        ]))
+
+
+# Cache
+# 默认使用进程内缓存，多进程部署时通过CACHE_URL配置共享缓存（如Redis）
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
 
 
 # Password validation
@@ -127,6 +153,30 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# 密码哈希设置
+# PASSWORD_HASHER可选值: pbkdf2(默认，迭代次数由PASSWORD_PBKDF2_ITERATIONS调整), bcrypt
+# 切换后已有用户的密码在下次登录成功时自动按新的哈希器重新哈希
+PASSWORD_HASHER = env('PASSWORD_HASHER', default='pbkdf2')
+# PBKDF2迭代次数，0表示使用Django默认值
+PASSWORD_PBKDF2_ITERATIONS = env.int('PASSWORD_PBKDF2_ITERATIONS', default=0)
+
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if PASSWORD_HASHER == 'bcrypt':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+
+# 密码哈希进程池大小（每个应用进程），0表示在请求线程中计算
+PASSWORD_HASHING_WORKERS = env.int('PASSWORD_HASHING_WORKERS', default=2)
+# 同时执行和排队的密码哈希任务上限，超过后等待PASSWORD_HASHING_QUEUE_TIMEOUT秒
+PASSWORD_HASHING_MAX_PENDING = env.int('PASSWORD_HASHING_MAX_PENDING', default=16)
+PASSWORD_HASHING_QUEUE_TIMEOUT = env.float('PASSWORD_HASHING_QUEUE_TIMEOUT', default=2.0)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -164,15 +214,167 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'backend.authentication.RoutedAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'EXCEPTION_HANDLER': 'backend.exception_handler.custom_exception_handler'
 }
 
+# 认证方案设置
+# 按路径前缀选择认证方案，/api/ 只使用JWT，/admin/ 使用Session
+AUTHENTICATION_PROFILES = {
+    'jwt': [
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+    ],
+    'session': [
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    # 服务调用方使用的Basic认证，验证结果短期缓存
+    'service': [
+        'backend.authentication.CachedBasicAuthentication',
+    ],
+}
+# 服务调用方使用的路径前缀（如 /api/internal/），这些路径使用Basic认证
+AUTHENTICATION_ROUTES = [
+    (prefix, 'service') for prefix in env.list('SERVICE_AUTH_PATH_PREFIXES', default=[])
+] + [
+    ('/admin/', 'session'),
+    ('/api/', 'jwt'),
+]
+AUTHENTICATION_DEFAULT_PROFILE = 'jwt'
+
+# Basic认证凭据缓存时间（秒）
+BASIC_AUTH_CACHE_TTL = env.int('BASIC_AUTH_CACHE_TTL', default=60)
+
+# 批量请求接口（/api/batch/）每次最多的子请求数，以及并发执行子请求时的最大线程数
+BATCH_MAX_REQUESTS = env.int('BATCH_MAX_REQUESTS', default=20)
+BATCH_MAX_WORKERS = env.int('BATCH_MAX_WORKERS', default=4)
+
+# 分页总数统计方式，可选值: exact(COUNT(*)), cached(按查询缓存COUNT结果，任务写入后失效),
+# estimated(PostgreSQL统计信息估算，低于阈值时按cached方式统计)
+PAGINATION_COUNT_MODE = env('PAGINATION_COUNT_MODE', default='exact')
+PAGINATION_COUNT_CACHE_TTL = env.int('PAGINATION_COUNT_CACHE_TTL', default=300)
+PAGINATION_ESTIMATE_THRESHOLD = env.int('PAGINATION_ESTIMATE_THRESHOLD', default=100000)
+
+# 任务批量接口每次最多处理的条数
+TASK_BULK_MAX_ITEMS = env.int('TASK_BULK_MAX_ITEMS', default=1000)
+
+# 任务列表默认返回的字段（逗号分隔），为空时返回全部字段，
+# 如id,title,status,created_at,updated_at可以使列表默认不返回和查询description
+TASK_LIST_DEFAULT_FIELDS = env.list('TASK_LIST_DEFAULT_FIELDS', default=[])
+
+# 任务列表使用快速序列化（.values()查询并按预编译的计划转换），输出与TaskSerializer相同
+TASK_FAST_SERIALIZATION = env.bool('TASK_FAST_SERIALIZATION', default=True)
+
+# 任务导出每次从数据库读取的行数
+TASK_EXPORT_CHUNK_SIZE = env.int('TASK_EXPORT_CHUNK_SIZE', default=2000)
+
+# 任务导入每次校验和提交的行数、每条INSERT语句的行数，以及导入汇总中最多返回的错误数
+TASK_IMPORT_CHUNK_SIZE = env.int('TASK_IMPORT_CHUNK_SIZE', default=1000)
+TASK_IMPORT_BATCH_SIZE = env.int('TASK_IMPORT_BATCH_SIZE', default=500)
+TASK_IMPORT_MAX_ERRORS = env.int('TASK_IMPORT_MAX_ERRORS', default=100)
+
+# 任务变更同步只返回该秒数之前的变更，避免游标越过尚未提交的事务写入的数据
+TASK_CHANGES_SETTLE_SECONDS = env.int('TASK_CHANGES_SETTLE_SECONDS', default=2)
+# 已删除任务的墓碑保留天数，早于保留期限的同步游标需要重新全量同步
+TASK_TOMBSTONE_RETENTION_DAYS = env.int('TASK_TOMBSTONE_RETENTION_DAYS', default=30)
+
+# 任务归档设置
+# 完成或取消超过该天数（按updated_at）的任务由archive_tasks命令移到归档表
+TASK_ARCHIVE_AFTER_DAYS = env.int('TASK_ARCHIVE_AFTER_DAYS', default=90)
+# 归档和恢复时每个事务处理的任务数
+TASK_ARCHIVE_BATCH_SIZE = env.int('TASK_ARCHIVE_BATCH_SIZE', default=1000)
+
+# 任务周期统计设置（/api/tasks/cycle-time/）
+# 统计的百分位
+TASK_ANALYTICS_PERCENTILES = env.list('TASK_ANALYTICS_PERCENTILES', cast=float, default=[50.0, 75.0, 90.0, 95.0, 99.0])
+# 直方图的区间边界（秒，升序），默认为1小时、4小时、1天、3天、7天、14天、30天
+TASK_ANALYTICS_HISTOGRAM_EDGES = env.list(
+    'TASK_ANALYTICS_HISTOGRAM_EDGES', cast=int, default=[3600, 14400, 86400, 259200, 604800, 1209600, 2592000]
+)
+# 已结束区间的统计结果缓存时间（秒），每次请求最多统计的区间数，以及从数据库流式读取时每次读取的行数
+TASK_ANALYTICS_CACHE_TTL = env.int('TASK_ANALYTICS_CACHE_TTL', default=86400)
+TASK_ANALYTICS_MAX_BUCKETS = env.int('TASK_ANALYTICS_MAX_BUCKETS', default=366)
+TASK_ANALYTICS_CHUNK_SIZE = env.int('TASK_ANALYTICS_CHUNK_SIZE', default=10000)
+
+# 任务截止时间调度设置（run_task_scheduler命令）
+# 到期处理方式: notify(只推送due事件) 或 cancel(把待处理和进行中的任务转换为已取消，并推送due事件)
+TASK_DUE_ACTION = env.str('TASK_DUE_ACTION', default='notify')
+# 在截止时间之前多少秒推送reminder事件，0表示不提醒
+TASK_DUE_REMIND_BEFORE = env.int('TASK_DUE_REMIND_BEFORE', default=0)
+# 每次加载未来多少秒内到期的任务，以及内存中最多保存的定时器数
+TASK_SCHEDULER_WINDOW = env.int('TASK_SCHEDULER_WINDOW', default=300)
+TASK_SCHEDULER_MAX_LOADED = env.int('TASK_SCHEDULER_MAX_LOADED', default=100000)
+# 最长休眠时间（秒），即到期处理的最大延迟；完整重新加载当前窗口的间隔（秒）
+TASK_SCHEDULER_TICK = env.float('TASK_SCHEDULER_TICK', default=1.0)
+TASK_SCHEDULER_RELOAD = env.int('TASK_SCHEDULER_RELOAD', default=300)
+
+# 任务附件设置
+# 单个附件的最大字节数
+TASK_ATTACHMENT_MAX_SIZE = env.int('TASK_ATTACHMENT_MAX_SIZE', default=1024 * 1024 * 1024)
+# 下载时可以在浏览器中直接打开（inline）的MIME类型，其余类型（如text/html、image/svg+xml）总是作为附件下载
+TASK_ATTACHMENT_INLINE_TYPES = env.list('TASK_ATTACHMENT_INLINE_TYPES', default=[
+    'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'application/pdf', 'text/plain',
+])
+# 下载附件时返回X-Accel-Redirect头，由nginx从MEDIA_URL对应的目录发送文件（需要nginx.conf中的internal location）；
+# 关闭时由Django发送文件（开发环境）
+TASK_ATTACHMENT_ACCEL_REDIRECT = env.bool('TASK_ATTACHMENT_ACCEL_REDIRECT', default=False)
+# 未完成的上传和未被引用的附件文件保留的小时数，超过后由purge_task_attachments命令删除
+TASK_ATTACHMENT_UPLOAD_EXPIRE_HOURS = env.int('TASK_ATTACHMENT_UPLOAD_EXPIRE_HOURS', default=24)
+
+# 任务事件流（SSE）设置
+TASK_EVENTS_ENABLED = env.bool('TASK_EVENTS_ENABLED', default=True)
+# 跨进程事件后端: api.events.LocalEventBackend(进程内，默认), api.events.PostgresEventBackend(LISTEN/NOTIFY)
+TASK_EVENTS_BACKEND = env('TASK_EVENTS_BACKEND', default='api.events.LocalEventBackend')
+# 断线重连时可补发的最近事件数
+TASK_EVENTS_BUFFER_SIZE = env.int('TASK_EVENTS_BUFFER_SIZE', default=1000)
+# 每个连接待发送事件的上限，超过后断开连接，客户端重连后从缓冲区补发
+TASK_EVENTS_QUEUE_SIZE = env.int('TASK_EVENTS_QUEUE_SIZE', default=100)
+# 单个事件最多包含的任务ID数，超过后ids为null
+TASK_EVENTS_MAX_IDS = env.int('TASK_EVENTS_MAX_IDS', default=100)
+# 每个进程的事件流连接数上限
+TASK_EVENTS_MAX_SUBSCRIBERS = env.int('TASK_EVENTS_MAX_SUBSCRIBERS', default=10000)
+# 心跳间隔（秒）和客户端重连间隔（毫秒）
+TASK_EVENTS_HEARTBEAT = env.int('TASK_EVENTS_HEARTBEAT', default=15)
+TASK_EVENTS_RETRY_MS = env.int('TASK_EVENTS_RETRY_MS', default=3000)
+
+# 任务读取接口的响应缓存，任务表写入后自动失效。失效依赖默认缓存中的数据表版本号，
+# 默认只在CACHE_URL为共享缓存（如Redis）时启用，默认缓存为进程内缓存时即使设置为True也不生效并在启动检查中报错
+RESPONSE_CACHE_ENABLED = env.bool(
+    'RESPONSE_CACHE_ENABLED',
+    default=CACHES['default']['BACKEND'] not in (
+        'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache'
+    )
+)
+# 进程内LRU缓存的条目数上限，0表示不使用进程内缓存
+RESPONSE_CACHE_LOCAL_MAX_ENTRIES = env.int('RESPONSE_CACHE_LOCAL_MAX_ENTRIES', default=1000)
+# 共享缓存使用的CACHES别名（如default），为空时只使用进程内缓存
+RESPONSE_CACHE_SHARED_ALIAS = env('RESPONSE_CACHE_SHARED_ALIAS', default='')
+RESPONSE_CACHE_TTL = env.int('RESPONSE_CACHE_TTL', default=300)
+
+# 代理层缓存设置：任务和用户信息的响应带有Surrogate-Key响应头，写入后按键清除代理层缓存
+SURROGATE_KEYS_ENABLED = env.bool('SURROGATE_KEYS_ENABLED', default=True)
+# 代理层缓存时间（秒），通过X-Accel-Expires（nginx）和Surrogate-Control（Varnish、CDN）返回，0表示不允许代理层缓存
+SURROGATE_CACHE_TTL = env.int('SURROGATE_CACHE_TTL', default=0)
+# 清除器: backend.surrogate_keys.NullPurger(不清除，默认), backend.surrogate_keys.NginxCachePurger(删除nginx缓存文件),
+# backend.surrogate_keys.HttpPurger(向清除接口发送请求)
+SURROGATE_PURGER = env('SURROGATE_PURGER', default='backend.surrogate_keys.NullPurger')
+# 合并清除请求：没有新的键后等待的秒数、最多等待的秒数（0表示立即清除）、每次清除的键数，
+# 以及单次变更的任务数超过该值时清除所有任务详情
+SURROGATE_PURGE_DELAY = env.float('SURROGATE_PURGE_DELAY', default=0.5)
+SURROGATE_PURGE_MAX_DELAY = env.float('SURROGATE_PURGE_MAX_DELAY', default=2.0)
+SURROGATE_PURGE_BATCH_SIZE = env.int('SURROGATE_PURGE_BATCH_SIZE', default=256)
+SURROGATE_PURGE_MAX_KEYS = env.int('SURROGATE_PURGE_MAX_KEYS', default=1000)
+# NginxCachePurger: 与nginx共享的proxy_cache_path目录
+SURROGATE_NGINX_CACHE_PATH = env('SURROGATE_NGINX_CACHE_PATH', default='/var/cache/nginx/api')
+# HttpPurger: 清除接口的地址、请求方法、放置键的请求头、额外的请求头（如Fastly-Key=xxx）和超时（秒）
+SURROGATE_PURGE_URL = env('SURROGATE_PURGE_URL', default='')
+SURROGATE_PURGE_METHOD = env('SURROGATE_PURGE_METHOD', default='PURGE')
+SURROGATE_PURGE_KEY_HEADER = env('SURROGATE_PURGE_KEY_HEADER', default='Surrogate-Key')
+SURROGATE_PURGE_HEADERS = env.dict('SURROGATE_PURGE_HEADERS', default={})
+SURROGATE_PURGE_TIMEOUT = env.float('SURROGATE_PURGE_TIMEOUT', default=5.0)
+
 # 自定义用户模型
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -0,0 +1,253 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# 标记响应的请求头，代理层按其中的键（空格分隔）清除缓存
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+
+# 任务列表等依赖全部任务的响应
+TASK_COLLECTION_KEY = 'tasks'
+# 所有单个任务的响应，无法确定变更的任务时清除
+TASK_ITEM_KEY = 'task'
+
+def task_key(pk):
+    """单个任务的响应的键"""
+    return f"task-{pk}"
+
+def user_key(pk):
+    """单个用户的响应的键"""
+    return f"user-{pk}"
+
+def task_surrogate_keys(pks):
+    """
+    任务变更后需要清除的键
+
+    Args:
+        pks: 变更的任务ID列表，为None（按条件批量更新）或超过SURROGATE_PURGE_MAX_KEYS个时清除所有单个任务的响应
+
+    Returns:
+        list: 键列表
+    """
+    if pks is None or len(pks) > settings.SURROGATE_PURGE_MAX_KEYS:
+        return [TASK_COLLECTION_KEY, TASK_ITEM_KEY]
+    return [TASK_COLLECTION_KEY, *(task_key(pk) for pk in pks)]
+
+def set_surrogate_keys(response, keys):
+    """
+    为响应设置Surrogate-Key，SURROGATE_CACHE_TTL大于0时同时设置代理层的缓存时间
+
+    X-Accel-Expires由nginx读取（优先于Cache-Control，不会发给客户端），Surrogate-Control用于Varnish、CDN等，
+    客户端收到的Cache-Control不变
+
+    Args:
+        response: 响应对象
+        keys: 键列表
+    """
+    if not settings.SURROGATE_KEYS_ENABLED or not keys:
+        return response
+    response[SURROGATE_KEY_HEADER] = ' '.join(keys)
+    if settings.SURROGATE_CACHE_TTL > 0:
+        response['X-Accel-Expires'] = str(settings.SURROGATE_CACHE_TTL)
+        response['Surrogate-Control'] = f"max-age={settings.SURROGATE_CACHE_TTL}"
+    return response
+
+class CachePurger(ABC):
+    """代理层缓存清除器抽象基类"""
+
+    @abstractmethod
+    def purge(self, keys):
+        """
+        清除带有任一键的缓存响应
+
+        Args:
+            keys: 键列表，数量不超过SURROGATE_PURGE_BATCH_SIZE
+        """
+        pass
+
+class NullPurger(CachePurger):
+    """不清除缓存，用于没有代理层缓存的部署"""
+
+    def purge(self, keys):
+        pass
+
+class NginxCachePurger(CachePurger):
+    """
+    直接删除nginx proxy_cache目录中的缓存文件
+
+    开源版nginx不支持按标签清除缓存，这里扫描缓存目录，读取每个缓存文件中保存的上游响应头，
+    删除Surrogate-Key包含任一键的文件，nginx下次请求时按未命中处理。
+    应用需要与nginx共享缓存目录（SURROGATE_NGINX_CACHE_PATH）并有删除权限；
+    每次清除都要扫描整个目录，适合单机部署和缓存文件数不多的场景
+    """
+    # 每个缓存文件读取的最大字节数，响应头超出该长度的部分不检查
+    header_read_size = 16 * 1024
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or settings.SURROGATE_NGINX_CACHE_PATH
+
+    def purge(self, keys):
+        keys = set(keys)
+        removed = 0
+        for directory, _, filenames in os.walk(self.cache_path):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    if keys & self.read_keys(path):
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    # 文件已被nginx的缓存管理进程删除或替换
+                    continue
+        logger.debug("清除了%d个nginx缓存文件", removed)
+
+    def read_keys(self, path):
+        """
+        读取缓存文件中的Surrogate-Key
+
+        缓存文件由二进制头、"KEY: <缓存键>"行和上游的原始响应组成
+
+        Returns:
+            set: 键集合，文件格式无法识别时为空集合
+        """
+        with open(path, 'rb') as f:
+            data = f.read(self.header_read_size)
+        start = data.find(b'\nKEY: ')
+        if start == -1:
+            return set()
+        start = data.find(b'\n', start + 1) + 1
+        end = data.find(b'\r\n\r\n', start)
+        header = b'surrogate-key:'
+        for line in data[start:end if end != -1 else len(data)].split(b'\r\n')[1:]:
+            if line[:len(header)].lower() == header:
+                return set(line[len(header):].decode('latin-1').split())
+        return set()
+
+class HttpPurger(CachePurger):
+    """
+    向清除接口发送HTTP请求，键以空格分隔放在请求头中
+
+    适用于支持按键清除的代理和CDN，如Varnish（xkey模块）和Fastly，
+    通过SURROGATE_PURGE_URL、SURROGATE_PURGE_METHOD、SURROGATE_PURGE_KEY_HEADER和
+    SURROGATE_PURGE_HEADERS（如认证头）配置
+    """
+
+    def __init__(self, url=None):
+        self.url = url or settings.SURROGATE_PURGE_URL
+        self.session = requests.Session()
+
+    def purge(self, keys):
+        headers = {**settings.SURROGATE_PURGE_HEADERS, settings.SURROGATE_PURGE_KEY_HEADER: ' '.join(keys)}
+        response = self.session.request(
+            settings.SURROGATE_PURGE_METHOD, self.url, headers=headers, timeout=settings.SURROGATE_PURGE_TIMEOUT
+        )
+        response.raise_for_status()
+
+class PurgeQueue:
+    """
+    合并和延迟发送的清除队列
+
+    写入后加入的键先在内存中合并，直到SURROGATE_PURGE_DELAY秒内没有新的键（最多等待SURROGATE_PURGE_MAX_DELAY秒），
+    再由后台线程按每批SURROGATE_PURGE_BATCH_SIZE个键调用清除器，连续的写入只清除一次。
+    清除失败只记录日志，对应的缓存在代理层的缓存时间（SURROGATE_CACHE_TTL）后过期。
+    SURROGATE_PURGE_DELAY为0时在调用线程中立即清除
+    """
+
+    def __init__(self, purger):
+        self.purger = purger
+        self._keys = set()
+        self._first_at = None
+        self._last_at = None
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def add(self, keys):
+        """
+        加入需要清除的键
+
+        Args:
+            keys: 键列表
+        """
+        if settings.SURROGATE_PURGE_DELAY <= 0:
+            self._purge(set(keys))
+            return
+        with self._condition:
+            now = time.monotonic()
+            if not self._keys:
+                self._first_at = now
+            self._keys.update(keys)
+            self._last_at = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='surrogate-key-purger', daemon=True)
+                self._thread.start()
+                # 进程正常退出时发送尚未清除的键
+                atexit.register(self.flush)
+            self._condition.notify()
+
+    def flush(self):
+        """立即清除所有等待中的键"""
+        with self._condition:
+            keys, self._keys = self._keys, set()
+        self._purge(keys)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._keys:
+                        self._condition.wait()
+                        continue
+                    deadline = min(
+                        self._last_at + settings.SURROGATE_PURGE_DELAY,
+                        self._first_at + settings.SURROGATE_PURGE_MAX_DELAY
+                    )
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                keys, self._keys = self._keys, set()
+            self._purge(keys)
+
+    def _purge(self, keys):
+        keys = sorted(keys)
+        batch_size = settings.SURROGATE_PURGE_BATCH_SIZE
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            try:
+                self.purger.purge(batch)
+            except Exception:
+                logger.exception("清除代理层缓存失败: %s", ' '.join(batch))
+
+_purge_queue = None
+_purge_queue_lock = threading.Lock()
+
+def get_purge_queue():
+    """获取清除队列，清除器由SURROGATE_PURGER指定"""
+    global _purge_queue
+    if _purge_queue is None:
+        with _purge_queue_lock:
+            if _purge_queue is None:
+                _purge_queue = PurgeQueue(import_string(settings.SURROGATE_PURGER)())
+    return _purge_queue
+
+def purge_surrogate_keys(keys):
+    """
+    清除代理层中带有任一键的缓存响应，在写入的事务提交后调用
+
+    Args:
+        keys: 键列表
+    """
+    if not settings.SURROGATE_KEYS_ENABLED or not keys:
+        return
+    try:
+        get_purge_queue().add(keys)
+    except Exception:
+        # 写入已经提交，清除失败不影响写入
+        logger.exception("清除代理层缓存失败")
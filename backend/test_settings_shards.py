@@ -0,0 +1,18 @@
+"""
+任务分片测试的配置
+
+在默认配置上使用三个SQLite数据库作为任务分片（default和task_shard_1、task_shard_2），
+测试时Django为每个别名创建单独的内存数据库：
+python manage.py test api --settings=backend.test_settings_shards
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    alias: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'test_{alias}.sqlite3',
+    }
+    for alias in ('default', 'task_shard_1', 'task_shard_2')
+}
+TASK_SHARDS = list(DATABASES)
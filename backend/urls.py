@@ -20,6 +20,7 @@ from django.conf import settings
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from backend.batch import BatchView
 
 # Swagger文档配置
 schema_view = get_schema_view(
@@ -37,6 +38,8 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # 批量请求，需要放在api.urls之前
+    path('api/batch/', BatchView.as_view(), name='batch'),
     path('api/', include('api.urls')),
     path('api/auth/', include('accounts.urls')),
 
@@ -1,8 +1,23 @@
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.paginator import Paginator
-from django.db.models import QuerySet
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+from backend.querysets import MergedQuerySet
 from collections import OrderedDict
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+import time
 
 class APIResponse(Response):
     """
@@ -17,7 +32,8 @@ class APIResponse(Response):
             "page": 1,       # 当前页码
             "page_size": 10, # 每页数量
             "total_pages": 5,# 总页数
-            "total_items": 42# 总条数
+            "total_items": 42,# 总条数
+            "total_is_exact": true # 总条数是否为精确值
         }
     }
     """
@@ -79,7 +95,7 @@ def api_success_response(data=None, message="成功", pagination=None, status=st
         **kwargs
     )
 
-def api_error_response(code=1, message="失败", status=status.HTTP_400_BAD_REQUEST, **kwargs):
+def api_error_response(code=1, message="失败", status=status.HTTP_400_BAD_REQUEST, data=None, **kwargs):
     """
     错误响应
     
@@ -87,13 +103,14 @@ def api_error_response(code=1, message="失败", status=status.HTTP_400_BAD_REQU
         code: 错误码，非0表示错误
         message: 错误消息
         status: HTTP状态码
+        data: 错误详情，默认为null
         **kwargs: 其他参数
         
     Returns:
         APIResponse: 自定义API响应
     """
     return APIResponse(
-        data=None,
+        data=data,
         code=code,
         message=message,
         pagination=None,
@@ -101,18 +118,267 @@ def api_error_response(code=1, message="失败", status=status.HTTP_400_BAD_REQU
         **kwargs
     )
 
-def paginate_queryset(queryset, request, page_size=10):
+def get_page_size(request, page_size=10, max_page_size=100):
+    """
+    获取每页数量
+
+    Args:
+        request: 请求对象
+        page_size: 默认每页数量
+        max_page_size: 每页数量上限
+
+    Returns:
+        int: 每页数量
+    """
+    size = request.query_params.get('page_size', page_size)
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        size = page_size
+
+    # 限制每页数量
+    if size > max_page_size:
+        size = max_page_size
+    if size < 1:
+        size = page_size
+    return size
+
+# 只在当前进程内有效的缓存后端，保存在其中的数据表版本号不会被其他进程的写入更新
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+def is_process_local_cache(alias='default'):
+    """
+    缓存是否只在当前进程内有效
+
+    默认缓存是进程内缓存时，其他Web进程、调度进程和管理命令的写入不会递增当前进程看到的数据表版本号，
+    依赖版本号失效的缓存会一直返回旧数据
+
+    Args:
+        alias: CACHES中的别名
+
+    Returns:
+        bool: 是否为进程内缓存
+    """
+    return settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHE_BACKENDS
+
+def _table_generation_key(model):
+    return f"table-gen:{model._meta.label_lower}"
+
+def get_table_generation(model):
+    """
+    获取数据表的版本号
+
+    版本号保存在缓存中，表中数据每次写入后递增。以版本号作为缓存键的一部分，
+    写入后旧的缓存项自然失效，不需要逐个删除
+
+    Args:
+        model: 模型类
+
+    Returns:
+        int: 版本号
+    """
+    key = _table_generation_key(model)
+    generation = cache.get(key)
+    if generation is None:
+        # 版本号丢失（如缓存被清空）时以当前时间重新起始，避免与旧版本号重复
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+def bump_table_generation(model):
+    """
+    递增数据表的版本号
+
+    Args:
+        model: 模型类
+    """
+    key = _table_generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+def _estimate_count(queryset):
+    """
+    估算查询集的总数，仅支持PostgreSQL
+
+    无过滤条件时读取pg_class.reltuples，有过滤条件时读取查询计划的估计行数
+
+    Returns:
+        int: 估算的总数，无法估算时返回None
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            estimate = row[0] if row else None
+        else:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]['Plan']['Plan Rows']
+
+    # reltuples为-1表示表从未被分析过
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+def get_oldest_write_transaction_start(connection):
+    """
+    获取数据库中仍未结束的写事务最早的开始时间
+
+    只支持PostgreSQL：从pg_stat_activity读取已经写入（分配了事务ID）的其他会话的xact_start。
+    数据库用户只能看到自己的会话，其他用户的会话需要pg_read_all_stats权限
+
+    Args:
+        connection: 数据库连接
+
+    Returns:
+        datetime: 最早的开始时间，没有未结束的写事务或数据库不支持时返回None
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE backend_xid IS NOT NULL AND datname = current_database() AND pid <> pg_backend_pid()"
+        )
+        return cursor.fetchone()[0]
+
+def get_table_sizes(connection, table):
+    """
+    获取数据表及其各个索引占用的空间
+
+    PostgreSQL读取pg_table_size和pg_relation_size，SQLite读取dbstat虚拟表
+
+    Args:
+        connection: 数据库连接
+        table: 表名
+
+    Returns:
+        dict: {'table': 表占用的字节数, 'indexes': {索引名: 字节数}}，不支持的数据库返回None
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_table_size(%s::regclass)", [table])
+            table_size = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) "
+                "FROM pg_index WHERE indrelid = %s::regclass ORDER BY 1",
+                [table]
+            )
+            return {'table': table_size, 'indexes': dict(cursor.fetchall())}
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"PRAGMA index_list({connection.ops.quote_name(table)})")
+            indexes = [row[1] for row in cursor.fetchall()]
+            try:
+                cursor.execute(
+                    "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN (%s) GROUP BY name"
+                    % ', '.join(['%s'] * (len(indexes) + 1)),
+                    [table] + indexes
+                )
+            except DatabaseError:
+                # 编译SQLite时未启用SQLITE_ENABLE_DBSTAT_VTAB
+                return None
+            sizes = dict(cursor.fetchall())
+            return {'table': sizes.pop(table, 0), 'indexes': dict(sorted(sizes.items()))}
+    return None
+
+def count_queryset(queryset, mode=None):
+    """
+    统计查询集总数
+
+    支持三种方式：
+        - exact: 执行COUNT(*)
+        - cached: 按查询语句缓存COUNT(*)结果，缓存键包含数据表版本号，表写入后自动失效
+        - estimated: 使用PostgreSQL的统计信息估算，估算值低于PAGINATION_ESTIMATE_THRESHOLD
+          或无法估算（如SQLite）时退回到cached方式
+
+    Args:
+        queryset: 查询集，MergedQuerySet按各查询集分别统计后相加
+        mode: 统计方式，默认为settings.PAGINATION_COUNT_MODE
+
+    Returns:
+        tuple: (总数, 是否为精确值)
+    """
+    if isinstance(queryset, MergedQuerySet):
+        counts = [count_queryset(part, mode) for part in queryset.querysets]
+        return sum(count for count, _ in counts), all(exact for _, exact in counts)
+    if not isinstance(queryset, QuerySet):
+        return len(queryset), True
+
+    mode = mode or settings.PAGINATION_COUNT_MODE
+
+    if mode == 'estimated':
+        estimate = _estimate_count(queryset)
+        if estimate is not None and estimate >= settings.PAGINATION_ESTIMATE_THRESHOLD:
+            return estimate, False
+        mode = 'cached'
+
+    if mode == 'cached':
+        sql, params = queryset.order_by().query.sql_with_params()
+        digest = hashlib.md5(f"{queryset.db}:{sql}:{params!r}".encode('utf-8')).hexdigest()
+        key = f"count:{queryset.model._meta.label_lower}:{get_table_generation(queryset.model)}:{digest}"
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TTL)
+        return count, True
+
+    return queryset.count(), True
+
+class CountedPaginator(Paginator):
+    """使用count_queryset统计总数的分页器，也可以直接传入已统计的总数"""
+
+    def __init__(self, object_list, per_page, count_mode=None, known_count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_mode = count_mode
+        self.known_count = known_count
+        self.count_is_exact = True
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            count, self.count_is_exact = self.known_count
+        else:
+            count, self.count_is_exact = count_queryset(self.object_list, self.count_mode)
+        return count
+
+def paginate_queryset(queryset, request, page_size=10, cursor_ordering=None, count_mode=None,
+                      known_count=None):
     """
     分页查询集
-    
+
+    默认按页码分页；传入cursor_ordering且请求带有cursor参数时使用游标分页，
+    参见keyset_paginate_queryset
+
     Args:
-        queryset: 查询集
+        queryset: 查询集或MergedQuerySet
         request: 请求对象
         page_size: 每页数量
-        
+        cursor_ordering: 游标分页使用的排序字段，为None时不支持游标分页
+        count_mode: 总数统计方式，参见count_queryset
+        known_count: 已统计的(总数, 是否为精确值)，传入时不再重复统计
+
     Returns:
         tuple: (分页数据, 分页信息)
     """
+    if cursor_ordering is not None and 'cursor' in request.query_params:
+        return keyset_paginate_queryset(queryset, request, cursor_ordering, page_size)
+
     # 获取页码参数，默认为1
     page = request.query_params.get('page', 1)
     try:
@@ -121,18 +387,10 @@ def paginate_queryset(queryset, request, page_size=10):
         page = 1
     
     # 获取每页数量参数，默认为page_size
-    size = request.query_params.get('page_size', page_size)
-    try:
-        size = int(size)
-    except (TypeError, ValueError):
-        size = page_size
-    
-    # 限制每页数量
-    if size > 100:
-        size = 100
+    size = get_page_size(request, page_size)
     
     # 创建分页器
-    paginator = Paginator(queryset, size)
+    paginator = CountedPaginator(queryset, size, count_mode=count_mode, known_count=known_count)
     
     # 获取当前页的数据
     try:
@@ -146,7 +404,208 @@ def paginate_queryset(queryset, request, page_size=10):
         "page": page_obj.number,
         "page_size": size,
         "total_pages": paginator.num_pages,
-        "total_items": paginator.count
+        "total_items": paginator.count,
+        "total_is_exact": paginator.count_is_exact
     }
     
     return page_obj.object_list, pagination
+
+def make_etag(*parts):
+    """
+    根据版本信息生成弱ETag
+
+    Args:
+        *parts: 能唯一确定响应内容版本的值，如最后更新时间、总数、查询参数
+
+    Returns:
+        str: 形如W/"<md5>"的弱ETag
+    """
+    raw = '|'.join(str(part) for part in parts)
+    return 'W/"%s"' % hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+def set_validator_headers(response, etag, last_modified=None):
+    """
+    设置ETag和Last-Modified响应头
+
+    同时设置Cache-Control: no-cache，要求客户端每次使用前都用条件请求重新验证，
+    避免浏览器按Last-Modified启发式缓存而读到旧数据
+
+    Args:
+        response: 响应对象
+        etag: ETag
+        last_modified: 最后更新时间（datetime），为None时不设置Last-Modified
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, no_cache=True)
+    return response
+
+def get_not_modified_response(request, etag, last_modified=None):
+    """
+    处理条件请求（If-None-Match、If-Modified-Since等）
+
+    在执行查询和序列化之前调用，请求中的验证器与当前版本匹配时直接返回304
+
+    Args:
+        request: 请求对象
+        etag: 当前版本的ETag
+        last_modified: 当前版本的最后更新时间（datetime）
+
+    Returns:
+        HttpResponse: 304或412响应，需要返回完整内容时为None
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validator_headers(response, etag, last_modified)
+    return response
+
+def encode_cursor(data):
+    """
+    编码游标
+
+    Args:
+        data: 可JSON序列化的游标内容
+
+    Returns:
+        str: URL安全的base64字符串
+    """
+    raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    解码游标
+
+    Args:
+        cursor: encode_cursor生成的字符串
+
+    Returns:
+        游标内容
+
+    Raises:
+        ValidationError: 游标格式无效
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError, binascii.Error):
+        raise ValidationError({'cursor': '无效的游标'})
+
+def _cursor_value(row, field_name):
+    """读取行的排序字段值，转换为可写入游标的形式"""
+    value = row[field_name] if isinstance(row, dict) else getattr(row, field_name)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+def _parse_cursor_value(queryset, name, value):
+    """
+    把游标中的值转换为排序字段（或注解）的类型
+
+    Raises:
+        ValidationError: 值为空、不是标量或不能转换为字段类型
+    """
+    if isinstance(queryset, MergedQuerySet):
+        queryset = queryset.querysets[0]
+    annotation = queryset.query.annotations.get(name)
+    field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+    try:
+        if value is None or isinstance(value, (dict, list)):
+            raise ValueError(value)
+        value = field.to_python(value)
+        if value is None:
+            raise ValueError(value)
+    except (DjangoValidationError, TypeError, ValueError):
+        raise ValidationError({'cursor': '无效的游标'})
+    return value
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    构建游标位置之后（reverse为True时为之前）的过滤条件
+
+    按排序字段做字典序比较，例如ordering为('-created_at', '-id')时生成：
+    created_at <= v0 AND (created_at < v0 OR (created_at = v0 AND id < v1))，
+    第一个条件使数据库可以直接按复合索引定位范围
+
+    Args:
+        ordering: 排序字段，"-"前缀表示降序
+        values: 游标位置的字段值
+        reverse: 是否取游标之前的数据
+
+    Returns:
+        Q: 过滤条件
+    """
+    def lookup(field, strict):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        op = 'lt' if descending != reverse else 'gt'
+        return f"{name}__{op}" if strict else f"{name}__{op}e"
+
+    condition = Q()
+    for i in range(len(ordering) - 1, -1, -1):
+        equal = {field.lstrip('-'): value for field, value in zip(ordering[:i], values[:i])}
+        condition = Q(**{lookup(ordering[i], True): values[i]}, **equal) | condition
+    return Q(**{lookup(ordering[0], False): values[0]}) & condition
+
+def keyset_paginate_queryset(queryset, request, ordering, page_size=10):
+    """
+    游标（keyset）分页查询集
+
+    按排序字段的值定位而不是OFFSET，也不执行COUNT，
+    配合与排序字段一致的复合索引，翻到任何深度的耗时都相同。
+    请求参数cursor为空时返回第一页，之后使用分页信息中的
+    next_cursor/previous_cursor翻页
+
+    Args:
+        queryset: 查询集
+        request: 请求对象
+        ordering: 排序字段，最后一个字段必须唯一（如id）
+        page_size: 每页数量
+
+    Returns:
+        tuple: (分页数据, 分页信息)
+    """
+    size = get_page_size(request, page_size)
+    cursor = request.query_params.get('cursor')
+    reverse = False
+
+    if cursor:
+        data = decode_cursor(cursor)
+        if not isinstance(data, dict) or not isinstance(data.get('v'), list) or len(data['v']) != len(ordering):
+            raise ValidationError({'cursor': '无效的游标'})
+        reverse = data.get('d') == 'p'
+        # 游标由客户端传回，各个值转换为字段类型后再用于过滤，格式错误的值返回400而不是在数据库中出错
+        values = [_parse_cursor_value(queryset, field.lstrip('-'), value) for field, value in zip(ordering, data['v'])]
+        queryset = queryset.filter(keyset_filter(ordering, values, reverse))
+
+    if reverse:
+        queryset = queryset.order_by(*[f[1:] if f.startswith('-') else f"-{f}" for f in ordering])
+    else:
+        queryset = queryset.order_by(*ordering)
+
+    rows = list(queryset[:size + 1])
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if reverse:
+        rows.reverse()
+
+    names = [field.lstrip('-') for field in ordering]
+    has_next = has_more if not reverse else True
+    has_previous = has_more if reverse else bool(cursor)
+
+    next_cursor = None
+    previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor({'v': [_cursor_value(rows[-1], n) for n in names], 'd': 'n'})
+    if rows and has_previous:
+        previous_cursor = encode_cursor({'v': [_cursor_value(rows[0], n) for n in names], 'd': 'p'})
+
+    pagination = {
+        "page_size": size,
+        "next_cursor": next_cursor,
+        "previous_cursor": previous_cursor
+    }
+
+    return rows, pagination